@@ -1,95 +1,185 @@
+from airflow.decorators import task, task_group
+from airflow.exceptions import AirflowSkipException
 from airflow.models.dag import DAG
-from airflow.operators.python import PythonOperator
-from datetime import datetime, timedelta
-import os
+from airflow.models.param import Param
+from airflow.utils.trigger_rule import TriggerRule
+from datetime import date, datetime, timedelta
+import calendar
+import gzip
 import json
-import pandas as pd
+import os
+import re
+import shutil
 
-from EGP_Converter import export
-from EGP_Converter import transform
-from EGP_Converter import load
+# pandas and the EGP_Converter modules are imported inside the task functions below.
+# The scheduler parses this file every few seconds, and only a running task needs them.
 
 AIRFLOW_HOME = os.getenv('AIRFLOW_HOME', '/opt/airflow')
-OUTPUT_CSV_PATH = os.path.join(AIRFLOW_HOME, 'data', 'latest_rates.csv')
-
-def _extract_data_callable():
-    year_to_extract = 2013
-    print(f"Starting extraction of historical currency data for year {year_to_extract}...")
-    try:
-        latest_data = export._extract_historical_year_data(year_to_extract)
-        print(f"Extraction complete for year {year_to_extract}.")
-        return json.dumps(latest_data) if isinstance(latest_data, (dict, list)) else latest_data
-    except Exception as e:
-        print(f"Error during extraction: {e}")
-        raise
-
-def _transform_data_callable(ti):
-    print("Starting data transformation...")
-    raw_data_json = ti.xcom_pull(task_ids='extract_latest_data')
-
-    if raw_data_json is None:
-        raise ValueError("No raw data received from extraction task.")
-    try:
-        parsed_data = json.loads(raw_data_json)
-    except json.JSONDecodeError:
-        print("Raw data is not a JSON string, attempting direct string parsing.")
-        parsed_data = raw_data_json
-
-    if isinstance(parsed_data, str):
-        processed_item = transform._parse_and_fix_json_string(parsed_data)
-        data_for_df = [processed_item]
-    elif isinstance(parsed_data, (dict, list)):
-        data_for_df = parsed_data if isinstance(parsed_data, list) else [parsed_data]
-    else:
-        raise TypeError(f"Unexpected data type from extraction: {type(parsed_data)}")
-
-    df = transform._load_json_into_df(data_for_df)
-    prepared_df = transform._prepare_data_columns(df)
-
-    print("Data transformation complete.")
-    return prepared_df.to_json(orient='split')
-
-def _load_data_callable(ti):
-    print(f"Starting data loading to CSV: {OUTPUT_CSV_PATH}")
-    transformed_df_json = ti.xcom_pull(task_ids='transform_data')
-
-    if transformed_df_json is None:
-        raise ValueError("No transformed data received from transformation task.")
-
-    transformed_df = pd.read_json(transformed_df_json, orient='split')
-
-    success = load._load_rates_to_csv(OUTPUT_CSV_PATH, transformed_df)
-
-    if success:
-        print(f"Data successfully loaded to {OUTPUT_CSV_PATH}")
-    else:
-        raise RuntimeError(f"Failed to load data to {OUTPUT_CSV_PATH}")
+SNAPSHOT_ROOT = os.path.join(AIRFLOW_HOME, 'data', 'snapshots')
+# Every DAG run keeps its intermediate files in its own folder under here. The tasks only
+# pass the paths of these files to each other through XCom, never the data itself.
+STAGING_ROOT = os.path.join(AIRFLOW_HOME, 'data', 'staging')
+
+# The extract tasks call the rates provider, so they run in this pool. Its slot count is how
+# many months are fetched at the same time; set it to what the provider plan allows, e.g.
+#   airflow pools set egp_converter_provider 2 "Rates provider calls"
+PROVIDER_POOL = os.getenv('EGP_CONVERTER_PROVIDER_POOL', 'egp_converter_provider')
+# The most months one run may fan out to (Airflow's own limit, max_map_length, is 1024).
+MAX_MONTHS_PER_RUN = 240
+
+
+def _run_staging_dir(run_id):
+    # Run ids look like 'manual__2024-05-01T10:00:00+00:00'; keep them safe as folder names.
+    return os.path.join(STAGING_ROOT, re.sub(r'[^A-Za-z0-9_.-]', '_', run_id))
+
+
+@task
+def plan_months(params=None, logical_date=None):
+    """
+    Splits the run's date range into one piece per calendar month.
+
+    The range comes from the `start_date` and `end_date` params (YYYY-MM-DD). Without them
+    the run covers the month of its logical date up to that date. Days after today are left out.
+
+    Returns:
+        list: One small dict per month, e.g. {'month': '2013-05', 'start_date': '2013-05-01',
+              'end_date': '2013-05-31'}; each one becomes its own extract/transform/load chain.
+    """
+    run_day = logical_date.date() if logical_date else date.today()
+    start = date.fromisoformat(params['start_date']) if params.get('start_date') else run_day.replace(day=1)
+    end = date.fromisoformat(params['end_date']) if params.get('end_date') else run_day
+    end = min(end, date.today())
+    if start > end:
+        raise ValueError(f"start_date {start} must be on or before end_date {end} (and not in the future).")
+
+    months = []
+    month_start = start
+    while month_start <= end:
+        month_end = month_start.replace(day=calendar.monthrange(month_start.year, month_start.month)[1])
+        months.append({
+            'month': month_start.strftime('%Y-%m'),
+            'start_date': month_start.isoformat(),
+            'end_date': min(month_end, end).isoformat(),
+        })
+        month_start = month_end + timedelta(days=1)
+    if len(months) > MAX_MONTHS_PER_RUN:
+        raise ValueError(f"At most {MAX_MONTHS_PER_RUN} months can be loaded in one run, got {len(months)}.")
+    print(f"Planned {len(months)} months from {start} to {end}.")
+    return months
+
+
+@task(pool=PROVIDER_POOL, retries=3, retry_delay=timedelta(minutes=1), retry_exponential_backoff=True)
+def extract_month(month, run_id=None):
+    """
+    Fetches the raw provider responses of one month and saves them as a gzipped JSON file.
+
+    Consecutive days are fetched with the provider's timeseries endpoint, so a month
+    usually costs one call.
+
+    Returns:
+        str: The path of the raw file.
+    """
+    from EGP_Converter import export
+    start, end = date.fromisoformat(month['start_date']), date.fromisoformat(month['end_date'])
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    print(f"Extracting {len(days)} days for {month['month']}...")
+    raw_data = export._extract_historical_dates_data(days)
+
+    raw_path = os.path.join(_run_staging_dir(run_id), 'raw', f"{month['month']}.json.gz")
+    os.makedirs(os.path.dirname(raw_path), exist_ok=True)
+    with gzip.open(raw_path, 'wt', encoding='utf-8') as raw_file:
+        json.dump(raw_data, raw_file)
+    print(f"Extracted {len(raw_data)} days for {month['month']} into {raw_path}")
+    return raw_path
+
+
+@task
+def transform_month(raw_path):
+    """
+    Turns one month of raw responses into a long rates table saved as a Parquet file.
+
+    Returns:
+        str: The path of the Parquet file (one row per date and currency).
+    """
+    from EGP_Converter import main_etl
+    with gzip.open(raw_path, 'rt', encoding='utf-8') as raw_file:
+        raw_data = json.load(raw_file)
+    rates_df = main_etl._process_historical_data(raw_data)
+    if rates_df.empty:
+        # Nothing to load for this month; its load task is skipped too.
+        raise AirflowSkipException(f"No rates found in {raw_path}.")
+
+    # <run folder>/raw/2013-05.json.gz -> <run folder>/rates/2013-05.parquet
+    month_name = os.path.basename(raw_path).split('.')[0]
+    rates_path = os.path.join(os.path.dirname(os.path.dirname(raw_path)), 'rates', f"{month_name}.parquet")
+    os.makedirs(os.path.dirname(rates_path), exist_ok=True)
+    rates_df.to_parquet(rates_path, index=False)
+    print(f"Transformed {len(rates_df)} rates into {rates_path}")
+    return rates_path
+
+
+@task(retries=2, retry_delay=timedelta(minutes=1))
+def load_month(rates_path):
+    """
+    Loads one month of rates into the CURRENCY_RATES table and the Parquet snapshots.
+
+    Rates already in CURRENCY_RATES are skipped (a MERGE), and a snapshot month is
+    rewritten as a whole, so re-running a month never creates duplicates.
+
+    Returns:
+        dict: The counts of the load, e.g. {'inserted': 93, 'duplicates': 0, 'failed': 0}.
+    """
+    import pandas as pd
+    from EGP_Converter import load, main_etl
+    rates_df = pd.read_parquet(rates_path)
+
+    report = main_etl._load_rates_df_to_db(rates_df, pipeline="airflow")
+    print(f"Loaded {rates_path} into CURRENCY_RATES: {report['inserted']} inserted, "
+          f"{report['duplicates']} already there, {report['failed']} failed.")
+    if report['failed']:
+        raise RuntimeError(f"{report['failed']} rates from {rates_path} could not be loaded into CURRENCY_RATES.")
+
+    if not load._load_rates_to_snapshot(SNAPSHOT_ROOT, rates_df):
+        raise RuntimeError(f"Failed to write snapshot to {SNAPSHOT_ROOT}")
+    print(f"Data successfully written to snapshot {SNAPSHOT_ROOT}")
+    return {key: report[key] for key in ('inserted', 'duplicates', 'failed')}
+
+
+@task_group
+def etl_month(month):
+    # Extract -> Transform -> Load of one month. Each month's chain moves on as soon as
+    # its own previous step is done, without waiting for the other months.
+    load_month(transform_month(extract_month(month)))
+
+
+@task(trigger_rule=TriggerRule.NONE_FAILED)
+def cleanup_staging(run_id=None):
+    # Only runs when no month failed, so a failed month's files are kept for its retry.
+    shutil.rmtree(_run_staging_dir(run_id), ignore_errors=True)
+
 
 with DAG(
     dag_id='egp_converter_etl_pipeline',
     start_date=datetime.utcnow() - timedelta(days=1),
     schedule=None,
     catchup=False,
+    # Runs for different ranges can overlap months, so they run one after the other.
+    max_active_runs=1,
+    params={
+        'start_date': Param(None, type=['null', 'string'], format='date',
+                            description='First day to load (YYYY-MM-DD). Defaults to the first day of the run month.'),
+        'end_date': Param(None, type=['null', 'string'], format='date',
+                          description='Last day to load (YYYY-MM-DD). Defaults to the run date.'),
+    },
     tags=['egp_converter', 'etl', 'api', 'data_pipeline'],
-    description='A full ETL pipeline for EGP currency exchange rates: Extract, Transform, Load to CSV.'
+    description='ETL pipeline for EGP currency exchange rates: one Extract, Transform, Load chain per month, into Db2 and Parquet snapshots.'
 ) as dag:
-    # Task-1: Extract latest data
-    extract_latest_data_task = PythonOperator(
-        task_id='extract_latest_data',
-        python_callable=_extract_data_callable,
-    )
-
-    # Task-2: Transform the extracted data
-    transform_data_task = PythonOperator(
-        task_id='transform_data',
-        python_callable=_transform_data_callable,
-    )
-
-    # Task-3: Load the transformed data to CSV
-    load_data_to_csv_task = PythonOperator(
-        task_id='load_data_to_csv',
-        python_callable=_load_data_callable,
-    )
-
-    #Task dependencies
-    extract_latest_data_task >> transform_data_task >> load_data_to_csv_task
+    # Task-1: Split the date range into months
+    months = plan_months()
+
+    # Task-2..4: One extract -> transform -> load chain per month (dynamic task mapping).
+    # Months run in parallel; the provider pool limits how many extract at the same time.
+    month_chains = etl_month.expand(month=months)
+
+    # Task-5: Remove the run's intermediate files
+    month_chains >> cleanup_staging()
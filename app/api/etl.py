@@ -0,0 +1,96 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from ..schema.etl_job import EtlJobStatus, EtlRunRequest, EtlStatusResponse, EtlTriggerResponse
+from ..services import etl_service
+from ..utils.db2_utils import Db2PoolExhaustedError
+
+router = APIRouter(tags=["etl"])
+
+# These are plain `def` routes: FastAPI runs them in its thread pool, so the short
+# Db2 writes that record a job never block the event loop. The ETL itself runs later
+# on the job queue's own worker threads.
+
+def _trigger_response(submitted: list) -> EtlTriggerResponse:
+    return EtlTriggerResponse(
+        jobs=[EtlJobStatus(**job.to_dict()) for job, _ in submitted],
+        created=sum(1 for _, created in submitted if created),
+    )
+
+@router.post("/etl/trigger", response_model=EtlTriggerResponse, status_code=202)
+def trigger_etl():
+    """
+    Queues a load of the current month's rates and returns right away.
+
+    Returns:
+        EtlTriggerResponse: The job; if the month is already being loaded, the existing job.
+    """
+    try:
+        return _trigger_response(etl_service.submit_latest_etl())
+    except etl_service.EtlQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Db2PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.post("/etl/run", response_model=EtlTriggerResponse, status_code=202)
+def run_etl(request: EtlRunRequest):
+    """
+    Queues one load per month between start_date and end_date and returns right away.
+
+    Args:
+        request (EtlRunRequest): The first and last day to load (YYYY-MM-DD).
+
+    Returns:
+        EtlTriggerResponse: One job per month, see /etl/status for their progress.
+    """
+    try:
+        return _trigger_response(etl_service.submit_etl_range(request.start_date, request.end_date))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except etl_service.EtlQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Db2PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/etl/status")
+def etl_status(job_id: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    """
+    Shows the progress of ETL jobs.
+
+    Args:
+        job_id (str, optional): One job to show. Without it, the most recent jobs are listed.
+        limit (int, optional): How many recent jobs to list. Defaults to 20.
+
+    Returns:
+        EtlJobStatus | EtlStatusResponse: The job, or the recent jobs with the number queued and running.
+    """
+    if job_id:
+        try:
+            return EtlJobStatus(**etl_service._get_etl_jobs().get(job_id).to_dict())
+        except etl_service.EtlJobNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    jobs = etl_service._get_etl_jobs().recent(limit)
+    return EtlStatusResponse(
+        queued=sum(1 for job in jobs if job.status == etl_service.QUEUED),
+        running=sum(1 for job in jobs if job.status in (etl_service.RUNNING, etl_service.CANCELLING)),
+        jobs=[EtlJobStatus(**job.to_dict()) for job in jobs],
+    )
+
+@router.post("/etl/jobs/{job_id}/cancel", response_model=EtlJobStatus, status_code=202)
+def cancel_etl_job(job_id: str):
+    """
+    Cancels a queued or running ETL job. A running job stops after its current step;
+    the rates it already loaded are kept.
+
+    Args:
+        job_id (str): The job to cancel.
+
+    Returns:
+        EtlJobStatus: The job, with status 'cancelling' (or 'queued' until its worker notices).
+    """
+    try:
+        job = etl_service._get_etl_jobs().cancel(job_id)
+    except etl_service.EtlJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if job.status in etl_service.FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"The ETL job {job_id} has already {job.status}.")
+    return EtlJobStatus(**job.to_dict())
@@ -0,0 +1,211 @@
+import asyncio
+from datetime import date as date_type
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from ..schema.currency_rate import ConversionResponse, BatchConversionRequest, BatchConversionResponse
+from ..services import currency_service
+from ..services import rates_service
+from ..core.config import get_settings
+from ..utils.db2_utils import Db2PoolExhaustedError
+
+router = APIRouter(tags=["rates"])
+
+@router.get("/convert", response_model=ConversionResponse)
+async def convert(
+    from_currency: str = Query(..., alias="from", min_length=3, max_length=3),
+    to: str = Query(..., min_length=3, max_length=3),
+    amount: float = Query(...),
+    date: Optional[date_type] = None,
+    as_of: bool = False,
+    max_staleness_days: Optional[int] = Query(None, ge=0),
+):
+    """
+    Converts an amount from one currency to another using the rates of a given date.
+
+    Args:
+        from_currency (str): The currency to convert from, passed as the `from` query parameter.
+        to (str): The currency to convert to.
+        amount (float): The amount to convert.
+        date (date, optional): The date of the rates (YYYY-MM-DD). Defaults to today.
+        as_of (bool, optional): If the date has no rates, use the latest earlier date that does
+                                (weekends, holidays, today before the ETL ran). Defaults to False,
+                                which means the exact date or a 404, so clients opt in with as_of=true.
+        max_staleness_days (int, optional): With as_of, how many days back the rates may be.
+                                            Defaults to RATE_MAX_STALENESS_DAYS.
+
+    Returns:
+        ConversionResponse: The converted amount, the rate that was used and the date of that rate.
+    """
+    requested_date = (date or date_type.today()).isoformat()
+    rate_date = requested_date
+    from_currency, to = from_currency.upper(), to.upper()
+    try:
+        if as_of:
+            conversion = await currency_service.convert_currency_as_of_async(
+                amount, from_currency, to, requested_date, max_staleness_days
+            )
+            result, rate, rate_date = conversion["result"], conversion["rate"], conversion["rate_date"]
+        else:
+            result = await currency_service.convert_currency_async(amount, from_currency, to, rate_date)
+            # The rate is the result per unit; for a zero amount it is looked up on its own (from the cache).
+            rate = result / amount if amount else await currency_service.convert_currency_async(1.0, from_currency, to, rate_date)
+    except currency_service.ExchangeRateNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Db2PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return ConversionResponse(
+        from_currency=from_currency,
+        to_currency=to,
+        amount=amount,
+        rate=rate,
+        result=result,
+        rate_date=rate_date,
+        requested_date=requested_date,
+    )
+
+@router.post("/convert/batch", response_model=BatchConversionResponse)
+async def convert_batch(request: BatchConversionRequest):
+    """
+    Converts many amounts in one call, each with its own currencies and date.
+
+    Args:
+        request (BatchConversionRequest): The items to convert ({amount, from, to, date}).
+
+    Returns:
+        BatchConversionResponse: One result per item, in the same order. Items that fail
+                                 have an 'error' instead of a result; the rest still succeed.
+    """
+    items = [
+        {"amount": item.amount, "from": item.from_currency, "to": item.to_currency, "date": item.rate_date}
+        for item in request.items
+    ]
+    try:
+        results = await currency_service.convert_batch_async(items)
+    except Db2PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return BatchConversionResponse(results=results)
+
+async def _rates_response(rate_date, base: str) -> Response:
+    # Shared by /latest and /{date}: the body is a pre-built slice of the date's cross-rate matrix.
+    try:
+        body = await rates_service.get_rates_response_async(rate_date, base)
+    except currency_service.ExchangeRateNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Db2PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return Response(content=body, media_type="application/json")
+
+@router.get("/latest")
+async def latest_rates(base: str = Query("EUR", min_length=3, max_length=3)):
+    """
+    Returns the rates of the most recent loaded date, in any base currency.
+
+    Args:
+        base (str, optional): The base currency. Defaults to 'EUR'.
+
+    Returns:
+        Response: {"base", "date", "timestamp", "rates"} as JSON.
+    """
+    return await _rates_response(None, base)
+
+@router.get("/currencies")
+async def currencies():
+    """
+    Returns the currency codes that have rates on the latest loaded date.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        codes = await loop.run_in_executor(currency_service._get_db_executor(), rates_service.get_available_currencies)
+    except currency_service.ExchangeRateNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"currencies": codes}
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match can hold several tags ("a", "b") or "*". It uses the weak comparison,
+    # so W/"a" and "a" match each other.
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == opaque_tag for tag in tags)
+
+async def _history_response(request: Request, history_call) -> Response:
+    # Shared by /history/monthly and /history/yearly: runs the lookup, then answers with
+    # 304 Not Modified if the browser (or proxy) already has these exact bytes.
+    try:
+        body, etag, is_final = await history_call
+    except currency_service.ExchangeRateNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Db2PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if is_final:
+        # A period that is over and fully loaded never changes, so caches may keep it without asking again.
+        cache_control = f"public, max-age={get_settings().HISTORY_CLOSED_MAX_AGE_SECONDS}, immutable"
+    else:
+        # The current period, or a past one with gaps a later load may fill: caches revalidate
+        # soon, and get a cheap 304 through the ETag while nothing changed.
+        cache_control = f"public, max-age={get_settings().HISTORY_OPEN_MAX_AGE_SECONDS}"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/history/monthly")
+async def monthly_history(
+    request: Request,
+    year: int = Query(..., ge=1999, le=9999),
+    month: int = Query(..., ge=1, le=12),
+    base: str = Query("EUR", min_length=3, max_length=3),
+):
+    """
+    Returns every daily rate of one month.
+
+    Args:
+        year (int): The year (e.g., 2023).
+        month (int): The month (1-12).
+        base (str, optional): The base currency. Defaults to 'EUR'.
+
+    Returns:
+        Response: {"base", "start_date", "end_date", "timestamp", "dates", "rates": {code: [...]}} as JSON,
+                  where each list of rates follows the order of "dates".
+    """
+    return await _history_response(request, rates_service.get_monthly_history_async(year, month, base))
+
+@router.get("/history/yearly")
+async def yearly_history(
+    request: Request,
+    year: int = Query(..., ge=1999, le=9999),
+    base: str = Query("EUR", min_length=3, max_length=3),
+):
+    """
+    Returns every rate loaded for one year, in the same shape as /history/monthly.
+
+    Args:
+        year (int): The year (e.g., 2023).
+        base (str, optional): The base currency. Defaults to 'EUR'.
+    """
+    return await _history_response(request, rates_service.get_yearly_history_async(year, base))
+
+# Declared last so the fixed paths above are matched before this catch-all date path.
+@router.get("/{rate_date}")
+async def rates_for_date(rate_date: date_type, base: str = Query("EUR", min_length=3, max_length=3)):
+    """
+    Returns the rates of one date, in any base currency.
+
+    Args:
+        rate_date (date): The date of the rates (YYYY-MM-DD).
+        base (str, optional): The base currency. Defaults to 'EUR'.
+
+    Returns:
+        Response: {"base", "date", "timestamp", "rates"} as JSON.
+    """
+    return await _rates_response(rate_date, base)
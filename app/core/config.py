@@ -1,18 +1,164 @@
-import ibm_db
 import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv(dotenv_path='/Users/ahmednader/Desktop/Code Repository/EGP-Converter/.env')
-
-DB2_NAME = os.getenv("DB2_NAME")
-DB2_HOSTNAME = os.getenv("DB2_HOSTNAME")
-DB2_PORT = os.getenv("DB2_PORT")
-DB2_UID = os.getenv("DB2_UID")
-DB2_PWD = os.getenv("DB2_PWD")
-PATH_TO_SSL = os.getenv("PATH_TO_SSL")
-ACCESS_KEY = os.getenv("ACCESS_KEY")
-CURRENCY_RATES = os.getenv("CURRENCY_RATES")
-BASE_URL = os.getenv("BASE_URL")
-BACKUP_ACCESS_KEY = os.getenv("BACKUP_ACCESS_KEY")
+import threading
 
+# Where the optional .env file is read from: the EGP_CONVERTER_ENV_FILE variable, or
+# a .env file at the root of the project (next to requirements.txt).
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_DEFAULT_ENV_FILE = os.path.join(_PROJECT_ROOT, ".env")
+
+
+class Settings:
+    """
+    Every setting of the app, read from environment variables.
+
+    Nothing is read when this module is imported. The settings are built the first time
+    one of them is used (see `get_settings`), so importing the app stays fast and has no
+    side effects, and tests or tools can set environment variables before that happens.
+
+    The app's modules import only `get_settings` and read a setting where it is used, e.g.
+    `get_settings().API_SYMBOLS`, so importing them never builds the settings. Scripts
+    may still write `config.API_SYMBOLS`; the module-level `__getattr__` below answers it.
+    """
+
+    def __init__(self, environ=None):
+        getenv = (os.environ if environ is None else environ).get
+
+        self.DB2_NAME = getenv("DB2_NAME")
+        self.DB2_HOSTNAME = getenv("DB2_HOSTNAME")
+        self.DB2_PORT = getenv("DB2_PORT")
+        self.DB2_UID = getenv("DB2_UID")
+        self.DB2_PWD = getenv("DB2_PWD")
+        self.PATH_TO_SSL = getenv("PATH_TO_SSL")
+        self.ACCESS_KEY = getenv("ACCESS_KEY")
+        self.CURRENCY_RATES = getenv("CURRENCY_RATES")
+        self.BASE_URL = getenv("BASE_URL")
+        self.BACKUP_ACCESS_KEY = getenv("BACKUP_ACCESS_KEY")
+
+        # In-memory rate cache used by currency_service
+        self.RATE_CACHE_MAX_SIZE = int(getenv("RATE_CACHE_MAX_SIZE", "4096"))
+        self.RATE_CACHE_TODAY_TTL_SECONDS = float(getenv("RATE_CACHE_TODAY_TTL_SECONDS", "300"))
+        # As-of lookups: how many days back a missing date may fall back to, and how long
+        # each currency's in-memory list of loaded dates is trusted before it is reloaded
+        self.RATE_MAX_STALENESS_DAYS = int(getenv("RATE_MAX_STALENESS_DAYS", "7"))
+        self.RATE_DATE_INDEX_TTL_SECONDS = float(getenv("RATE_DATE_INDEX_TTL_SECONDS", "300"))
+        # Keep the whole CURRENCY_RATES table in memory in the API process, refreshed every N seconds
+        self.RATE_STORE_ENABLED = getenv("RATE_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.RATE_STORE_REFRESH_SECONDS = float(getenv("RATE_STORE_REFRESH_SECONDS", "60"))
+        # Fetch and load a missing date from the provider when a conversion needs it
+        self.ON_DEMAND_ETL_ENABLED = getenv("ON_DEMAND_ETL_ENABLED", "true").lower() in ("1", "true", "yes")
+        # How long "the provider has no rates for today" is remembered before asking again
+        self.ON_DEMAND_ETL_RETRY_SECONDS = float(getenv("ON_DEMAND_ETL_RETRY_SECONDS", "300"))
+
+        # Db2 connection pool used by db2_utils
+        self.DB2_POOL_MIN_SIZE = int(getenv("DB2_POOL_MIN_SIZE", "1"))
+        self.DB2_POOL_MAX_SIZE = int(getenv("DB2_POOL_MAX_SIZE", "10"))
+        self.DB2_POOL_CHECKOUT_TIMEOUT_SECONDS = float(getenv("DB2_POOL_CHECKOUT_TIMEOUT_SECONDS", "30"))
+        self.DB2_POOL_IDLE_TIMEOUT_SECONDS = float(getenv("DB2_POOL_IDLE_TIMEOUT_SECONDS", "300"))
+        self.DB2_POOL_PING_AFTER_SECONDS = float(getenv("DB2_POOL_PING_AFTER_SECONDS", "30"))
+
+        # Prepared statements kept open per pooled Db2 connection (keyed by SQL text)
+        self.DB2_STATEMENT_CACHE_SIZE = int(getenv("DB2_STATEMENT_CACHE_SIZE", "64"))
+
+        # Bulk loading into Db2
+        self.DB2_BULK_CHUNK_SIZE = int(getenv("DB2_BULK_CHUNK_SIZE", "1000"))
+
+        # Rates provider request limits used by api_data_utils
+        self.API_RATE_LIMIT_PER_SECOND = float(getenv("API_RATE_LIMIT_PER_SECOND", "5"))
+        self.API_RATE_LIMIT_BURST = float(getenv("API_RATE_LIMIT_BURST", "5"))
+        self.API_MAX_CONCURRENCY = int(getenv("API_MAX_CONCURRENCY", "8"))
+        self.API_REQUEST_TIMEOUT_SECONDS = float(getenv("API_REQUEST_TIMEOUT_SECONDS", "10"))
+        self.API_SYMBOLS = getenv("API_SYMBOLS", "EGP,USD,EUR,DZD")
+        # Set API_TIMESERIES_ENABLED=false if the provider plan has no timeseries endpoint
+        self.API_TIMESERIES_ENABLED = getenv("API_TIMESERIES_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.API_TIMESERIES_MAX_DAYS = int(getenv("API_TIMESERIES_MAX_DAYS", "365"))
+        # A second provider with the same API, tried after ACCESS_KEY and BACKUP_ACCESS_KEY
+        self.SECONDARY_BASE_URL = getenv("SECONDARY_BASE_URL")
+        self.SECONDARY_ACCESS_KEY = getenv("SECONDARY_ACCESS_KEY")
+        # Retries of a failed provider call, waiting a random time up to base * 2^attempt (capped)
+        self.API_RETRY_ATTEMPTS = int(getenv("API_RETRY_ATTEMPTS", "3"))
+        self.API_RETRY_BASE_DELAY_SECONDS = float(getenv("API_RETRY_BASE_DELAY_SECONDS", "0.5"))
+        self.API_RETRY_MAX_DELAY_SECONDS = float(getenv("API_RETRY_MAX_DELAY_SECONDS", "10"))
+        # Failures in a row that stop the use of one key, and for how long
+        self.API_CIRCUIT_FAILURE_THRESHOLD = int(getenv("API_CIRCUIT_FAILURE_THRESHOLD", "5"))
+        self.API_CIRCUIT_RESET_SECONDS = float(getenv("API_CIRCUIT_RESET_SECONDS", "60"))
+        # Latest-rates calls slower than this get a second, parallel call with the next key (0 = off)
+        self.API_HEDGE_DELAY_SECONDS = float(getenv("API_HEDGE_DELAY_SECONDS", "0.5"))
+
+        # FastAPI service
+        # Threads used to run blocking Db2 lookups off the event loop (defaults to the pool size)
+        self.DB_EXECUTOR_MAX_WORKERS = int(getenv("DB_EXECUTOR_MAX_WORKERS", str(self.DB2_POOL_MAX_SIZE)))
+        self.CORS_ORIGINS = getenv("CORS_ORIGINS", "http://localhost:3000")
+        # Most dates put in one IN (...) list by the batch rate lookup
+        self.BATCH_RATE_QUERY_MAX_DATES = int(getenv("BATCH_RATE_QUERY_MAX_DATES", "500"))
+
+        # Cross-rate matrices served by /latest and /{date}
+        self.CROSS_RATE_CACHE_MAX_DATES = int(getenv("CROSS_RATE_CACHE_MAX_DATES", "1024"))
+        self.CROSS_RATE_WARM_DAYS = int(getenv("CROSS_RATE_WARM_DAYS", "31"))
+        self.LATEST_RATE_DATE_TTL_SECONDS = float(getenv("LATEST_RATE_DATE_TTL_SECONDS", "60"))
+
+        # Historical series served by /history/monthly and /history/yearly
+        self.HISTORY_CACHE_MAX_PERIODS = int(getenv("HISTORY_CACHE_MAX_PERIODS", "256"))
+        # Cache-Control max-age for periods that are over and fully loaded (they never change),
+        # and for the current period or a past one with missing days
+        self.HISTORY_CLOSED_MAX_AGE_SECONDS = int(getenv("HISTORY_CLOSED_MAX_AGE_SECONDS", "31536000"))
+        self.HISTORY_OPEN_MAX_AGE_SECONDS = int(getenv("HISTORY_OPEN_MAX_AGE_SECONDS", "60"))
+        self.GZIP_MINIMUM_SIZE = int(getenv("GZIP_MINIMUM_SIZE", "1000"))
+
+        # Background ETL jobs started from /etl/trigger and /etl/run (see app/services/etl_service.py)
+        self.ETL_JOB_WORKERS = int(getenv("ETL_JOB_WORKERS", "2"))
+        # Jobs waiting for a worker; more are refused until some finish
+        self.ETL_JOB_MAX_QUEUED = int(getenv("ETL_JOB_MAX_QUEUED", "100"))
+        # How often queued and running jobs save their heartbeat (and progress), and how old
+        # a heartbeat must be before the job counts as dead (its API worker stopped)
+        self.ETL_JOB_HEARTBEAT_SECONDS = float(getenv("ETL_JOB_HEARTBEAT_SECONDS", "5"))
+        self.ETL_JOB_STALE_SECONDS = float(getenv("ETL_JOB_STALE_SECONDS", "900"))
+        # Most months one /etl/run request may ask for
+        self.ETL_RUN_MAX_MONTHS = int(getenv("ETL_RUN_MAX_MONTHS", "120"))
+
+        # Logging (see app/utils/log_utils.py)
+        self.LOG_LEVEL = getenv("LOG_LEVEL", "INFO").upper()
+        # "text" for people, "json" for one JSON object per line (log collectors)
+        self.LOG_FORMAT = getenv("LOG_FORMAT", "text").lower()
+        # Per-row events (one per rate or row) are only logged once every N times
+        self.LOG_SAMPLE_EVERY = int(getenv("LOG_SAMPLE_EVERY", "100"))
+
+
+_settings = None
+_settings_lock = threading.Lock()
+
+def _load_env_file():
+    # python-dotenv is optional: without it (or without a .env file) only real
+    # environment variables are used. Variables that are already set are not overridden.
+    env_file = os.getenv("EGP_CONVERTER_ENV_FILE", _DEFAULT_ENV_FILE)
+    if not os.path.isfile(env_file):
+        return
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(dotenv_path=env_file)
+
+def get_settings() -> Settings:
+    """
+    Returns the shared settings, reading the .env file and the environment the first time.
+
+    Returns:
+        Settings: The settings every module uses.
+    """
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _load_env_file()
+                _settings = Settings()
+    return _settings
+
+def __getattr__(name: str):
+    # Called for any name this module does not define itself, e.g. `config.DB2_NAME`.
+    # This builds the settings, so app modules call `get_settings()` where the value is used.
+    # Other names (e.g. '__path__', which the import system asks for) must not build the settings.
+    if name.isupper():
+        settings = get_settings()
+        if name in vars(settings):
+            return getattr(settings, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,11 @@
+-- Baseline: the CURRENCY_RATES table every part of the app reads and writes.
+-- On a database where the table was created by hand, this statement fails with
+-- SQL0601N (already exists) and the migration runner moves on.
+CREATE TABLE ${CURRENCY_RATES} (
+    RATE_ID INTEGER NOT NULL GENERATED BY DEFAULT AS IDENTITY,
+    RATE_DATE DATE NOT NULL,
+    BASE_CURRENCY_CODE VARCHAR(3) NOT NULL,
+    TARGET_CURRENCY_CODE VARCHAR(3) NOT NULL,
+    EXCHANGE_RATE DECIMAL(18, 8) NOT NULL,
+    CONSTRAINT CURRENCY_RATES_PK PRIMARY KEY (RATE_ID)
+);
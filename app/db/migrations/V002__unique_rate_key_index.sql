@@ -0,0 +1,28 @@
+-- One rate per (date, base, target).
+--
+-- Before this index existed, a rerun of the ETL could insert the same rate twice.
+-- Keep the first copy of every rate (lowest RATE_ID) and delete the rest, so the
+-- unique index below can be built.
+DELETE FROM (
+    SELECT ROW_NUMBER() OVER (
+               PARTITION BY RATE_DATE, BASE_CURRENCY_CODE, TARGET_CURRENCY_CODE
+               ORDER BY RATE_ID
+           ) AS COPY_NUMBER
+    FROM ${CURRENCY_RATES}
+) WHERE COPY_NUMBER > 1;
+
+-- The key of every lookup. EXCHANGE_RATE is an INCLUDE column, so "the rate of USD on
+-- 2024-01-02" and "every rate between two dates" are answered from the index alone
+-- (index-only access, no FETCH from the table). It also makes duplicate inserts fail
+-- with SQL0803N every time, which the bulk loader relies on.
+CREATE UNIQUE INDEX CURRENCY_RATES_KEY_UX
+    ON ${CURRENCY_RATES} (RATE_DATE, BASE_CURRENCY_CODE, TARGET_CURRENCY_CODE)
+    INCLUDE (EXCHANGE_RATE);
+
+-- Per-currency access: the ETL's MAX(RATE_DATE) per currency (watermarks) and
+-- "latest rate on or before a date" lookups walk this index from the end.
+CREATE INDEX CURRENCY_RATES_TARGET_DATE_IX
+    ON ${CURRENCY_RATES} (TARGET_CURRENCY_CODE, RATE_DATE DESC)
+    ALLOW REVERSE SCANS;
+
+CALL SYSPROC.ADMIN_CMD('RUNSTATS ON TABLE ' || CURRENT SCHEMA || '.${CURRENCY_RATES} WITH DISTRIBUTION AND DETAILED INDEXES ALL');
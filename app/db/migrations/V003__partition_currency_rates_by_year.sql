@@ -0,0 +1,20 @@
+-- Range-partition CURRENCY_RATES by year of RATE_DATE.
+--
+-- Db2 cannot add partitioning to an existing table with ALTER TABLE, so the table is
+-- rebuilt online with ADMIN_MOVE_TABLE: it keeps the table readable and writable while
+-- the rows are copied, and recreates the indexes (as partitioned indexes) on the new table.
+-- Range scans then only open the partitions (years) they need, and old years can be
+-- detached or archived without touching the rest.
+--
+-- Partitions exist for 1990 to 2049. Add later years before they are needed, e.g.:
+--   ALTER TABLE CURRENCY_RATES ADD PARTITION STARTING '2050-01-01' ENDING '2050-12-31';
+CALL SYSPROC.ADMIN_MOVE_TABLE(
+    CURRENT SCHEMA,
+    '${CURRENCY_RATES}',
+    '', '', '', '', '',
+    '(RATE_DATE) (STARTING ''1990-01-01'' ENDING ''2049-12-31'' EVERY 1 YEAR)',
+    '', '',
+    'MOVE'
+);
+
+CALL SYSPROC.ADMIN_CMD('RUNSTATS ON TABLE ' || CURRENT SCHEMA || '.${CURRENCY_RATES} WITH DISTRIBUTION AND DETAILED INDEXES ALL');
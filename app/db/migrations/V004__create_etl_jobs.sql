@@ -0,0 +1,26 @@
+-- Background ETL jobs started from /etl/trigger and /etl/run (see app/services/etl_service.py).
+-- One row per job, so /etl/status survives a restart and every API worker sees the same jobs.
+--
+-- ACTIVE_KEY holds the job's (year, month) key, e.g. '2024-05', while the job is queued or
+-- running, and NULL once it has finished. The unique index ignores NULLs, so at most one
+-- active job per month can exist across all API workers; finished jobs are kept as history.
+CREATE TABLE ETL_JOBS (
+    JOB_ID VARCHAR(36) NOT NULL,
+    JOB_KEY VARCHAR(7) NOT NULL,
+    ACTIVE_KEY VARCHAR(7),
+    STATUS VARCHAR(16) NOT NULL,
+    REQUESTED_AT TIMESTAMP NOT NULL,
+    STARTED_AT TIMESTAMP,
+    FINISHED_AT TIMESTAMP,
+    HEARTBEAT_AT TIMESTAMP NOT NULL,
+    DAYS_TOTAL INTEGER NOT NULL DEFAULT 0,
+    DAYS_FETCHED INTEGER NOT NULL DEFAULT 0,
+    ROWS_LOADED INTEGER NOT NULL DEFAULT 0,
+    ERROR VARCHAR(1000),
+    CONSTRAINT ETL_JOBS_PK PRIMARY KEY (JOB_ID)
+);
+
+CREATE UNIQUE INDEX ETL_JOBS_ACTIVE_KEY_UX ON ETL_JOBS (ACTIVE_KEY) EXCLUDE NULL KEYS;
+
+-- /etl/status lists the most recent jobs first.
+CREATE INDEX ETL_JOBS_REQUESTED_AT_IX ON ETL_JOBS (REQUESTED_AT DESC);
@@ -0,0 +1,12 @@
+-- Rates the provider was asked for and did not return (see app/etl/main_etl.py).
+--
+-- The provider has no rate for some currencies on some (mostly old) dates, and a zero or
+-- negative rate is dropped by the transform step. Without this table the incremental ETL
+-- would count those (date, currency) pairs as missing on every run and ask the provider
+-- for them again, so re-running a loaded period would never be free.
+CREATE TABLE RATE_GAPS (
+    RATE_DATE DATE NOT NULL,
+    TARGET_CURRENCY_CODE VARCHAR(3) NOT NULL,
+    RECORDED_AT TIMESTAMP NOT NULL,
+    CONSTRAINT RATE_GAPS_PK PRIMARY KEY (RATE_DATE, TARGET_CURRENCY_CODE)
+);
@@ -19,10 +19,6 @@ def _extract_historical_month_data(year: int, month: int):
         RuntimeError: If there's a problem connecting to the currency service
                       or if something else unexpected goes wrong.
     """
-    # This line is mostly for checking and can be removed in the final code.
-    # It prints the type of 'year' and 'month' to help during development.
-    print(type(year), " : ", type(month))
-
     # Check if 'year' is a whole number. If not, stop and show an error.
     if not isinstance(year, int):
         raise TypeError("year should be a whole number (integer)")
@@ -76,6 +72,52 @@ def _extract_historical_year_data(year):
         # If any other unexpected problem happens, it will stop and show a general error.
         raise RuntimeError(f"An unexpected error occurred during data fetching. Details: {e}")
 
+def _extract_historical_dates_data(dates: list) -> dict:
+    """
+    Gets historical currency exchange rates for a specific list of dates.
+
+    Dates that follow each other are grouped into ranges and fetched with the
+    provider's timeseries endpoint; dates on their own are fetched one by one.
+    This is what the incremental ETL uses to fetch only the dates it is missing.
+
+    Args:
+        dates (list): The dates to fetch (date objects or 'YYYY-MM-DD' strings).
+
+    Returns:
+        dict: A dictionary where keys are the dates ('YYYY-MM-DD') and values are
+              the currency rates for that day.
+
+    Raises:
+        RuntimeError: If there's a problem connecting to the currency service
+                      or if something else unexpected goes wrong.
+    """
+    try:
+        wanted = sorted({api_data_utils._to_date(d) for d in dates})
+        # Group the dates into runs of consecutive days, e.g. [1, 2, 3, 7] -> [(1, 3), (7, 7)].
+        runs = []
+        for day in wanted:
+            if runs and (day - runs[-1][1]).days == 1:
+                runs[-1][1] = day
+            else:
+                runs.append([day, day])
+
+        fetched = {}
+        single_days = [(start.year, start.month, start.day) for start, end in runs if start == end]
+        for (y, m, d), data in api_data_utils._fetch_currency_data_for_dates(single_days).items():
+            fetched[f"{y}-{m:02d}-{d:02d}"] = data
+        for start, end in runs:
+            if start != end:
+                for day, data in api_data_utils._fetch_currency_data_for_range(start, end).items():
+                    fetched[day.isoformat()] = data
+        return dict(sorted(fetched.items()))
+    except (ConnectionError, TimeoutError):
+        # If the script can't connect to the online service or if it takes too long,
+        # it will stop and show an error message.
+        raise RuntimeError("Failed to connect to the currency rates API")
+    except Exception as e:
+        # If any other unexpected problem happens, it will stop and show a general error.
+        raise RuntimeError(f"An unexpected error occurred during data fetching. Details: {e}")
+
 def _extract_historical_data_from_db(table_name = "historical_rates_2013_05"):
     """
     Gets historical currency exchange rates from a database table.
@@ -147,3 +189,20 @@ def _fetch_historical_data_from_csv(csv_file_name = "/Users/ahmednader/Desktop/C
     """
     # This calls a CSV tool (_read_from_csv) to read information from the specified CSV file.
     return csv_utils._read_from_csv(csv_file_name)
+
+def _extract_historical_rate_chunks_from_csv(csv_file_name, chunk_size: int = 50000):
+    """
+    Streams the rates stored in a legacy CSV file (historical.csv or rates.csv format).
+
+    Unlike `_fetch_historical_data_from_csv`, which returns the whole file as one
+    unparsed text, this parses the file line by line and hands back the rates in
+    column chunks, so years of archived snapshots can be reloaded with bounded memory.
+
+    Args:
+        csv_file_name (str): The full path and name of the legacy CSV file.
+        chunk_size (int, optional): The most rates per chunk. Defaults to 50000.
+
+    Returns:
+        generator: Yields {'date': [...], 'base': [...], 'target': [...], 'rate': array('d')} chunks.
+    """
+    return csv_utils._iter_legacy_rate_column_chunks(csv_file_name, chunk_size)
@@ -9,3 +9,6 @@ def _get_currency_data_for_year(year) -> dict:
 # --- Fetch currency data for a time series (30 consecutive days at most)
 def _get_currency_data_for_time_series(year: int, month: int, start_day: int, end_day: int) -> dict:
     return api_data_utils._fetch_currency_data_for_time_series(year,month,start_day,end_day)
+# --- Fetch currency data for any date range (timeseries calls, single-day calls only for gaps)
+def _get_currency_data_for_range(start_date, end_date) -> dict:
+    return api_data_utils._fetch_currency_data_for_range(start_date, end_date)
@@ -1,5 +1,12 @@
-import pandas as pd
+import logging
 from ..utils import csv_utils
+from ..utils.import_utils import _lazy_import
+from .transform import _explode_rates_to_long_df
+
+# pyarrow and pandas are only imported when a snapshot is actually written.
+snapshot_utils = _lazy_import("..utils.snapshot_utils", __package__)
+
+logger = logging.getLogger(__name__)
 
 def _load_rates_to_csv(csv_file_name, dataframe):
     """
@@ -27,16 +34,47 @@ def _load_rates_to_csv(csv_file_name, dataframe):
     except AttributeError as e:
         # This error happens if the script can't find the saving tool.
         # It means 'csv_utils' might be missing something important.
-        print("Problem accessing csv_utils._load_dataframe_to_csv")
+        logger.error("Problem accessing csv_utils._load_dataframe_to_csv")
         return False
     except FileNotFoundError as e:
         # This error happens if the computer can't find the place to save the file,
         # or if it doesn't have permission to save there.
-        print(f"Error: The specified file path '{csv_file_name}' was not found or accessible.")
+        logger.error("The specified file path '%s' was not found or accessible.", csv_file_name)
         return False
     except TypeError as e:
         # This error happens if the 'csv_utils._load_dataframe_to_csv' tool
         # was given the wrong kind of information (e.g., something that is not a file name
         # or something that is not a dataframe).
-        print("Error: Type mismatch when calling _load_dataframe_to_csv.")
+        logger.error("Type mismatch when calling _load_dataframe_to_csv.")
+        return False
+
+def _load_rates_to_snapshot(snapshot_root, dataframe):
+    """
+    Saves a table of currency rates into a columnar (Parquet) snapshot folder.
+
+    Unlike the CSV files, a snapshot keeps typed columns, is compressed, and is split
+    into one folder per year and month, so one month can be read back without scanning
+    the whole archive (see snapshot_utils._read_rates_snapshot).
+
+    Args:
+        snapshot_root (str): The snapshot folder, e.g. "data/snapshots".
+        dataframe (pd.DataFrame): Either a long table with 'date', 'base', 'target' and 'rate'
+                                  columns, or the (date, base, rates) table made by
+                                  transform._prepare_data_columns.
+
+    Returns:
+        bool: Returns True if the data was saved successfully.
+              Returns False if there was a problem saving the data.
+    """
+    try:
+        if 'rates' in dataframe.columns:
+            # Expand the nested 'rates' dictionaries into one row per rate first.
+            dataframe = _explode_rates_to_long_df(dataframe.to_dict('records'))
+        snapshot_utils._write_rates_snapshot(snapshot_root, dataframe)
+        return True
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error("The rates table could not be written as a snapshot: %s", e)
+        return False
+    except OSError as e:
+        logger.error("The snapshot folder '%s' could not be written: %s", snapshot_root, e)
         return False
@@ -1,116 +1,472 @@
-import pandas as pd
-from .export import _extract_historical_year_data, _extract_historical_month_data
-from .transform import _prepare_data_columns, _load_json_into_df, _parse_and_fix_json_string
+from __future__ import annotations
+import calendar
+import logging
+from datetime import date, datetime, timezone
+from .export import (_extract_historical_year_data, _extract_historical_month_data, _extract_historical_dates_data,
+                     _extract_historical_rate_chunks_from_csv)
+from .transform import _explode_rates_to_long_df, _long_df_to_load_rows
+from ..utils import api_data_utils
+from ..utils.import_utils import _lazy_import
 from ..utils import db2_utils
-from ..utils import conversion_utils
+from ..utils import cache_utils
+from ..utils import log_utils
+from ..utils.metrics_utils import _record_etl_load
+from ..core.config import get_settings
+
+pd = _lazy_import("pandas") # Imported the first time a pipeline actually runs
+
+logger = logging.getLogger(__name__)
+
+# Columns of the CURRENCY_RATES table filled by the load step, with the Db2 types
+# used to type the MERGE parameter markers and the columns that identify a rate.
+RATE_COLUMN_NAMES = ['rate_date', 'base_currency_code', 'target_currency_code', 'exchange_rate']
+RATE_COLUMN_TYPES = ['DATE', 'VARCHAR(3)', 'VARCHAR(3)', 'DOUBLE']
+RATE_KEY_COLUMNS = ['rate_date', 'base_currency_code', 'target_currency_code']
+
+# The table created by app/db/migrations/V005__create_rate_gaps.sql: (date, currency) rates
+# the provider was asked for and did not return, so incremental runs stop asking for them.
+RATE_GAPS = "RATE_GAPS"
+GAP_COLUMN_NAMES = ['rate_date', 'target_currency_code', 'recorded_at']
+GAP_COLUMN_TYPES = ['DATE', 'VARCHAR(3)', 'TIMESTAMP']
+GAP_KEY_COLUMNS = ['rate_date', 'target_currency_code']
 
 def _process_historical_data(historical_data_raw: dict) -> pd.DataFrame:
     """
-    Processes raw historical data by parsing, loading into a DataFrame, and preparing columns.
+    Processes raw historical data into a long table with one row per rate.
+
+    The API responses are used as dictionaries directly (only legacy string entries
+    are parsed), and their nested 'rates' are expanded in one vectorized step by
+    `_explode_rates_to_long_df`.
 
     Args:
-        historical_data_raw (dict): A dictionary containing raw historical data,
-                                    where values are expected to be JSON-like strings.
+        historical_data_raw (dict): A dictionary of raw API responses (e.g., day -> response).
 
     Returns:
-        pd.DataFrame: A processed Pandas DataFrame containing historical currency rates,
+        pd.DataFrame: A table with 'date', 'base', 'target' and 'rate' columns,
                       or an empty DataFrame if processing fails at any stage.
     """
-    historical_list_of_dicts = []
-    # Iterate through the raw data and attempt to parse each item
-    for hist_data_item in historical_data_raw.values():
-        try:
-            # Parse and fix potentially malformed JSON strings
-            parsed_item = _parse_and_fix_json_string(str(hist_data_item))
-            historical_list_of_dicts.append(parsed_item)
-        except (ValueError, TypeError) as e:
-            # Skip entries that cannot be parsed and log the error
-            print(f"Skipping malformed data entry: {e}")
-            continue
-
-    # If no valid data is parsed, return an empty DataFrame
-    if not historical_list_of_dicts:
-        print("No valid data to process after parsing.")
+    try:
+        rates_df = _explode_rates_to_long_df(historical_data_raw)
+    except (ValueError, KeyError, TypeError) as e:
+        # Handle errors while building or validating the rates table
+        logger.error("Error preparing rates table: %s", e)
         return pd.DataFrame()
 
-    # Load the list of dictionaries into a Pandas DataFrame
-    df = _load_json_into_df(historical_list_of_dicts)
-    if df.empty:
-        print("DataFrame is empty after loading JSON.")
-        return pd.DataFrame()
+    if rates_df.empty:
+        logger.warning("No valid data to process after parsing.")
+    return rates_df
+
+def _get_expected_dates(year: int, month: int = None) -> list:
+    """
+    Lists the dates a pipeline run is supposed to cover.
+
+    A month run covers every day of the month; a year run covers the first day of
+    each month (the same dates `_extract_historical_year_data` samples). Dates
+    after today are left out because the provider has no rates for them yet.
+
+    Args:
+        year (int): The year of the run.
+        month (int, optional): The month (1-12). If None, the run covers the year.
+
+    Returns:
+        list: The dates (date objects) in order.
+
+    Raises:
+        ValueError: If the year or month is not valid.
+    """
+    year = int(year)
+    if month:
+        month = int(month)
+        if month < 1 or month > 12:
+            raise ValueError("month should be in range 1-12")
+        dates = [date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+    else:
+        dates = [date(year, m, 1) for m in range(1, 13)]
+    return [d for d in dates if d <= date.today()]
+
+def _get_currency_watermarks(conn) -> dict:
+    """
+    Gets the high-water mark (latest loaded RATE_DATE) of every currency.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+
+    Returns:
+        dict: A dictionary like {'USD': date(2024, 5, 31), 'EGP': date(2024, 5, 30)}.
+    """
+    query = ("SELECT TARGET_CURRENCY_CODE, MAX(RATE_DATE) AS MAX_RATE_DATE "
+             "FROM CURRENCY_RATES GROUP BY TARGET_CURRENCY_CODE")
+    return {
+        row.TARGET_CURRENCY_CODE.strip(): date.fromisoformat(str(row.MAX_RATE_DATE))
+        for row in db2_utils._run_query_records(conn, query)
+    }
 
+def _get_known_gaps(conn, start_date: date, end_date: date) -> set:
+    """
+    Reads the (date, currency) rates a previous run found the provider does not have.
+
+    Returns:
+        set: ('YYYY-MM-DD', currency code) pairs. Empty if the RATE_GAPS table cannot be read
+             (e.g. migration V005 has not run yet); every missing rate is then fetched.
+    """
+    query = f"SELECT RATE_DATE, TARGET_CURRENCY_CODE FROM {RATE_GAPS} WHERE RATE_DATE BETWEEN ? AND ?"
     try:
-        # Prepare and clean the DataFrame columns (e.g., convert data types, rename)
-        rates_df = _prepare_data_columns(df)
-        return rates_df
-    except (ValueError, KeyError, RuntimeError) as e:
-        # Handle errors during data preparation
-        print(f"Error preparing data columns: {e}")
-        return pd.DataFrame()
+        rows = db2_utils._run_query(conn, query, (start_date.isoformat(), end_date.isoformat()))
+    except Exception as e:
+        logger.warning("Could not read %s, fetching every missing rate: %s", RATE_GAPS, e)
+        return set()
+    return {(str(row_date), row_code.strip()) for row_date, row_code in rows}
 
-def run_historical_pipeline(year, month=None):
+def _record_rate_gaps(missing_rates: dict, returned_keys: set):
+    """
+    Saves the missing rates the provider did not return, so later runs skip them.
+
+    Only days that are over and that the provider answered (with at least one rate) are
+    saved. A day whose download failed, or today (whose rates can still be published),
+    is asked for again by the next run. A rate the transform step dropped (zero or
+    negative) counts as not returned.
+
+    Args:
+        missing_rates (dict): 'YYYY-MM-DD' -> the currency codes that were asked for.
+        returned_keys (set): 'YYYY-MM-DD|CODE' keys of every rate the provider returned.
+    """
+    today = date.today().isoformat()
+    answered_days = {key.split('|')[0] for key in returned_keys}
+    recorded_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = [(day, code, recorded_at)
+            for day, codes in sorted(missing_rates.items()) if day < today and day in answered_days
+            for code in sorted(codes) if f"{day}|{code}" not in returned_keys]
+    if not rows:
+        return
+    try:
+        with db2_utils._pooled_connection() as conn:
+            db2_utils._bulk_insert_to_db(conn, RATE_GAPS, GAP_COLUMN_NAMES, rows, mode="merge",
+                                         key_columns=GAP_KEY_COLUMNS, column_types=GAP_COLUMN_TYPES)
+        logger.info("The provider has no rate for %d of the requested (date, currency) pairs; "
+                    "later runs will not ask for them again.", len(rows))
+    except Exception as e:
+        logger.warning("Could not save %d rates the provider does not have to %s: %s", len(rows), RATE_GAPS, e)
+
+def _find_missing_rates(conn, expected_dates: list, currencies: list) -> dict:
+    """
+    Works out which (date, currency) rates are not in CURRENCY_RATES yet.
+
+    Every expected date after a currency's high-water mark is missing for that
+    currency without looking any further. Only the part of the range up to the
+    highest high-water mark is checked, with one query that reads the
+    (date, currency) pairs already loaded there, so gaps in older data are found too.
+    Rates recorded in RATE_GAPS (the provider does not have them) are not missing.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        expected_dates (list): The dates the run should cover (date objects).
+        currencies (list): The currency codes every date should have.
+
+    Returns:
+        dict: Maps each date ('YYYY-MM-DD') that has missing rates to the set of
+              currency codes missing for it. Empty if everything is loaded.
+    """
+    if not expected_dates:
+        return {}
+    watermarks = _get_currency_watermarks(conn)
+    highest_watermark = max((watermarks.get(code) or date.min) for code in currencies)
+
+    loaded = set()
+    checked_dates = [d for d in expected_dates if d <= highest_watermark]
+    if checked_dates:
+        query = "SELECT RATE_DATE, TARGET_CURRENCY_CODE FROM CURRENCY_RATES WHERE RATE_DATE BETWEEN ? AND ?"
+        loaded = {(str(row_date), row_code.strip())
+                  for row_date, row_code in db2_utils._run_query(
+                      conn, query, (checked_dates[0].isoformat(), checked_dates[-1].isoformat()))}
+
+    known_gaps = _get_known_gaps(conn, expected_dates[0], expected_dates[-1])
+
+    missing = {}
+    for day in expected_dates:
+        for code in currencies:
+            if (day.isoformat(), code) in known_gaps:
+                continue
+            watermark = watermarks.get(code)
+            if watermark is not None and day <= watermark and (day.isoformat(), code) in loaded:
+                continue
+            missing.setdefault(day.isoformat(), set()).add(code)
+    return missing
+
+class EtlCancelledError(Exception):
+    pass # raised inside a pipeline run when its job was cancelled (see etl_service)
+
+def _report_progress(progress, **counts):
+    # Passes counts such as days_fetched=31 to the job running this pipeline, if there is one.
+    if progress is not None:
+        progress.update(**counts)
+
+def _check_cancelled(progress):
+    # Called between steps, so a cancelled job stops at the next step instead of finishing.
+    if progress is not None and progress.is_cancelled():
+        raise EtlCancelledError("The ETL job was cancelled.")
+
+def run_historical_pipeline(year, month=None, load_mode="merge", chunk_size=None, incremental=True, progress=None):
     """
     Runs the data pipeline to extract, process, and load historical currency rates
     for either a full year or a specific month if provided.
 
+    Rows are loaded in bulk with `db2_utils._bulk_insert_to_db`. In the default "merge"
+    mode, rates that are already in the table are skipped by Db2 instead of failing
+    one by one with SQL0803N.
+
+    In incremental mode (the default) the pipeline first checks CURRENCY_RATES and
+    only fetches and loads the (date, currency) rates that are missing, so re-running
+    a period that is already loaded makes no API calls and no inserts. Rates the provider
+    was asked for on a past day and did not return are saved in RATE_GAPS and not asked
+    for again; a day whose download failed, and today, are.
+
     Args:
         year (int): The year of historical data to extract.
         month (int, optional): The month (1-12). If None, extracts the full year.
+        load_mode (str, optional): "merge" (default) or "insert", see `_bulk_insert_to_db`.
+        chunk_size (int, optional): Rows per commit. Defaults to DB2_BULK_CHUNK_SIZE.
+        incremental (bool, optional): Only fetch and load missing rates. Defaults to True.
+        progress (optional): The background job running this pipeline (see etl_service.EtlJob).
+                             It is told the days to fetch, the days fetched and the rows
+                             loaded, and asked between steps whether it was cancelled.
+
+    Returns:
+        dict: "days_total", "days_fetched", "inserted", "duplicates", "failed" and "error"
+              (None, or why the run stopped early).
+
+    Raises:
+        EtlCancelledError: If the job in `progress` was cancelled.
     """
+    result = {"days_total": 0, "days_fetched": 0, "inserted": 0, "duplicates": 0, "failed": 0, "error": None}
     historical_data_raw = None
+    missing_rates = None
     try:
-        if month:
-            formatted_month = conversion_utils._format_date_component(month)
-            historical_data_raw = _extract_historical_month_data(year, formatted_month)
-            print(f"Extracted data for {year}-{month:02d}")
+        if incremental:
+            expected_dates = _get_expected_dates(year, month)
+            currencies = [code.strip() for code in get_settings().API_SYMBOLS.split(",") if code.strip()]
+            try:
+                with db2_utils._pooled_connection() as conn:
+                    missing_rates = _find_missing_rates(conn, expected_dates, currencies)
+            except Exception as e:
+                logger.error("Database error while checking loaded rates: %s", e)
+                result["error"] = f"Database error while checking loaded rates: {e}"
+                return result
+            if not missing_rates:
+                logger.info("All rates for %s%s are already loaded. Nothing to fetch.", year, f"-{month:02d}" if month else "")
+                return result
+            logger.info("%s of %s dates have missing rates. Fetching only those.", len(missing_rates), len(expected_dates))
+            result["days_total"] = len(missing_rates)
+            _report_progress(progress, days_total=result["days_total"])
+            _check_cancelled(progress)
+            historical_data_raw = _extract_historical_dates_data(sorted(missing_rates))
+        elif month:
+            result["days_total"] = len(_get_expected_dates(year, month))
+            _report_progress(progress, days_total=result["days_total"])
+            historical_data_raw = _extract_historical_month_data(year, month)
+            logger.info("Extracted data for %s-%02d", year, month)
         else:
+            result["days_total"] = len(_get_expected_dates(year))
+            _report_progress(progress, days_total=result["days_total"])
             historical_data_raw = _extract_historical_year_data(year)
-            print(f"Extracted data for year {year}")
+            logger.info("Extracted data for year %s", year)
     except ValueError:
-        print("Invalid year or month entered. Please enter numbers.")
-        return
+        logger.error("Invalid year or month entered. Please enter numbers.")
+        result["error"] = "Invalid year or month."
+        return result
 
     if historical_data_raw is None:
-        print("No historical data extracted. Exiting.")
-        return
+        logger.warning("No historical data extracted. Exiting.")
+        result["error"] = "No historical data extracted."
+        return result
+    result["days_fetched"] = len(historical_data_raw)
+    _report_progress(progress, days_fetched=result["days_fetched"])
+    _check_cancelled(progress)
 
     rates_df = _process_historical_data(historical_data_raw)
     if rates_df.empty:
-        print("No rates data to load into the database. Exiting.")
-        return
+        logger.warning("No rates data to load into the database. Exiting.")
+        result["error"] = "No rates data to load."
+        return result
+
+    if missing_rates is not None:
+        # Only load the rates that were missing; the rest are already in the table.
+        missing_keys = {f"{day}|{code}" for day, codes in missing_rates.items() for code in codes}
+        rate_keys = rates_df['date'].dt.strftime('%Y-%m-%d') + '|' + rates_df['target'].astype(str)
+        _record_rate_gaps(missing_rates, set(rate_keys))
+        rates_df = rates_df[rate_keys.isin(missing_keys).to_numpy()]
 
-    print(rates_df)
+    # The whole table is only formatted when DEBUG logging is on.
+    logger.debug("Rates to load:\n%s", rates_df)
+    rows = _long_df_to_load_rows(rates_df)
 
-    conn = None
+    chunk_size = chunk_size or get_settings().DB2_BULK_CHUNK_SIZE
+    report = {"inserted": 0, "duplicates": 0, "failed": 0, "chunks": 0}
     try:
-        conn = db2_utils._connect_to_database()
-        if conn:
-            print("\nConnected to Db2. Inserting data...")
-            for index, row in rates_df.iterrows():
-                rate_date = row['date']
-                base_currency_code = row['base']
-                target_currency_code_dict = row['rates']
-
-                for target_code, exchange_rate in target_currency_code_dict.items():
-                    try:
-                        db2_utils._insert_to_db(
-                            conn,
-                            "CURRENCY_RATES",
-                            ['rate_date', 'base_currency_code', 'target_currency_code', 'exchange_rate'],
-                            [rate_date, base_currency_code, target_code, exchange_rate]
-                        )
-                        print(f"Inserted: Date={rate_date}, Base={base_currency_code}, Target={target_code}, Rate={exchange_rate}")
-                    except Exception as e:
-                        if "SQL0803N" in str(e):
-                            print(f"Duplicate record skipped: {rate_date}, {base_currency_code}, {target_code}")
-                        else:
-                            print(f"Failed to insert: {rate_date}, {base_currency_code}, {target_code}. Error: {e}")
-
-            print("Data insertion completed.")
-        else:
-            print("Could not establish a database connection. Skipping insertion.")
+        # Borrow one pooled connection for the whole load instead of opening a new one.
+        with db2_utils._pooled_connection() as conn:
+            logger.info("Connected to Db2. Inserting %d rows...", len(rows))
+            # One chunk (and one commit) at a time, so progress is reported and a
+            # cancelled job stops between chunks.
+            for start in range(0, len(rows), chunk_size):
+                _check_cancelled(progress)
+                chunk_report = db2_utils._bulk_insert_to_db(
+                    conn,
+                    "CURRENCY_RATES",
+                    RATE_COLUMN_NAMES,
+                    rows[start:start + chunk_size],
+                    chunk_size=chunk_size,
+                    mode=load_mode,
+                    key_columns=RATE_KEY_COLUMNS,
+                    column_types=RATE_COLUMN_TYPES,
+                )
+                for key in report:
+                    report[key] += chunk_report[key]
+                _report_progress(progress, rows_loaded=report["inserted"])
+            logger.info("Inserted %d rows, skipped %d duplicates, %d failed (%d chunks).",
+                        report['inserted'], report['duplicates'], report['failed'], report['chunks'])
+            logger.info("Data insertion completed.")
+    except EtlCancelledError:
+        raise
+    except Exception as e:
+        logger.error("Database error: %s", e)
+        result["error"] = f"Database error: {e}"
+    finally:
+        _record_etl_load("historical", report)
+        # Drop any cached rates for the dates we just loaded so the API serves the new rows.
+        if report["inserted"]:
+            cache_utils._invalidate_rates(rate_dates=sorted({row[0] for row in rows}),
+                                        currency_codes=sorted({row[2] for row in rows}))
+        for key in ("inserted", "duplicates", "failed"):
+            result[key] = report[key]
+    return result
+
+def _load_rates_df_to_db(rates_df: pd.DataFrame, pipeline: str, load_mode: str = "merge", chunk_size: int = None) -> dict:
+    """
+    Loads an already transformed rates table into CURRENCY_RATES.
+
+    Used by callers that run the extract and transform steps themselves, like the
+    Airflow DAG (which passes the table between its tasks as a file).
+
+    Args:
+        rates_df (pd.DataFrame): A table with 'date', 'base', 'target' and 'rate' columns.
+        pipeline (str): The pipeline name recorded in /metrics, e.g. 'airflow'.
+        load_mode (str, optional): "merge" (default) or "insert", see `_bulk_insert_to_db`.
+        chunk_size (int, optional): Rows per commit. Defaults to DB2_BULK_CHUNK_SIZE.
+
+    Returns:
+        dict: The "inserted", "duplicates", "failed" and "chunks" counts.
+    """
+    rows = _long_df_to_load_rows(rates_df)
+    if not rows:
+        return {"inserted": 0, "duplicates": 0, "failed": 0, "chunks": 0}
+    with db2_utils._pooled_connection() as conn:
+        report = db2_utils._bulk_insert_to_db(
+            conn,
+            "CURRENCY_RATES",
+            RATE_COLUMN_NAMES,
+            rows,
+            chunk_size=chunk_size or get_settings().DB2_BULK_CHUNK_SIZE,
+            mode=load_mode,
+            key_columns=RATE_KEY_COLUMNS,
+            column_types=RATE_COLUMN_TYPES,
+        )
+    _record_etl_load(pipeline, report)
+    if report["inserted"]:
+        cache_utils._invalidate_rates(rate_dates=sorted({row[0] for row in rows}),
+                                    currency_codes=sorted({row[2] for row in rows}))
+    return report
+
+def run_single_date_pipeline(rate_date) -> dict:
+    """
+    Fetches, loads and returns the rates of one date.
+
+    Used by the API when a conversion asks for a date that is not loaded yet: one provider
+    call for the date, a MERGE load of its rates, and the caches for that date are dropped.
+
+    Args:
+        rate_date (str | date): The date to load (YYYY-MM-DD).
+
+    Returns:
+        dict: The loaded EUR to X rates of that date, e.g. {'USD': 1.09, 'EGP': 33.7}.
+              Empty if the provider has no rates for that exact date.
+              None if the provider could not be reached or the load failed.
+    """
+    day = date.fromisoformat(str(rate_date))
+    payload = api_data_utils._get_api_data_for_date(day.year, day.month, day.day)
+    if not payload:
+        return None
+
+    rates_df = _process_historical_data({day.isoformat(): payload})
+    if rates_df.empty:
+        return {}
+    # The provider may answer with the closest date it has (e.g. the Friday before a weekend).
+    rates_df = rates_df[(rates_df['date'].dt.strftime('%Y-%m-%d') == day.isoformat()).to_numpy()]
+    if rates_df.empty:
+        return {}
+
+    rows = _long_df_to_load_rows(rates_df)
+    try:
+        with db2_utils._pooled_connection() as conn:
+            report = db2_utils._bulk_insert_to_db(
+                conn,
+                "CURRENCY_RATES",
+                RATE_COLUMN_NAMES,
+                rows,
+                mode="merge",
+                key_columns=RATE_KEY_COLUMNS,
+                column_types=RATE_COLUMN_TYPES,
+            )
     except Exception as e:
-        print(f"Database error: {e}")
+        logger.error("Database error while loading rates for %s: %s", day.isoformat(), e)
+        return None
+    _record_etl_load("on_demand", report)
+    if report["failed"]:
+        return None
+    logger.info("Loaded rates for %s on demand: %s inserted, %s already there.", day.isoformat(), report['inserted'], report['duplicates'])
+    cache_utils._invalidate_rates(rate_dates=[day.isoformat()], currency_codes=sorted({row[2] for row in rows}))
+    return {target: rate for _, _, target, rate in rows}
+
+def run_csv_backfill(csv_file_name, load_mode="merge", chunk_size=None) -> dict:
+    """
+    Reloads a legacy CSV archive (historical.csv or rates.csv format) into CURRENCY_RATES.
+
+    The file is streamed in chunks of `chunk_size` rates and each chunk is bulk
+    loaded before the next one is read, so memory stays bounded however large the
+    archive is. In "merge" mode rates that are already in the table are skipped.
+
+    Args:
+        csv_file_name (str): The path of the legacy CSV file.
+        load_mode (str, optional): "merge" (default) or "insert", see `_bulk_insert_to_db`.
+        chunk_size (int, optional): Rates per chunk and commit. Defaults to DB2_BULK_CHUNK_SIZE.
+
+    Returns:
+        dict: The total "inserted", "duplicates", "failed" and "chunks" counts.
+    """
+    chunk_size = chunk_size or get_settings().DB2_BULK_CHUNK_SIZE
+    totals = {"inserted": 0, "duplicates": 0, "failed": 0, "chunks": 0}
+    with db2_utils._pooled_connection() as conn:
+        for columns in _extract_historical_rate_chunks_from_csv(csv_file_name, chunk_size):
+            rows = list(zip(columns["date"], columns["base"], columns["target"], columns["rate"]))
+            report = db2_utils._bulk_insert_to_db(
+                conn,
+                "CURRENCY_RATES",
+                RATE_COLUMN_NAMES,
+                rows,
+                chunk_size=chunk_size,
+                mode=load_mode,
+                key_columns=RATE_KEY_COLUMNS,
+                column_types=RATE_COLUMN_TYPES,
+            )
+            for key in totals:
+                totals[key] += report[key]
+            if report["inserted"]:
+                cache_utils._invalidate_rates(rate_dates=sorted(set(columns["date"])),
+                                            currency_codes=sorted(set(columns["target"])))
+    logger.info("Backfill from %s: inserted %d rows, skipped %d duplicates, %d failed.",
+                csv_file_name, totals['inserted'], totals['duplicates'], totals['failed'])
+    _record_etl_load("csv_backfill", totals)
+    return totals
 
 if __name__ == "__main__":
+    log_utils._configure_logging()
     run_historical_pipeline(2000)
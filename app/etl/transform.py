@@ -1,6 +1,12 @@
-import pandas as pd
+from __future__ import annotations
 import json
-print("this is transform module")
+import logging
+from ..utils.import_utils import _lazy_import
+from ..utils.log_utils import _log_sampled
+
+pd = _lazy_import("pandas") # Imported the first time a transform actually runs
+logger = logging.getLogger(__name__)
+
 def _split_string_into_lines(historical_data: str) -> list:
     """
     Breaks a long text into a list of shorter texts (lines).
@@ -104,7 +110,7 @@ def _reformat_list_of_json_strings(unformatted_list_of_strings: list) -> list:
         except (ValueError, TypeError) as e:
             # If a JSON text cannot be read, it prints a warning and adds an empty spot (None)
             # to the list so that the list still has the correct number of items.
-            print(f"Warning: Failed to parse item, Details {e}")
+            logger.warning("Failed to parse item, Details %s", e)
             json_data.append(None)
     return json_data
 
@@ -169,3 +175,139 @@ def _prepare_data_columns(historical_data_frame: pd.DataFrame) -> pd.DataFrame:
     except Exception as e:
         # If any other problem happens, it tells you that something went wrong while preparing the columns.
         raise RuntimeError(f"An unexpected error occurred during column preparation: {e}") from e
+
+# Column order and dtypes of the long-format rates table produced by `_explode_rates_to_long_df`.
+LONG_RATE_COLUMNS = ['date', 'base', 'target', 'rate']
+LONG_RATE_DTYPES = {'date': 'datetime64[ns]', 'base': 'category', 'target': 'category', 'rate': 'float64'}
+
+def _coerce_api_payloads(raw_payloads) -> list:
+    """
+    Turns the extracted API responses into a list of dictionaries.
+
+    The payloads can come as a dictionary of responses (e.g., day -> response, as
+    returned by the extract step), a list of responses, or legacy JSON-like strings.
+    Dictionaries are used as they are; only strings go through
+    `_parse_and_fix_json_string`. Responses the provider marked as unsuccessful
+    or that have no 'rates' are left out.
+
+    Args:
+        raw_payloads (dict | list): The extracted API responses.
+
+    Returns:
+        list: The usable API responses as dictionaries.
+
+    Raises:
+        TypeError: If the input is not a dictionary or a list.
+    """
+    if isinstance(raw_payloads, dict):
+        raw_payloads = list(raw_payloads.values())
+    if not isinstance(raw_payloads, list):
+        raise TypeError("Input must be a dictionary or a list of API responses.")
+
+    payloads = []
+    for payload in raw_payloads:
+        if isinstance(payload, str):
+            try:
+                payload = _parse_and_fix_json_string(payload)
+            except (ValueError, TypeError, RuntimeError) as e:
+                logger.warning("Skipping malformed data entry: %s", e)
+                continue
+        if not isinstance(payload, dict) or payload.get('success') is False or not payload.get('rates'):
+            continue
+        payloads.append(payload)
+    return payloads
+
+def _explode_rates_to_long_df(raw_payloads) -> pd.DataFrame:
+    """
+    Turns API responses into one long table with a row per (date, base, target) rate.
+
+    Each API response holds one day with a nested 'rates' dictionary
+    (e.g., {'USD': 1.3, 'EGP': 9.1}). Instead of walking those dictionaries row by row,
+    all of them are expanded into a wide table in one step and melted into the long
+    format, so the work is done by pandas and not by a Python loop per rate.
+
+    Args:
+        raw_payloads (dict | list): The extracted API responses (see `_coerce_api_payloads`).
+
+    Returns:
+        pd.DataFrame: A table with the columns 'date' (datetime64), 'base' (category),
+                      'target' (category) and 'rate' (float64), sorted by date and target.
+                      Rows with a missing, non-numeric, zero or negative rate are dropped,
+                      and if the same (date, base, target) appears twice the last one is kept.
+    """
+    payloads = _coerce_api_payloads(raw_payloads)
+    if not payloads:
+        return _empty_long_rates_df()
+
+    headers = pd.DataFrame.from_records(payloads, columns=['date', 'base', 'rates'])
+    # Expand every nested 'rates' dictionary into columns at once (one column per currency).
+    wide = pd.DataFrame.from_records(headers['rates'].tolist())
+    wide.insert(0, 'date', headers['date'].to_numpy())
+    wide.insert(1, 'base', headers['base'].to_numpy())
+    long_df = wide.melt(id_vars=['date', 'base'], var_name='target', value_name='rate')
+
+    long_df['rate'] = pd.to_numeric(long_df['rate'], errors='coerce')
+    long_df['date'] = pd.to_datetime(long_df['date'], format='%Y-%m-%d', errors='coerce')
+    long_df = long_df.dropna(subset=['date', 'base', 'rate'])
+    # A zero or negative rate is a bad cell from the provider: drop that rate, keep the rest.
+    bad_rates = long_df['rate'] <= 0
+    if bad_rates.any():
+        first_bad = long_df[bad_rates].iloc[0]
+        _log_sampled(logger, logging.WARNING, "Dropped %d zero or negative rates (e.g. %s on %s).",
+                     int(bad_rates.sum()), first_bad['target'], first_bad['date'].date(),
+                     key="dropped_non_positive_rates")
+        long_df = long_df[~bad_rates]
+    long_df = long_df.drop_duplicates(subset=['date', 'base', 'target'], keep='last')
+    long_df = long_df.sort_values(['date', 'target'], ignore_index=True)
+    long_df = long_df.astype(LONG_RATE_DTYPES)[LONG_RATE_COLUMNS]
+    _validate_long_rates_df(long_df)
+    return long_df
+
+def _empty_long_rates_df() -> pd.DataFrame:
+    """
+    Returns an empty long-format rates table with the right columns and dtypes.
+    """
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in LONG_RATE_DTYPES.items()})
+
+def _validate_long_rates_df(long_df: pd.DataFrame):
+    """
+    Checks that a long-format rates table has the expected columns, dtypes and values.
+
+    Args:
+        long_df (pd.DataFrame): The table made by `_explode_rates_to_long_df`.
+
+    Raises:
+        TypeError: If the input is not a DataFrame.
+        KeyError: If one of the 'date', 'base', 'target' or 'rate' columns is missing.
+        ValueError: If a column has the wrong dtype, or if there are empty values
+                    or rates that are zero or negative.
+    """
+    if not isinstance(long_df, pd.DataFrame):
+        raise TypeError("Input must be a Pandas DataFrame.")
+    missing_columns = [column for column in LONG_RATE_COLUMNS if column not in long_df.columns]
+    if missing_columns:
+        raise KeyError(f"Missing required columns: {missing_columns}.")
+    for column, dtype in LONG_RATE_DTYPES.items():
+        if str(long_df[column].dtype) != dtype:
+            raise ValueError(f"Column '{column}' should be {dtype}, got {long_df[column].dtype}.")
+    if long_df[LONG_RATE_COLUMNS].isna().to_numpy().any():
+        raise ValueError("The rates table contains empty values.")
+    if (long_df['rate'].to_numpy() <= 0).any():
+        raise ValueError("The rates table contains zero or negative rates.")
+
+def _long_df_to_load_rows(long_df: pd.DataFrame) -> list:
+    """
+    Converts a long-format rates table into rows ready for `db2_utils._bulk_insert_to_db`.
+
+    Args:
+        long_df (pd.DataFrame): The table made by `_explode_rates_to_long_df`.
+
+    Returns:
+        list: (rate_date 'YYYY-MM-DD', base, target, rate) tuples made from whole columns at once.
+    """
+    return list(zip(
+        long_df['date'].dt.strftime('%Y-%m-%d').tolist(),
+        long_df['base'].astype(str).tolist(),
+        long_df['target'].astype(str).tolist(),
+        long_df['rate'].to_numpy(dtype='float64').tolist(),
+    ))
@@ -0,0 +1,83 @@
+import logging
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from .api import etl, metrics, rates
+from .core.config import get_settings
+from .services import etl_service, rates_service
+from .utils import log_utils
+from .utils.rate_store_utils import rate_store
+
+logger = logging.getLogger(__name__)
+
+# Run with several worker processes, e.g.:
+#   gunicorn app.main:app -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8000
+app = FastAPI(title="EGP Converter API")
+
+
+# Middleware is created when the app starts serving, not when this module is imported,
+# so these two read their settings then.
+class _SettingsCORSMiddleware(CORSMiddleware):
+    def __init__(self, app):
+        origins = get_settings().CORS_ORIGINS
+        super().__init__(app, allow_origins=[origin.strip() for origin in origins.split(",") if origin.strip()],
+                         allow_methods=["*"], allow_headers=["*"])
+
+
+class _SettingsGZipMiddleware(GZipMiddleware):
+    def __init__(self, app):
+        super().__init__(app, minimum_size=get_settings().GZIP_MINIMUM_SIZE)
+
+
+app.add_middleware(_SettingsCORSMiddleware)
+# Compress larger responses (e.g. a year of history) for clients that accept gzip.
+app.add_middleware(_SettingsGZipMiddleware)
+
+# The frontend calls the API under /api (see frontend/src/config.js).
+app.include_router(rates.router, prefix="/api")
+app.include_router(etl.router, prefix="/api")
+# Prometheus scrapes /metrics at the root, next to the API.
+app.include_router(metrics.router)
+
+
+@app.on_event("startup")
+def configure_logging():
+    # Messages are written by a background thread, so logging never blocks a request.
+    log_utils._configure_logging()
+
+
+@app.on_event("startup")
+def load_rate_store():
+    # Load every rate into memory so conversions are array lookups instead of Db2 queries.
+    settings = get_settings()
+    if not settings.RATE_STORE_ENABLED:
+        return
+    try:
+        loaded = rate_store.load()
+        stats = rate_store.stats()
+        logger.info("Loaded %d rates into the in-memory rate store in %.3fs (%d bytes).",
+                    loaded, stats['load_seconds'], stats.get('bytes', 0))
+    except Exception as e:
+        # Conversions fall back to the cache and Db2 until a refresh succeeds.
+        logger.warning("Could not load the in-memory rate store at startup: %s", e)
+    rate_store.start_auto_refresh(settings.RATE_STORE_REFRESH_SECONDS)
+
+
+@app.on_event("startup")
+def warm_rate_caches():
+    # Build the cross-rate matrices of the most recent days before the first request arrives.
+    try:
+        built = rates_service._warm_cross_rate_matrices()
+        logger.info("Built %d cross-rate matrices at startup.", built)
+    except Exception as e:
+        # The API can still start; matrices are then built on the first request for each date.
+        logger.warning("Could not warm the cross-rate cache at startup: %s", e)
+
+
+@app.on_event("startup")
+def recover_etl_jobs():
+    # Jobs left 'running' by a worker that died would block their month from being loaded again.
+    try:
+        etl_service.recover_stale_jobs()
+    except Exception as e:
+        logger.warning("Could not check for stale ETL jobs at startup: %s", e)
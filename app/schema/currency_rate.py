@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from datetime import date
+from typing import List, Optional
+
+class ConversionResponse(BaseModel):
+    from_currency: str
+    to_currency: str
+    amount: float
+    rate: float
+    result: float
+    # The date whose rates were used; with as-of lookups it can be earlier than requested_date.
+    rate_date: date
+    requested_date: Optional[date] = None
+
+class BatchConversionItem(BaseModel):
+    amount: float
+    from_currency: str = Field(..., alias="from", min_length=3, max_length=3)
+    to_currency: str = Field(..., alias="to", min_length=3, max_length=3)
+    rate_date: Optional[date] = Field(None, alias="date")
+
+class BatchConversionRequest(BaseModel):
+    items: List[BatchConversionItem]
+
+class BatchConversionResult(BaseModel):
+    result: Optional[float] = None
+    rate: Optional[float] = None
+    rate_date: Optional[date] = None
+    error: Optional[str] = None
+
+class BatchConversionResponse(BaseModel):
+    results: List[BatchConversionResult]
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import List, Optional
+
+class EtlRunRequest(BaseModel):
+    start_date: date
+    end_date: date
+
+class EtlJobStatus(BaseModel):
+    job_id: str
+    year: int
+    month: int
+    # queued, running, cancelling, succeeded, failed or cancelled
+    status: str
+    requested_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    days_total: int = 0
+    days_fetched: int = 0
+    rows_loaded: int = 0
+    error: Optional[str] = None
+
+class EtlTriggerResponse(BaseModel):
+    jobs: List[EtlJobStatus]
+    # How many of the jobs are new; the others were already queued or running.
+    created: int
+
+class EtlStatusResponse(BaseModel):
+    queued: int
+    running: int
+    jobs: List[EtlJobStatus]
@@ -1,13 +1,101 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+from ..etl import main_etl
 from ..utils import db2_utils
-from ..core.config import CURRENCY_RATES
+from ..utils.cache_utils import rate_cache, rate_date_index, RateCache
+from ..utils.rate_store_utils import rate_store
+from ..utils.singleflight_utils import SingleFlight
+from ..utils.import_utils import _lazy_import
+from ..utils.log_utils import _log_sampled
+from ..utils.metrics_utils import CONVERSION_SECONDS
+from ..core.config import get_settings
+
+np = _lazy_import("numpy") # Imported the first time a batch is converted
+
+logger = logging.getLogger(__name__)
+
+# A bounded pool of threads for the blocking ibm_db calls, so the API's event loop never waits on Db2.
+_db_executor = None
+_db_executor_lock = threading.Lock()
+
+# Concurrent on-demand loads of the same date share one provider call and one insert.
+_on_demand_flight = SingleFlight()
+# (date, currency) pairs the provider did not return, so they are not asked for again and again.
+# Past dates are remembered for good; today is asked again after ON_DEMAND_ETL_RETRY_SECONDS.
+_on_demand_misses = RateCache(max_size=4096, today_ttl_seconds=lambda: get_settings().ON_DEMAND_ETL_RETRY_SECONDS)
 
 class ExchangeRateNotFoundError(Exception):
-    pass # to be modified later to run ETL for the rate_date doesn't exist
+    pass # raised when a date has no rate (or, for as-of lookups, no recent enough rate)
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    """
+    Returns the shared thread pool for Db2 lookups, creating it the first time it is needed.
+
+    Returns:
+        ThreadPoolExecutor: A pool of DB_EXECUTOR_MAX_WORKERS threads.
+    """
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(max_workers=get_settings().DB_EXECUTOR_MAX_WORKERS,
+                                                  thread_name_prefix="db2-lookup")
+    return _db_executor
+
+def _on_demand_currencies() -> set:
+    # The currencies the ETL asks the provider for; no other code can be loaded on demand.
+    return {code.strip().upper() for code in get_settings().API_SYMBOLS.split(",") if code.strip()}
+
+def _load_date_on_demand(rate_date: str, currency_code: str) -> dict:
+    """
+    Fetches and loads the rates of a date that is not in CURRENCY_RATES yet.
+
+    However many requests ask for the same missing date at once, only one of them calls
+    the provider and loads the rates (see `SingleFlight`); the others wait for it and get
+    the same rates. Every currency of API_SYMBOLS the provider did not return for the date
+    is remembered, so asking for it again costs no provider call.
+
+    Args:
+        rate_date (str): The missing date (YYYY-MM-DD).
+        currency_code (str): The currency the caller needs (e.g. 'USD').
+
+    Returns:
+        dict: The EUR to X rates now loaded for that date, or an empty dict if on-demand
+              loading is off, the date is in the future, the currency is not in API_SYMBOLS,
+              or the provider has no rate for it.
+    """
+    rate_date = str(rate_date)
+    if not get_settings().ON_DEMAND_ETL_ENABLED or rate_date > date.today().isoformat():
+        return {}
+    currencies = _on_demand_currencies()
+    if currency_code not in currencies:
+        return {}
+    if _on_demand_misses.get(rate_date, currency_code) is not None:
+        return {}
+    rates = _on_demand_flight.do(rate_date, partial(main_etl.run_single_date_pipeline, rate_date))
+    if rates is None:
+        # The provider or the database failed; the next request may try again.
+        return {}
+    for code in currencies.difference(rates):
+        _on_demand_misses.put(rate_date, code, True)
+    for code, rate in rates.items():
+        rate_cache.put(rate_date, code, rate)
+    return rates
 
 def _get_exchange_rate(rate_date: str, target_currency_code: str) -> float:
     """
     Retrieves the historical exchange rate from EUR to the target currency for a given date.
 
+    Rates are served from the in-memory rate cache when possible; only a cache miss
+    goes to Db2, and the rate it returns is stored in the cache for the next lookup.
+    A date that is not in Db2 either is fetched from the provider and loaded on the
+    spot (see `_load_date_on_demand`).
+
     Args:
         rate_date (str): The date for which to retrieve the exchange rate (YYYY-MM-DD).
         target_currency_code (str): The target currency code (e.g., 'USD', 'EGP').
@@ -19,19 +107,167 @@ def _get_exchange_rate(rate_date: str, target_currency_code: str) -> float:
         ExchangeRateNotFoundError: If no rate is found for the given date and currency.
         Exception: For other database or query execution errors.
     """
-    conn = db2_utils._connect_to_database()
-    query = f"SELECT EXCHANGE_RATE FROM {CURRENCY_RATES} WHERE RATE_DATE = '{rate_date}' AND TARGET_CURRENCY_CODE = '{target_currency_code}'"
+    # The in-memory rate store answers with plain array indexing when it has the rate.
+    stored_rate = rate_store.rate(target_currency_code, rate_date)
+    if stored_rate is not None:
+        return stored_rate
 
-    exchange_rate_data = db2_utils._run_sql_query(conn, query)
+    cached_rate = rate_cache.get(rate_date, target_currency_code)
+    if cached_rate is not None:
+        return cached_rate
+
+    # The values are bound as parameters, so Db2 sees the same statement text for every lookup.
+    query = f"SELECT EXCHANGE_RATE FROM {get_settings().CURRENCY_RATES} WHERE RATE_DATE = ? AND TARGET_CURRENCY_CODE = ?"
+
+    # Borrow a pooled connection instead of opening (and leaking) a new one per lookup.
+    with db2_utils._pooled_connection() as conn:
+        exchange_rate_data = db2_utils._run_query(conn, query, (str(rate_date), target_currency_code),
+                                                  query_name="exchange_rate")
 
     if not exchange_rate_data:
+        # Not loaded yet: fetch this date from the provider and load it (read-through).
+        loaded_rates = _load_date_on_demand(rate_date, target_currency_code)
+        if target_currency_code not in loaded_rates:
+            raise ExchangeRateNotFoundError(
+                f"No exchange rate found for date: {rate_date} and target currency: {target_currency_code}"
+            )
+        return loaded_rates[target_currency_code]
+
+    rate_value = float(exchange_rate_data[0][0])
+    _log_sampled(logger, logging.DEBUG, "Retrieved exchange rate (EUR to %s) for %s: %s",
+                 target_currency_code, rate_date, rate_value, key="retrieved_exchange_rate")
+    rate_cache.put(rate_date, target_currency_code, rate_value)
+    return rate_value
+
+def _load_rate_series(currency_code: str) -> list:
+    """
+    Reads every (date, rate) of one currency with one query.
+
+    Returns:
+        list: (RATE_DATE, EXCHANGE_RATE) tuples sorted by date.
+    """
+    query = (f"SELECT RATE_DATE, EXCHANGE_RATE FROM {get_settings().CURRENCY_RATES} "
+             "WHERE TARGET_CURRENCY_CODE = ? ORDER BY RATE_DATE")
+    with db2_utils._pooled_connection() as conn:
+        return db2_utils._run_query(conn, query, (currency_code,), query_name="rate_series")
+
+def _get_exchange_rate_as_of(rate_date: str, target_currency_code: str, max_staleness_days: int = None) -> tuple:
+    """
+    Retrieves the latest EUR to target rate on or before a date.
+
+    Weekends, holidays and today (before the ETL has run) have no row of their own; this
+    falls back to the closest earlier date instead of failing. The currency's dates are kept
+    sorted in memory (the rate store's snapshot, or `rate_date_index` when the store has no
+    snapshot), so the fallback is a lookup, not more queries.
+
+    Args:
+        rate_date (str): The requested date (YYYY-MM-DD).
+        target_currency_code (str): The target currency code (e.g., 'USD', 'EGP').
+        max_staleness_days (int, optional): The most days the rate may be older than rate_date.
+                                            Defaults to RATE_MAX_STALENESS_DAYS from the config.
+
+    Returns:
+        tuple: (rate float, 'YYYY-MM-DD' date the rate belongs to).
+
+    Raises:
+        ExchangeRateNotFoundError: If there is no rate within max_staleness_days before rate_date.
+    """
+    max_staleness_days = get_settings().RATE_MAX_STALENESS_DAYS if max_staleness_days is None else max_staleness_days
+    if target_currency_code == 'EUR':
+        return 1.0, str(rate_date)
+    if rate_store.is_loaded:
+        # The store holds every loaded date, so its earlier-date fallback needs no Db2 query.
+        found = rate_store.rate_as_of(target_currency_code, rate_date, max_staleness_days)
+    else:
+        # No snapshot (the store is disabled or not loaded yet): read the series from Db2 once.
+        if not rate_date_index.has_series(target_currency_code):
+            rate_date_index.put_series(target_currency_code, _load_rate_series(target_currency_code))
+        found = rate_date_index.lookup(target_currency_code, rate_date, max_staleness_days)
+    if found is None or found[1] != str(rate_date):
+        # The exact date is not loaded: try to fetch it before falling back to an earlier date.
+        loaded_rates = _load_date_on_demand(rate_date, target_currency_code)
+        if target_currency_code in loaded_rates:
+            return loaded_rates[target_currency_code], str(rate_date)
+    if found is None:
         raise ExchangeRateNotFoundError(
-            f"No exchange rate found for date: {rate_date} and target currency: {target_currency_code}"
+            f"No exchange rate found for target currency: {target_currency_code} "
+            f"on or up to {max_staleness_days} days before {rate_date}"
         )
+    return found
 
-    rate_value = float(exchange_rate_data[0]["EXCHANGE_RATE"])
-    print(f"Retrieved exchange rate (EUR to {target_currency_code}): {rate_value}")
-    return rate_value
+def _get_pair_rates_as_of(base_currency_code: str, target_currency_code: str, rate_date: str,
+                          max_staleness_days: int = None) -> tuple:
+    """
+    Finds the latest date on or before rate_date that has rates for both currencies.
+
+    Each currency is looked up as of the requested date; if they land on different dates,
+    both are looked up again as of the older one, until they agree. That way a cross rate
+    never mixes rates from two different days.
+
+    Returns:
+        tuple: (EUR to base rate, EUR to target rate, 'YYYY-MM-DD' date used).
+
+    Raises:
+        ExchangeRateNotFoundError: If no common date is within max_staleness_days of rate_date.
+    """
+    max_staleness_days = get_settings().RATE_MAX_STALENESS_DAYS if max_staleness_days is None else max_staleness_days
+    oldest_allowed = date.fromisoformat(str(rate_date)) - timedelta(days=max_staleness_days)
+    as_of = str(rate_date)
+    while True:
+        remaining_days = (date.fromisoformat(as_of) - oldest_allowed).days
+        base_rate, base_date = _get_exchange_rate_as_of(as_of, base_currency_code, remaining_days)
+        target_rate, target_date = _get_exchange_rate_as_of(as_of, target_currency_code, remaining_days)
+        if base_currency_code == 'EUR':
+            base_date = target_date
+        if target_currency_code == 'EUR':
+            target_date = base_date
+        if base_date == target_date:
+            return base_rate, target_rate, base_date
+        as_of = min(base_date, target_date)
+
+def convert_currency_as_of(amount: float, base_currency_code: str, target_currency_code: str, rate_date: str,
+                           max_staleness_days: int = None) -> dict:
+    """
+    Converts an amount using the latest rates on or before a date.
+
+    Args:
+        amount (float): The amount in the base currency to convert.
+        base_currency_code (str): The currency to convert from (e.g., 'USD').
+        target_currency_code (str): The currency to convert to (e.g., 'EGP').
+        rate_date (str): The requested date (YYYY-MM-DD).
+        max_staleness_days (int, optional): The most days the rates may be older than rate_date.
+                                            Defaults to RATE_MAX_STALENESS_DAYS from the config.
+
+    Returns:
+        dict: {"result", "rate", "rate_date"} where rate_date is the date whose rates were used.
+
+    Raises:
+        ExchangeRateNotFoundError: If no recent enough rate exists.
+        ValueError: If the EUR to base rate is zero.
+    """
+    base_currency_code = base_currency_code.upper()
+    target_currency_code = target_currency_code.upper()
+    if base_currency_code == target_currency_code:
+        return {"result": amount, "rate": 1.0, "rate_date": str(rate_date)}
+    with CONVERSION_SECONDS.time(_conversion_path(base_currency_code, target_currency_code), "as_of"):
+        eur_to_base, eur_to_target, used_date = _get_pair_rates_as_of(
+            base_currency_code, target_currency_code, rate_date, max_staleness_days
+        )
+    if eur_to_base == 0:
+        raise ValueError(f"Exchange rate from EUR to {base_currency_code} is zero, cannot convert.")
+    rate = eur_to_target / eur_to_base
+    return {"result": amount * rate, "rate": rate, "rate_date": used_date}
+
+async def convert_currency_as_of_async(amount: float, base_currency_code: str, target_currency_code: str,
+                                       rate_date: str, max_staleness_days: int = None) -> dict:
+    """
+    Async version of `convert_currency_as_of` for the API; runs on the bounded `_db_executor`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_db_executor(),
+        partial(convert_currency_as_of, amount, base_currency_code, target_currency_code, rate_date, max_staleness_days),
+    )
 
 def convert_eur_to_currency(amount: float, target_currency_code: str, rate_date: str) -> float:
     """
@@ -108,11 +344,228 @@ def convert_between_non_eur_currencies(amount: float, base_currency_code: str, t
     # formula: amount * (1 / eur_to_base_rate) * eur_to_target_rate
     return (amount / eur_to_base_rate) * eur_to_target_rate
 
+def _conversion_path(base_currency_code: str, target_currency_code: str) -> str:
+    # The label used in the conversion latency metric: EUR to X, X to EUR, or a cross rate.
+    if base_currency_code == 'EUR':
+        return "eur_to_x"
+    if target_currency_code == 'EUR':
+        return "x_to_eur"
+    return "cross"
+
+def convert_currency(amount: float, base_currency_code: str, target_currency_code: str, rate_date: str) -> float:
+    """
+    Converts an amount between any two currencies, picking the right conversion function.
+
+    EUR to X uses `convert_eur_to_currency`, X to EUR uses `convert_currency_to_eur`,
+    and any other pair goes through EUR with `convert_between_non_eur_currencies`.
+
+    Args:
+        amount (float): The amount in the base currency to convert.
+        base_currency_code (str): The currency to convert from (e.g., 'USD').
+        target_currency_code (str): The currency to convert to (e.g., 'EGP').
+        rate_date (str): The date for the historical rates (YYYY-MM-DD).
+
+    Returns:
+        float: The converted amount in the target currency.
+
+    Raises:
+        ExchangeRateNotFoundError: If a required exchange rate is not found.
+        ValueError: If an exchange rate is zero.
+    """
+    base_currency_code = base_currency_code.upper()
+    target_currency_code = target_currency_code.upper()
+    if base_currency_code == target_currency_code:
+        return amount
+    with CONVERSION_SECONDS.time(_conversion_path(base_currency_code, target_currency_code), "exact"):
+        if base_currency_code == 'EUR':
+            return convert_eur_to_currency(amount, target_currency_code, rate_date)
+        if target_currency_code == 'EUR':
+            return convert_currency_to_eur(amount, base_currency_code, rate_date)
+        return convert_between_non_eur_currencies(amount, base_currency_code, target_currency_code, rate_date)
+
+async def convert_currency_async(amount: float, base_currency_code: str, target_currency_code: str, rate_date: str) -> float:
+    """
+    Async version of `convert_currency` for the API.
+
+    The conversion (and any Db2 lookup it needs) runs on the bounded `_db_executor`
+    thread pool, so the event loop keeps serving other requests meanwhile.
+
+    Args:
+        amount (float): The amount in the base currency to convert.
+        base_currency_code (str): The currency to convert from (e.g., 'USD').
+        target_currency_code (str): The currency to convert to (e.g., 'EGP').
+        rate_date (str): The date for the historical rates (YYYY-MM-DD).
+
+    Returns:
+        float: The converted amount in the target currency.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_db_executor(), partial(convert_currency, amount, base_currency_code, target_currency_code, rate_date)
+    )
+
+def _get_exchange_rates(rate_keys) -> dict:
+    """
+    Retrieves many EUR to X exchange rates at once.
+
+    Rates that are in the rate cache are taken from there. All the others are read with
+    one set-based query per BATCH_RATE_QUERY_MAX_DATES dates (instead of one query per
+    rate), and what the query returns is added to the cache.
+
+    Args:
+        rate_keys (iterable): (rate_date 'YYYY-MM-DD', currency_code) pairs. The dates and
+                              codes must already be validated (see `_normalize_batch_item`).
+
+    Returns:
+        dict: Maps every (rate_date, currency_code) pair that was found to its rate.
+              Pairs with no rate in the database are left out.
+    """
+    rates = {}
+    missing = set()
+    for rate_date, currency_code in set(rate_keys):
+        if currency_code == 'EUR':
+            rates[(rate_date, currency_code)] = 1.0
+            continue
+        stored_rate = rate_store.rate(currency_code, rate_date)
+        if stored_rate is not None:
+            rates[(rate_date, currency_code)] = stored_rate
+            continue
+        cached_rate = rate_cache.get(rate_date, currency_code)
+        if cached_rate is not None:
+            rates[(rate_date, currency_code)] = cached_rate
+        else:
+            missing.add((rate_date, currency_code))
+    if not missing:
+        return rates
+
+    missing_dates = sorted({rate_date for rate_date, _ in missing})
+    missing_codes = sorted({code for _, code in missing})
+    codes_markers, codes_params = db2_utils._in_list(missing_codes)
+    settings = get_settings()
+    with db2_utils._pooled_connection() as conn:
+        for start in range(0, len(missing_dates), settings.BATCH_RATE_QUERY_MAX_DATES):
+            dates_markers, dates_params = db2_utils._in_list(missing_dates[start:start + settings.BATCH_RATE_QUERY_MAX_DATES])
+            query = (f"SELECT RATE_DATE, TARGET_CURRENCY_CODE, EXCHANGE_RATE FROM {settings.CURRENCY_RATES} "
+                     f"WHERE RATE_DATE IN ({dates_markers}) AND TARGET_CURRENCY_CODE IN ({codes_markers})")
+            for row_date, row_code, row_rate in db2_utils._run_query(conn, query, dates_params + codes_params,
+                                                                     query_name="exchange_rates_batch"):
+                key = (str(row_date), row_code.strip())
+                # The query can return a few pairs nobody asked for (date and code lists are crossed).
+                if key in missing:
+                    rates[key] = float(row_rate)
+                    rate_cache.put(key[0], key[1], rates[key])
+    return rates
+
+def _normalize_batch_item(item) -> tuple:
+    """
+    Checks one batch item and puts it into a standard form.
+
+    Args:
+        item (dict | tuple): {'amount', 'from', 'to', 'date'} or (amount, from, to, date).
+                             A missing date means today.
+
+    Returns:
+        tuple: (amount float, from code, to code, rate_date 'YYYY-MM-DD').
+
+    Raises:
+        ValueError: If the amount, a currency code or the date is not valid.
+    """
+    if isinstance(item, dict):
+        amount, from_code, to_code, rate_date = item.get('amount'), item.get('from'), item.get('to'), item.get('date')
+    else:
+        amount, from_code, to_code, rate_date = (tuple(item) + (None,))[:4]
+    amount = float(amount)
+    codes = []
+    for code in (from_code, to_code):
+        if not isinstance(code, str) or len(code.strip()) != 3 or not code.strip().isalpha():
+            raise ValueError(f"Invalid currency code: {code!r}")
+        codes.append(code.strip().upper())
+    rate_date = date.fromisoformat(str(rate_date)).isoformat() if rate_date else date.today().isoformat()
+    return amount, codes[0], codes[1], rate_date
+
+def convert_batch(items: list) -> list:
+    """
+    Converts many amounts at once, each with its own currencies and date.
+
+    All the distinct (date, currency) rates the batch needs are resolved together with
+    `_get_exchange_rates` (cache first, then set-based queries), and the conversions are
+    computed with vectorized array math: amount / (EUR to from) * (EUR to to), where the
+    EUR rate of EUR itself is 1, so EUR pairs and cross pairs use the same formula.
+
+    Args:
+        items (list): The conversions, each {'amount', 'from', 'to', 'date'} or
+                      (amount, from, to, date). A missing date means today.
+
+    Returns:
+        list: One dictionary per item, in input order, with 'result', 'rate', 'rate_date'
+              and 'error'. If an item fails, 'result' and 'rate' are None and 'error' says why;
+              the other items are still converted.
+    """
+    started = time.perf_counter()
+    count = len(items)
+    normalized = [None] * count
+    errors = [None] * count
+    for index, item in enumerate(items):
+        try:
+            normalized[index] = _normalize_batch_item(item)
+        except (TypeError, ValueError) as e:
+            errors[index] = str(e)
+
+    valid = [n for n in normalized if n is not None]
+    rates = _get_exchange_rates(
+        [(rate_date, code) for _, from_code, to_code, rate_date in valid for code in (from_code, to_code)]
+    )
+
+    amounts = np.full(count, np.nan)
+    from_rates = np.full(count, np.nan)
+    to_rates = np.full(count, np.nan)
+    for index, entry in enumerate(normalized):
+        if entry is None:
+            continue
+        amount, from_code, to_code, rate_date = entry
+        amounts[index] = amount
+        from_rates[index] = rates.get((rate_date, from_code), np.nan)
+        to_rates[index] = rates.get((rate_date, to_code), np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unit_rates = to_rates / from_rates
+        results = amounts * unit_rates
+
+    output = []
+    for index, entry in enumerate(normalized):
+        error = errors[index]
+        if error is None:
+            amount, from_code, to_code, rate_date = entry
+            if np.isnan(from_rates[index]) or np.isnan(to_rates[index]):
+                missing_code = from_code if np.isnan(from_rates[index]) else to_code
+                error = f"No exchange rate found for date: {rate_date} and target currency: {missing_code}"
+            elif from_rates[index] == 0:
+                error = f"Exchange rate from EUR to {from_code} is zero, cannot convert."
+        ok = error is None
+        output.append({
+            "result": float(results[index]) if ok else None,
+            "rate": float(unit_rates[index]) if ok else None,
+            "rate_date": entry[3] if entry is not None else None,
+            "error": error,
+        })
+    CONVERSION_SECONDS.observe(time.perf_counter() - started, "batch", "exact")
+    return output
+
+async def convert_batch_async(items: list) -> list:
+    """
+    Async version of `convert_batch` for the API; runs on the bounded `_db_executor`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(convert_batch, items))
+
 
 if __name__ == "__main__":
+    from ..utils import log_utils
+    log_utils._configure_logging()
     print('1')
     print(convert_eur_to_currency(500, 'EGP', '2018-02-01'))
     print('2')
     print(convert_currency_to_eur(500, 'EGP', '2018-02-01'))
     print('3')
     print(convert_between_non_eur_currencies(500, 'EGP', 'USD', '2018-02-01'))
+    print(rate_cache.stats())
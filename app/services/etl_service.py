@@ -1,8 +1,508 @@
+import logging
+import threading # Used so API requests and job workers can share the job list safely
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor # The bounded pool of workers that run the jobs
+from datetime import date, datetime, timezone
 from ..etl import main_etl
+from ..utils import db2_utils
+from ..core.config import get_settings
 
-def trigger_year_historical_etl(year: int):
-    main_etl.run_historical_pipeline(year=year)
+logger = logging.getLogger(__name__)
 
+# The table created by app/db/migrations/V004__create_etl_jobs.sql.
+ETL_JOBS = "ETL_JOBS"
+# Finished jobs kept in memory for /etl/status (older ones are still in the table).
+_MAX_JOBS_IN_MEMORY = 500
 
-def trigger_month_historical_etl(year: int, month: int):
-    main_etl.run_historical_pipeline(year=year, month=month)
+QUEUED, RUNNING, CANCELLING, SUCCEEDED, FAILED, CANCELLED = (
+    "queued", "running", "cancelling", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+def trigger_year_historical_etl(year: int, incremental: bool = True):
+    return main_etl.run_historical_pipeline(year=year, incremental=incremental)
+
+
+def trigger_month_historical_etl(year: int, month: int, incremental: bool = True):
+    return main_etl.run_historical_pipeline(year=year, month=month, incremental=incremental)
+
+
+class EtlQueueFullError(Exception):
+    pass # raised when ETL_JOB_MAX_QUEUED jobs are already waiting
+
+
+class EtlJobNotFoundError(Exception):
+    pass # raised when a job id is not known
+
+
+def _utc_now() -> datetime:
+    # Timestamps are stored in UTC without a time zone (Db2 TIMESTAMP has none).
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class EtlJob:
+    """
+    One background load of one month, as shown by /etl/status.
+
+    The pipeline running the job reports its progress through `update` and asks
+    `is_cancelled` between steps (see `main_etl.run_historical_pipeline`).
+
+    Attributes:
+        job_id (str): A unique id (a UUID).
+        key (str): The month the job loads, 'YYYY-MM'. Only one active job per key exists.
+        status (str): queued, running, cancelling, succeeded, failed or cancelled.
+        days_total (int): The days the job has to fetch.
+        days_fetched (int): The days fetched so far.
+        rows_loaded (int): The rates inserted so far.
+        error (str): Why the job failed, or None.
+    """
+
+    def __init__(self, year: int, month: int, job_id: str = None):
+        self.job_id = job_id or str(uuid.uuid4())
+        self.year = year
+        self.month = month
+        self.key = f"{year:04d}-{month:02d}"
+        self.status = QUEUED
+        self.requested_at = _utc_now()
+        self.started_at = None
+        self.finished_at = None
+        self.days_total = 0
+        self.days_fetched = 0
+        self.rows_loaded = 0
+        self.error = None
+        self.persisted = False # False if the job could not be saved to ETL_JOBS
+        self._cancel_requested = threading.Event()
+        self._last_saved = 0.0
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def update(self, days_total: int = None, days_fetched: int = None, rows_loaded: int = None):
+        """
+        Records progress reported by the pipeline, saving it at most every ETL_JOB_HEARTBEAT_SECONDS.
+        """
+        if days_total is not None:
+            self.days_total = days_total
+        if days_fetched is not None:
+            self.days_fetched = days_fetched
+        if rows_loaded is not None:
+            self.rows_loaded = rows_loaded
+        if time.monotonic() - self._last_saved >= get_settings().ETL_JOB_HEARTBEAT_SECONDS:
+            self._save()
+
+    def request_cancel(self):
+        self._cancel_requested.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_requested.is_set()
+
+    def _save(self):
+        # Saves the job's state. A job cancelled from another API worker is marked
+        # 'cancelling' in the table, which is noticed here.
+        self._last_saved = time.monotonic()
+        if not self.persisted:
+            return
+        try:
+            if _update_job_row(self) == CANCELLING:
+                self.request_cancel()
+        except Exception as e:
+            logger.warning("Could not save the progress of ETL job %s: %s", self.job_id, e)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "year": self.year,
+            "month": self.month,
+            "status": self.status,
+            "requested_at": self.requested_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "days_total": self.days_total,
+            "days_fetched": self.days_fetched,
+            "rows_loaded": self.rows_loaded,
+            "error": self.error,
+        }
+
+
+# --- The ETL_JOBS table ---
+_JOB_COLUMNS = ("JOB_ID, JOB_KEY, STATUS, REQUESTED_AT, STARTED_AT, FINISHED_AT, "
+                "DAYS_TOTAL, DAYS_FETCHED, ROWS_LOADED, ERROR")
+
+def _insert_job_row(job: EtlJob):
+    # Fails with SQL0803N if another active job has the same key (ETL_JOBS_ACTIVE_KEY_UX).
+    with db2_utils._pooled_connection() as conn:
+        db2_utils._execute(
+            conn,
+            f"INSERT INTO {ETL_JOBS} (JOB_ID, JOB_KEY, ACTIVE_KEY, STATUS, REQUESTED_AT, HEARTBEAT_AT) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job.job_id, job.key, job.key, job.status, job.requested_at, job.requested_at),
+        )
+
+def _update_job_row(job: EtlJob) -> str:
+    # Saves the job and returns the status in the table. A 'cancelling' status set by
+    # another worker is kept until this job finishes; finished jobs free their key.
+    now = _utc_now()
+    with db2_utils._pooled_connection() as conn:
+        db2_utils._execute(
+            conn,
+            f"UPDATE {ETL_JOBS} SET "
+            "STATUS = CASE WHEN STATUS = ? AND ? = ? THEN STATUS ELSE ? END, "
+            "ACTIVE_KEY = CASE WHEN ? IN (?, ?, ?) THEN NULL ELSE ACTIVE_KEY END, "
+            "STARTED_AT = ?, FINISHED_AT = ?, HEARTBEAT_AT = ?, "
+            "DAYS_TOTAL = ?, DAYS_FETCHED = ?, ROWS_LOADED = ?, ERROR = ? "
+            "WHERE JOB_ID = ?",
+            (CANCELLING, job.status, RUNNING, job.status,
+             job.status, *FINISHED_STATUSES,
+             job.started_at, job.finished_at, now,
+             job.days_total, job.days_fetched, job.rows_loaded, (job.error or "")[:1000] or None,
+             job.job_id),
+        )
+        rows = db2_utils._run_query(conn, f"SELECT STATUS FROM {ETL_JOBS} WHERE JOB_ID = ?", (job.job_id,))
+    return rows[0][0].strip() if rows else None
+
+def _touch_job_rows(job_ids: list) -> dict:
+    # Moves the heartbeat of this worker's active jobs to now, and returns the status of
+    # each one in the table, so a cancel from another API worker is noticed.
+    markers, params = db2_utils._in_list(job_ids)
+    with db2_utils._pooled_connection() as conn:
+        db2_utils._execute(
+            conn,
+            f"UPDATE {ETL_JOBS} SET HEARTBEAT_AT = ? WHERE JOB_ID IN ({markers}) AND ACTIVE_KEY IS NOT NULL",
+            (_utc_now(), *params),
+        )
+        rows = db2_utils._run_query(conn, f"SELECT JOB_ID, STATUS FROM {ETL_JOBS} WHERE JOB_ID IN ({markers})",
+                                    tuple(params))
+    return {row[0].strip(): row[1].strip() for row in rows}
+
+def _job_from_row(row) -> EtlJob:
+    job_key = row.JOB_KEY.strip()
+    job = EtlJob(int(job_key[:4]), int(job_key[5:7]), job_id=row.JOB_ID.strip())
+    job.status = row.STATUS.strip()
+    job.requested_at, job.started_at, job.finished_at = row.REQUESTED_AT, row.STARTED_AT, row.FINISHED_AT
+    job.days_total, job.days_fetched, job.rows_loaded = row.DAYS_TOTAL, row.DAYS_FETCHED, row.ROWS_LOADED
+    job.error = row.ERROR
+    job.persisted = True
+    return job
+
+def _read_job_rows(where: str = "", params: tuple = (), limit: int = 20) -> list:
+    with db2_utils._pooled_connection() as conn:
+        rows = db2_utils._run_query_records(
+            conn,
+            f"SELECT {_JOB_COLUMNS} FROM {ETL_JOBS} {where} ORDER BY REQUESTED_AT DESC FETCH FIRST {int(limit)} ROWS ONLY",
+            params,
+        )
+    return [_job_from_row(row) for row in rows]
+
+def _expire_stale_jobs() -> int:
+    # Every worker keeps the heartbeat of its queued and running jobs fresh (see
+    # EtlJobQueue._heartbeat_forever), so an old heartbeat means the worker process died.
+    # Those jobs are marked failed so their month can be triggered again.
+    cutoff = datetime.fromtimestamp(time.time() - get_settings().ETL_JOB_STALE_SECONDS, timezone.utc).replace(tzinfo=None)
+    with db2_utils._pooled_connection() as conn:
+        return db2_utils._execute(
+            conn,
+            f"UPDATE {ETL_JOBS} SET STATUS = ?, ACTIVE_KEY = NULL, FINISHED_AT = ?, "
+            "ERROR = 'The worker running this job stopped responding.' "
+            "WHERE ACTIVE_KEY IS NOT NULL AND HEARTBEAT_AT < ?",
+            (FAILED, _utc_now(), cutoff),
+        )
+
+
+class EtlJobQueue:
+    """
+    Runs ETL jobs in the background on a bounded pool of worker threads.
+
+    `submit` only records the job and hands it to the pool, so an API request that
+    triggers an ETL returns right away. At most one job per month is queued or running
+    at a time: asking for a month that is already being loaded returns the existing job,
+    in this process or (through the ETL_JOBS table) in any other API worker.
+
+    While a job is queued or running, a background thread saves its heartbeat every
+    ETL_JOB_HEARTBEAT_SECONDS, so other API workers never take a job that is waiting
+    for a free worker for a dead one.
+
+    If the ETL_JOBS table cannot be reached, jobs still run and are shown by
+    /etl/status, but only in the process that started them.
+
+    Args:
+        max_workers (int): How many jobs run at the same time.
+        max_queued (int): How many jobs may wait for a worker.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 100):
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="etl-job")
+        self._jobs = OrderedDict() # job_id -> EtlJob, oldest first
+        self._active = {}          # 'YYYY-MM' -> the queued or running EtlJob
+        self._lock = threading.Lock()
+        self._heartbeat = None     # The thread started by `_start_heartbeat`
+
+    def submit(self, year: int, month: int) -> tuple:
+        """
+        Queues a load of one month, unless one is already queued or running.
+
+        Args:
+            year (int): The year to load.
+            month (int): The month to load (1-12).
+
+        Returns:
+            tuple: (EtlJob, True if a new job was created or False if an active one was reused).
+
+        Raises:
+            EtlQueueFullError: If ETL_JOB_MAX_QUEUED jobs are already waiting.
+        """
+        job = EtlJob(year, month)
+        with self._lock:
+            existing = self._active.get(job.key)
+            if existing is not None:
+                return existing, False
+            if sum(1 for active in self._active.values() if active.status == QUEUED) >= self.max_queued:
+                raise EtlQueueFullError(f"{self.max_queued} ETL jobs are already waiting. Try again later.")
+            # Claimed under the lock, so two requests for the same month here cannot both create a job.
+            self._active[job.key] = job
+
+        try:
+            other = self._persist_new_job(job)
+        except Exception:
+            with self._lock:
+                del self._active[job.key]
+            raise
+        if other is not None:
+            # Another API worker is already loading this month.
+            with self._lock:
+                del self._active[job.key]
+            return other, False
+
+        with self._lock:
+            self._remember(job)
+            if job.persisted:
+                self._start_heartbeat()
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def _start_heartbeat(self):
+        # Called with self._lock held. The thread runs for the life of the process.
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._heartbeat_forever, name="etl-job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _heartbeat_forever(self):
+        # A queued job reports no progress, so without this its heartbeat would only be
+        # the time it was submitted, and another worker's recovery would expire it.
+        while True:
+            # At least a second apart, even if progress is saved more often than that.
+            time.sleep(max(get_settings().ETL_JOB_HEARTBEAT_SECONDS, 1.0))
+            with self._lock:
+                jobs = [job for job in self._active.values() if job.persisted and not job.is_finished]
+            if not jobs:
+                continue
+            try:
+                statuses = _touch_job_rows([job.job_id for job in jobs])
+            except Exception as e:
+                logger.warning("Could not save the heartbeat of %d ETL jobs: %s", len(jobs), e)
+                continue
+            for job in jobs:
+                if statuses.get(job.job_id) == CANCELLING:
+                    job.request_cancel()
+
+    def _persist_new_job(self, job: EtlJob):
+        # Saves a new job. Returns the other worker's job if that one already has the month.
+        for attempt in range(2):
+            try:
+                _insert_job_row(job)
+                job.persisted = True
+                return None
+            except Exception as e:
+                if "SQL0803N" not in str(e):
+                    logger.warning("Could not save ETL job %s, running it without saving: %s", job.key, e)
+                    return None
+            others = _read_job_rows("WHERE ACTIVE_KEY = ?", (job.key,), limit=1)
+            if others and attempt == 0 and _expire_stale_jobs():
+                continue # The active job was dead; try once more now that its key is free
+            return others[0] if others else None
+        return None
+
+    def _remember(self, job: EtlJob):
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > _MAX_JOBS_IN_MEMORY:
+            oldest_id = next(iter(self._jobs))
+            if not self._jobs[oldest_id].is_finished:
+                break
+            del self._jobs[oldest_id]
+
+    def _finish(self, job: EtlJob, status: str, error: str = None):
+        job.status = status
+        job.error = error
+        job.finished_at = _utc_now()
+        job._save()
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+        logger.info("ETL job %s for %s %s (%d days fetched, %d rows loaded).",
+                    job.job_id, job.key, status, job.days_fetched, job.rows_loaded)
+
+    def _run(self, job: EtlJob):
+        # Runs on a worker thread, never on an API request thread.
+        if job.is_cancelled():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = _utc_now()
+        job._save()
+        try:
+            result = main_etl.run_historical_pipeline(job.year, job.month, progress=job)
+        except main_etl.EtlCancelledError:
+            self._finish(job, CANCELLED)
+            return
+        except Exception as e:
+            logger.exception("ETL job %s for %s failed", job.job_id, job.key)
+            self._finish(job, FAILED, str(e))
+            return
+        job.update(days_fetched=result["days_fetched"], rows_loaded=result["inserted"])
+        if result["error"]:
+            self._finish(job, FAILED, result["error"])
+        else:
+            self._finish(job, SUCCEEDED)
+
+    def cancel(self, job_id: str) -> EtlJob:
+        """
+        Cancels a job. A queued job never starts; a running one stops at its next step.
+
+        Returns:
+            EtlJob: The job, with its status at the time of the call.
+
+        Raises:
+            EtlJobNotFoundError: If no job has this id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            if not job.is_finished:
+                job.request_cancel()
+                if job.status == RUNNING:
+                    job.status = CANCELLING
+            return job
+        # Maybe another API worker runs it: mark it in the table, its worker notices on its next save.
+        job = self.get(job_id)
+        if not job.is_finished:
+            with db2_utils._pooled_connection() as conn:
+                db2_utils._execute(conn, f"UPDATE {ETL_JOBS} SET STATUS = ? WHERE JOB_ID = ? AND ACTIVE_KEY IS NOT NULL",
+                                   (CANCELLING, job_id))
+            job.status = CANCELLING
+        return job
+
+    def get(self, job_id: str) -> EtlJob:
+        """
+        Returns a job by id, from this process or from the ETL_JOBS table.
+
+        Raises:
+            EtlJobNotFoundError: If no job has this id.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        try:
+            jobs = _read_job_rows("WHERE JOB_ID = ?", (job_id,), limit=1)
+        except Exception as e:
+            logger.warning("Could not read ETL job %s from %s: %s", job_id, ETL_JOBS, e)
+            jobs = []
+        if not jobs:
+            raise EtlJobNotFoundError(f"No ETL job with id {job_id}.")
+        return jobs[0]
+
+    def recent(self, limit: int = 20) -> list:
+        """
+        Returns the most recent jobs, newest first. Jobs of this process show their live progress.
+        """
+        with self._lock:
+            local = dict(self._jobs)
+        try:
+            jobs = [local.get(job.job_id, job) for job in _read_job_rows(limit=limit)]
+            jobs += [job for job in local.values() if not job.persisted]
+        except Exception as e:
+            logger.warning("Could not read ETL jobs from %s: %s", ETL_JOBS, e)
+            jobs = list(local.values())
+        jobs.sort(key=lambda job: job.requested_at, reverse=True)
+        return jobs[:limit]
+
+
+# The single queue used by the /etl endpoints, created the first time it is needed.
+_etl_jobs = None
+_etl_jobs_lock = threading.Lock()
+
+def _get_etl_jobs() -> EtlJobQueue:
+    """
+    Returns the shared ETL job queue, creating it the first time it is needed.
+
+    Returns:
+        EtlJobQueue: A queue with ETL_JOB_WORKERS workers and room for ETL_JOB_MAX_QUEUED jobs.
+    """
+    global _etl_jobs
+    if _etl_jobs is None:
+        with _etl_jobs_lock:
+            if _etl_jobs is None:
+                settings = get_settings()
+                _etl_jobs = EtlJobQueue(max_workers=settings.ETL_JOB_WORKERS, max_queued=settings.ETL_JOB_MAX_QUEUED)
+    return _etl_jobs
+
+
+def _months_between(start_date: date, end_date: date) -> list:
+    # Every (year, month) the range touches, in order.
+    months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def submit_etl_range(start_date: date, end_date: date) -> list:
+    """
+    Queues one job per month between two dates (the months are loaded whole, and
+    incrementally, so days that are already loaded cost nothing).
+
+    Args:
+        start_date (date): The first day to load.
+        end_date (date): The last day to load. Days after today are left out.
+
+    Returns:
+        list: (EtlJob, created) pairs, one per month.
+
+    Raises:
+        ValueError: If the range is empty, in the future, or longer than ETL_RUN_MAX_MONTHS.
+        EtlQueueFullError: If the queue fills up (the months queued before that stay queued).
+    """
+    end_date = min(end_date, date.today())
+    if start_date > end_date:
+        raise ValueError("start_date must be on or before end_date, and not in the future.")
+    months = _months_between(start_date, end_date)
+    max_months = get_settings().ETL_RUN_MAX_MONTHS
+    if len(months) > max_months:
+        raise ValueError(f"At most {max_months} months can be loaded at once, got {len(months)}.")
+    etl_jobs = _get_etl_jobs()
+    return [etl_jobs.submit(year, month) for year, month in months]
+
+
+def submit_latest_etl() -> list:
+    """
+    Queues a load of the current month (the default action of /etl/trigger).
+
+    Returns:
+        list: The (EtlJob, created) pair.
+    """
+    today = date.today()
+    return [_get_etl_jobs().submit(today.year, today.month)]
+
+
+def recover_stale_jobs():
+    """
+    Frees the months of jobs whose worker died (e.g. in a restart), so they can be
+    triggered again. Called at API startup.
+    """
+    expired = _expire_stale_jobs()
+    if expired:
+        logger.info("Marked %d stale ETL jobs as failed.", expired)
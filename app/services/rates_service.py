@@ -0,0 +1,350 @@
+import asyncio
+import calendar
+import hashlib
+import json
+import threading
+import time
+from datetime import date, timedelta
+from functools import partial
+from ..utils import db2_utils
+from ..utils.cache_utils import cross_rate_cache, history_cache, CROSS_RATE_KEY
+from ..utils.rate_store_utils import rate_store
+from ..utils.import_utils import _lazy_import
+from ..core.config import get_settings
+from .currency_service import ExchangeRateNotFoundError, _get_db_executor
+
+np = _lazy_import("numpy") # Imported the first time a cross-rate matrix or a history table is built
+
+class CrossRateMatrix:
+    """
+    Every exchange rate between every pair of currencies for one date.
+
+    The database only stores EUR to X rates. From those, `matrix[i, j]` is the rate from
+    `currencies[i]` to `currencies[j]` (EUR to j divided by EUR to i). The rows are also
+    kept as ready-to-send JSON responses, one per base currency, so answering
+    "/latest?base=USD" is a dictionary lookup with no arithmetic and no database query.
+
+    Attributes:
+        rate_date (str): The date of the rates (YYYY-MM-DD).
+        currencies (list): The currency codes, in the order of the matrix rows and columns.
+        matrix (np.ndarray): The N x N cross-rate matrix.
+        timestamp (int): When the rates were published (the last second of the day, UTC).
+    """
+
+    def __init__(self, rate_date: str, eur_rates: dict):
+        rates = dict(eur_rates)
+        rates['EUR'] = 1.0
+        self.rate_date = str(rate_date)
+        self.currencies = sorted(rates)
+        eur_to = np.array([rates[code] for code in self.currencies], dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Broadcasting builds the whole matrix at once: row i is every currency per one unit of currency i.
+            self.matrix = eur_to[np.newaxis, :] / eur_to[:, np.newaxis]
+        day = date.fromisoformat(self.rate_date)
+        self.timestamp = min(calendar.timegm(day.timetuple()) + 86399, int(time.time()))
+        self._index = {code: i for i, code in enumerate(self.currencies)}
+        self._responses = {
+            code: json.dumps({
+                "base": code,
+                "date": self.rate_date,
+                "timestamp": self.timestamp,
+                "rates": dict(zip(self.currencies, self.matrix[i].tolist())),
+            }).encode()
+            for code, i in self._index.items()
+        }
+
+    def rate(self, base_currency_code: str, target_currency_code: str) -> float:
+        """
+        Returns the rate from one currency to another.
+
+        Raises:
+            KeyError: If either currency is not in the matrix.
+        """
+        return float(self.matrix[self._index[base_currency_code], self._index[target_currency_code]])
+
+    def response_for_base(self, base_currency_code: str) -> bytes:
+        """
+        Returns the JSON response (base, date, timestamp, rates) for one base currency.
+
+        Raises:
+            KeyError: If the base currency is not in the matrix.
+        """
+        return self._responses[base_currency_code]
+
+
+_latest_rate_date = None
+_latest_rate_date_expires_at = 0.0
+_latest_rate_date_lock = threading.Lock()
+
+def _get_latest_rate_date() -> str:
+    """
+    Returns the most recent date that has rates in CURRENCY_RATES.
+
+    The answer is kept for LATEST_RATE_DATE_TTL_SECONDS so "/latest" does not run a
+    MAX(RATE_DATE) query on every request.
+
+    Raises:
+        ExchangeRateNotFoundError: If the table has no rates at all.
+    """
+    global _latest_rate_date, _latest_rate_date_expires_at
+    with _latest_rate_date_lock:
+        if _latest_rate_date is not None and time.monotonic() < _latest_rate_date_expires_at:
+            return _latest_rate_date
+    with db2_utils._pooled_connection() as conn:
+        rows = db2_utils._run_query(conn, f"SELECT MAX(RATE_DATE) FROM {get_settings().CURRENCY_RATES}",
+                                    query_name="latest_rate_date")
+    if not rows or rows[0][0] is None:
+        raise ExchangeRateNotFoundError("No exchange rates have been loaded yet.")
+    with _latest_rate_date_lock:
+        _latest_rate_date = str(rows[0][0])
+        _latest_rate_date_expires_at = time.monotonic() + get_settings().LATEST_RATE_DATE_TTL_SECONDS
+        return _latest_rate_date
+
+def _load_eur_rates(start_date: str, end_date: str) -> dict:
+    """
+    Reads the EUR to X rates of a date range with one query.
+
+    Returns:
+        dict: {'YYYY-MM-DD': {'USD': 1.1, 'EGP': 9.1, ...}, ...} for every date that has rates.
+    """
+    query = (f"SELECT RATE_DATE, TARGET_CURRENCY_CODE, EXCHANGE_RATE FROM {get_settings().CURRENCY_RATES} "
+             "WHERE RATE_DATE BETWEEN ? AND ?")
+    rates_by_date = {}
+    with db2_utils._pooled_connection() as conn:
+        for row_date, row_code, row_rate in db2_utils._run_query(conn, query, (str(start_date), str(end_date)),
+                                                                 query_name="rates_range"):
+            rates_by_date.setdefault(str(row_date), {})[row_code.strip()] = float(row_rate)
+    return rates_by_date
+
+def get_cross_rate_matrix(rate_date) -> CrossRateMatrix:
+    """
+    Returns the cross-rate matrix of a date, building it the first time it is asked for.
+
+    Args:
+        rate_date (str | date): The date of the rates (YYYY-MM-DD).
+
+    Returns:
+        CrossRateMatrix: Every rate between every pair of currencies on that date.
+
+    Raises:
+        ExchangeRateNotFoundError: If there are no rates for that date.
+    """
+    rate_date = date.fromisoformat(str(rate_date)).isoformat()
+    matrix = cross_rate_cache.get(rate_date, CROSS_RATE_KEY)
+    if matrix is not None:
+        return matrix
+    eur_rates = _load_eur_rates(rate_date, rate_date).get(rate_date)
+    if not eur_rates:
+        raise ExchangeRateNotFoundError(f"No exchange rates found for date: {rate_date}")
+    matrix = CrossRateMatrix(rate_date, eur_rates)
+    cross_rate_cache.put(rate_date, CROSS_RATE_KEY, matrix)
+    return matrix
+
+def _warm_cross_rate_matrices(days: int = None) -> int:
+    """
+    Builds the cross-rate matrices of the most recent days in one go (one range query).
+
+    Called when the API starts, so the first requests for recent dates are already
+    answered from memory. After that, rates loaded for recent dates rebuild their
+    matrices through `_on_rates_refreshed`.
+
+    Args:
+        days (int, optional): How many days back from the latest loaded date to build.
+                              Defaults to CROSS_RATE_WARM_DAYS.
+
+    Returns:
+        int: How many matrices were built.
+    """
+    days = get_settings().CROSS_RATE_WARM_DAYS if days is None else days
+    latest = date.fromisoformat(_get_latest_rate_date())
+    rates_by_date = _load_eur_rates((latest - timedelta(days=days - 1)).isoformat(), latest.isoformat())
+    for rate_date, eur_rates in rates_by_date.items():
+        cross_rate_cache.put(rate_date, CROSS_RATE_KEY, CrossRateMatrix(rate_date, eur_rates))
+    return len(rates_by_date)
+
+def _on_rates_refreshed(rate_dates):
+    """
+    Rebuilds the cross-rate matrices of the dates the in-memory rate store got new rates for.
+
+    The rate store refreshes in every API worker, whichever process (this one, another
+    worker or the Airflow DAG) loaded the rates, so a matrix built while its date was only
+    partly loaded is replaced everywhere. The matrices of recent dates are built right
+    away from the store, with no database query; older dates are only dropped and are
+    built again when they are asked for.
+
+    Args:
+        rate_dates (list): The 'YYYY-MM-DD' dates with new rates, or None for every date.
+    """
+    if rate_dates is None:
+        cross_rate_cache.invalidate()
+        return
+    recent_from = (date.today() - timedelta(days=get_settings().CROSS_RATE_WARM_DAYS)).isoformat()
+    for rate_date in rate_dates:
+        eur_rates = rate_store.rates_on(rate_date) if rate_date >= recent_from else None
+        if eur_rates:
+            cross_rate_cache.put(rate_date, CROSS_RATE_KEY, CrossRateMatrix(rate_date, eur_rates))
+        else:
+            cross_rate_cache.invalidate(rate_date, CROSS_RATE_KEY)
+
+rate_store.add_refresh_listener(_on_rates_refreshed)
+
+def get_rates_response(rate_date, base_currency_code: str = 'EUR') -> bytes:
+    """
+    Returns the JSON body for "/latest" or "/{date}" with any base currency.
+
+    Args:
+        rate_date (str | date | None): The date of the rates. None means the latest loaded date.
+        base_currency_code (str, optional): The base currency. Defaults to 'EUR'.
+
+    Returns:
+        bytes: {"base", "date", "timestamp", "rates"} as JSON.
+
+    Raises:
+        ExchangeRateNotFoundError: If there are no rates for that date.
+        ValueError: If the base currency is not one of the loaded currencies.
+    """
+    matrix = get_cross_rate_matrix(rate_date if rate_date is not None else _get_latest_rate_date())
+    try:
+        return matrix.response_for_base(base_currency_code.upper())
+    except KeyError:
+        raise ValueError(f"Unknown base currency '{base_currency_code}'. Available: {', '.join(matrix.currencies)}")
+
+async def get_rates_response_async(rate_date, base_currency_code: str = 'EUR') -> bytes:
+    """
+    Async version of `get_rates_response` for the API; runs on the bounded Db2 executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(get_rates_response, rate_date, base_currency_code))
+
+def get_available_currencies() -> list:
+    """
+    Returns the currency codes of the latest loaded date.
+    """
+    return get_cross_rate_matrix(_get_latest_rate_date()).currencies
+
+
+def _build_history_body(start_date: date, end_date: date, base_currency_code: str) -> tuple:
+    """
+    Builds the JSON body of a historical series with one range query.
+
+    The rates are sent as compact arrays instead of one object per day: a list of dates,
+    and for every currency a list of rates in the same order (null where a day has no rate).
+
+    Args:
+        start_date (date): The first date of the period.
+        end_date (date): The last date of the period (inclusive).
+        base_currency_code (str): The base currency of the returned rates.
+
+    Returns:
+        tuple: ({"base", "start_date", "end_date", "timestamp", "dates", "rates": {code: [...]}} as JSON bytes,
+                True if every day of the period has a rate for every currency of API_SYMBOLS).
+
+    Raises:
+        ExchangeRateNotFoundError: If the period has no rates.
+        ValueError: If the base currency is not one of the loaded currencies.
+    """
+    rates_by_date = _load_eur_rates(start_date.isoformat(), end_date.isoformat())
+    if not rates_by_date:
+        raise ExchangeRateNotFoundError(f"No exchange rates found between {start_date} and {end_date}")
+
+    dates = sorted(rates_by_date)
+    currencies = sorted(set().union(*rates_by_date.values()) | {'EUR'})
+    if base_currency_code not in currencies:
+        raise ValueError(f"Unknown base currency '{base_currency_code}'. Available: {', '.join(currencies)}")
+
+    # One row per date, one column per currency, NaN where a rate is missing.
+    column_of = {code: j for j, code in enumerate(currencies)}
+    table = np.full((len(dates), len(currencies)), np.nan)
+    for i, rate_date in enumerate(dates):
+        for code, rate in rates_by_date[rate_date].items():
+            table[i, column_of[code]] = rate
+    table[:, column_of['EUR']] = 1.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Re-base every row at once: the rate from the base to X is (EUR to X) / (EUR to base).
+        table = table / table[:, [column_of[base_currency_code]]]
+
+    # Complete: no day is missing and no day lacks one of the currencies the ETL loads.
+    expected_codes = {code.strip().upper() for code in get_settings().API_SYMBOLS.split(",") if code.strip()} - {'EUR'}
+    is_complete = (len(dates) == (end_date - start_date).days + 1
+                   and all(expected_codes.issubset(rates_by_date[rate_date]) for rate_date in dates))
+
+    last_day = date.fromisoformat(dates[-1])
+    body = json.dumps({
+        "base": base_currency_code,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "timestamp": min(calendar.timegm(last_day.timetuple()) + 86399, int(time.time())),
+        "dates": dates,
+        "rates": {code: [None if np.isnan(rate) else rate for rate in table[:, j].tolist()]
+                  for code, j in column_of.items()},
+    }, separators=(",", ":")).encode()
+    return body, is_complete
+
+def _get_history_response(start_date: date, end_date: date, base_currency_code: str, period: str) -> tuple:
+    """
+    Returns the body, a weak ETag and whether the response is final for a historical series.
+
+    A response is final once its period is over and every day of it is loaded (for every
+    currency of API_SYMBOLS): it can then never change, and browsers may keep it for good.
+    A past period with gaps is not final, because the ETL or an on-demand load can still
+    fill them, possibly in another process. Only final responses are kept in `history_cache`;
+    the others are built again on every request, so a filled gap shows up in every worker.
+
+    Args:
+        start_date (date): The first date of the period.
+        end_date (date): The last date of the period (inclusive).
+        base_currency_code (str): The base currency of the returned rates.
+        period (str): "M" for a month or "Y" for a year (part of the cache key).
+
+    Returns:
+        tuple: (body bytes, ETag string, is_final bool).
+    """
+    base_currency_code = base_currency_code.upper()
+    today = date.today()
+    if start_date > today:
+        raise ExchangeRateNotFoundError(f"No exchange rates exist yet for the period starting {start_date}")
+    is_closed = end_date < today
+    cache_key = f"{period}:{base_currency_code}"
+    if is_closed:
+        cached = history_cache.get(start_date, cache_key)
+        if cached is not None:
+            return cached
+
+    body, is_complete = _build_history_body(start_date, min(end_date, today), base_currency_code)
+    # The same body always gives the same tag, so it is valid across workers and restarts.
+    # It is weak (W/"..."): the GZip middleware sends other bytes for the same body, and a
+    # strong tag would have to differ between the plain and the compressed response.
+    etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    is_final = is_closed and is_complete
+    response = (body, etag, is_final)
+    if is_final:
+        history_cache.put(start_date, cache_key, response)
+    return response
+
+def get_monthly_history(year: int, month: int, base_currency_code: str = 'EUR') -> tuple:
+    """
+    Returns every daily rate of one month (see `_get_history_response` for the return value).
+    """
+    start_date = date(year, month, 1)
+    end_date = start_date.replace(day=calendar.monthrange(year, month)[1])
+    return _get_history_response(start_date, end_date, base_currency_code, "M")
+
+def get_yearly_history(year: int, base_currency_code: str = 'EUR') -> tuple:
+    """
+    Returns every rate loaded for one year (see `_get_history_response` for the return value).
+    """
+    return _get_history_response(date(year, 1, 1), date(year, 12, 31), base_currency_code, "Y")
+
+async def get_monthly_history_async(year: int, month: int, base_currency_code: str = 'EUR') -> tuple:
+    """
+    Async version of `get_monthly_history` for the API; runs on the bounded Db2 executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(get_monthly_history, year, month, base_currency_code))
+
+async def get_yearly_history_async(year: int, base_currency_code: str = 'EUR') -> tuple:
+    """
+    Async version of `get_yearly_history` for the API; runs on the bounded Db2 executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(get_yearly_history, year, base_currency_code))
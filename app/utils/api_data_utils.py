@@ -1,73 +1,394 @@
-import requests # Used for making HTTP requests to web services (APIs)
-import time     # Used for pausing the program (e.g., to avoid hitting API limits)
-from ..core.config import (BASE_URL, ACCESS_KEY) # Imports sensitive information (API base URL and access key) from a config file
+from __future__ import annotations
+import calendar # Used to know how many days each month has
+from datetime import date, datetime, timedelta
+import logging
+import random    # Used to spread retries out in time (jitter)
+import threading # Used so worker threads can share one HTTP session safely
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait # Runs several API calls at the same time
+from ..core.config import get_settings # Reads the API base URLs, access keys and request limits when they are needed
+from .circuit_breaker_utils import CircuitBreaker, OPEN # Stops using a key that keeps failing
 from .conversion_utils import _format_date_component # Imports a helper function for formatting date parts
+from .rate_limit_utils import TokenBucket # Keeps us within the provider's request quota
+from .import_utils import _lazy_import
+from .log_utils import _log_sampled
+from .metrics_utils import (registry, PROVIDER_REQUEST_SECONDS, PROVIDER_RESPONSES, PROVIDER_FAILOVERS,
+                            PROVIDER_HEDGES, PROVIDER_MISSING_DAYS)
 
-# This line is likely for testing the _format_date_component function when the script runs directly.
-print(_format_date_component(5))
+requests = _lazy_import("requests") # Used for making HTTP requests to web services (APIs), imported on first use
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ProviderError(Exception):
+    pass # raised when no access key could get an answer from the provider
+
+
+class _CallFailed(Exception):
+    """
+    One failed call with one access key, and what the failure says about what to do next.
+
+    Attributes:
+        reason (str): A short label for logs and /metrics, e.g. 'timeout' or 'http_503'.
+        retryable (bool): Trying again later (or with another key) may work.
+        key_failure (bool): The key itself is the problem; counts against its circuit breaker.
+        trip (bool): The key will keep failing (rejected, quota used up), so its breaker opens at once.
+        permanent (bool): The request itself is wrong (e.g. HTTP 400); no key or retry will fix it.
+        retry_after (float): Seconds the provider asked us to wait (Retry-After), or None.
+    """
+
+    def __init__(self, reason: str, retryable: bool = True, key_failure: bool = True, trip: bool = False,
+                 permanent: bool = False, retry_after: float = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retryable = retryable
+        self.key_failure = key_failure
+        self.trip = trip
+        self.permanent = permanent
+        self.retry_after = retry_after
+
+
+class _ProviderKey:
+    """
+    One access key of one provider, with its own request quota and circuit breaker.
+
+    Attributes:
+        name (str): 'primary', 'backup' or 'secondary' (used in logs and /metrics, never the key).
+        base_url (str): The provider's base URL, ending with '/'.
+        access_key (str): The access key sent with every call.
+        rate_limiter (TokenBucket): The key's request quota.
+        breaker (CircuitBreaker): Stops the use of the key while it keeps failing.
+    """
+
+    def __init__(self, name: str, base_url: str, access_key: str, rate_limiter: TokenBucket):
+        self.name = name
+        self.base_url = base_url
+        self.access_key = access_key
+        self.rate_limiter = rate_limiter
+        settings = get_settings()
+        self.breaker = CircuitBreaker(settings.API_CIRCUIT_FAILURE_THRESHOLD, settings.API_CIRCUIT_RESET_SECONDS)
+
+
+def _build_provider_keys() -> list:
+    """
+    Lists the access keys to try, in order: ACCESS_KEY, then BACKUP_ACCESS_KEY (same provider),
+    then SECONDARY_ACCESS_KEY at SECONDARY_BASE_URL (a second provider with the same API).
+    Only the keys that are configured are listed. Every key has its own quota: a token
+    bucket set to the provider's real request quota, shared by every call made with it.
+
+    Returns:
+        list: The _ProviderKey objects.
+    """
+    settings = get_settings()
+
+    def new_rate_limiter():
+        return TokenBucket(rate=settings.API_RATE_LIMIT_PER_SECOND, capacity=settings.API_RATE_LIMIT_BURST)
+
+    keys = [_ProviderKey("primary", settings.BASE_URL, settings.ACCESS_KEY, new_rate_limiter())]
+    if settings.BACKUP_ACCESS_KEY and settings.BACKUP_ACCESS_KEY != settings.ACCESS_KEY:
+        keys.append(_ProviderKey("backup", settings.BASE_URL, settings.BACKUP_ACCESS_KEY, new_rate_limiter()))
+    if settings.SECONDARY_BASE_URL and settings.SECONDARY_ACCESS_KEY:
+        keys.append(_ProviderKey("secondary", settings.SECONDARY_BASE_URL, settings.SECONDARY_ACCESS_KEY,
+                                 new_rate_limiter()))
+    return keys
+
+_provider_keys = None
+_provider_keys_lock = threading.Lock()
+
+def _get_provider_keys() -> list:
+    """
+    Returns the shared provider keys, building them from the settings the first time they are needed.
+
+    Returns:
+        list: The _ProviderKey objects, in the order they are tried.
+    """
+    global _provider_keys
+    if _provider_keys is None:
+        with _provider_keys_lock:
+            if _provider_keys is None:
+                _provider_keys = _build_provider_keys()
+    return _provider_keys
+
+# Keys that were never used have no open breaker, so /metrics does not build them.
+registry.gauge_function(
+    "egp_provider_circuit_open", "1 while a provider key's circuit breaker refuses calls.",
+    lambda: {(key.name,): int(key.breaker.state == OPEN) for key in (_provider_keys or [])}, ("key",))
+
+# Threads that run the two calls of a hedged request (see `_request_hedged`).
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """
+    Returns the shared HTTP session, creating it the first time it is needed.
+
+    Reusing one session keeps connections to the provider open (keep-alive), so
+    each call skips the TCP and TLS handshake. The connection pool is sized to
+    the number of worker threads that may call the API at the same time.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=get_settings().API_MAX_CONCURRENCY)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+def _send_api_request(url: str, rate_limiter: TokenBucket = None) -> requests.Response:
+    """
+    Sends one GET request to the provider, waiting for a rate-limit token first.
+
+    Args:
+        url (str): The full URL to request.
+        rate_limiter (TokenBucket, optional): The quota of the key in the URL. Defaults to the primary key's.
+
+    Returns:
+        requests.Response: The provider's response.
+    """
+    (rate_limiter or _get_provider_keys()[0].rate_limiter).acquire()
+    endpoint = _endpoint_name(url)
+    started = time.perf_counter()
+    try:
+        response = _get_session().get(url, timeout=get_settings().API_REQUEST_TIMEOUT_SECONDS)
+    except Exception as e:
+        # Timeouts and connection errors are counted by their type instead of a status code.
+        PROVIDER_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+        PROVIDER_RESPONSES.inc(endpoint, type(e).__name__)
+        raise
+    PROVIDER_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+    PROVIDER_RESPONSES.inc(endpoint, str(response.status_code))
+    return response
+
+def _endpoint_name(url: str) -> str:
+    # 'latest', 'timeseries' or 'historical' (a date), used as the label of the provider metrics.
+    path = url.split("?", 1)[0].rstrip("/")
+    last_part = path.rsplit("/", 1)[-1]
+    return last_part if last_part in ("latest", "timeseries") else "historical"
+
+def _retry_after_seconds(response) -> float:
+    # The Retry-After header of a 429 or 503 answer, when it is given in seconds.
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def _call_provider_key(key: _ProviderKey, path: str, query: str = "") -> dict:
+    """
+    Makes one call with one access key and sorts out what a failure means.
+
+    Args:
+        key (_ProviderKey): The key (and provider) to use.
+        path (str): The endpoint after the base URL, e.g. 'latest' or '2024-05-01'.
+        query (str, optional): More query parameters, starting with '&'.
+
+    Returns:
+        dict: The provider's JSON answer. Answers with other provider errors (e.g. an
+              invalid date) are returned as they are, like before, for the caller to check.
+
+    Raises:
+        _CallFailed: If the call failed.
+    """
+    url = f"{key.base_url}{path}?access_key={key.access_key}{query}"
+    logger.debug("Requesting %s", url) # Logs the URL being accessed (the access key is redacted).
+    try:
+        response = _send_api_request(url, key.rate_limiter)
+    except requests.exceptions.Timeout:
+        # The API server did not respond within API_REQUEST_TIMEOUT_SECONDS.
+        raise _CallFailed("timeout")
+    except requests.exceptions.RequestException as e:
+        # Network problems (DNS failure, refused connection, etc.) and other request issues.
+        raise _CallFailed(type(e).__name__)
+
+    status = response.status_code
+    if status in (401, 403):
+        raise _CallFailed(f"http_{status}", retryable=False, trip=True)
+    if status == 429 or status >= 500:
+        raise _CallFailed(f"http_{status}", retry_after=_retry_after_seconds(response))
+    if status >= 400:
+        # A bad request (e.g. 400 or 404) is not the key's fault and fails the same way everywhere.
+        raise _CallFailed(f"http_{status}", retryable=False, key_failure=False, permanent=True)
+
+    try:
+        data = response.json()
+    except ValueError:
+        # Not JSON, e.g. an HTML error page from a proxy in front of the provider.
+        raise _CallFailed("invalid_json")
+
+    error = data.get("error") if isinstance(data, dict) and data.get("success") is False else None
+    code = error.get("code") if isinstance(error, dict) else None
+    if code == 104:
+        raise _CallFailed("quota_exhausted", retryable=False, trip=True)
+    if code in (101, 102):
+        raise _CallFailed(f"provider_{code}", retryable=False, trip=True)
+    if code == 105:
+        # The endpoint is not in this key's plan; the key still works for the other endpoints.
+        raise _CallFailed("provider_105", retryable=False, key_failure=False)
+    return data
+
+def _call_with_breaker(key: _ProviderKey, path: str, query: str) -> dict:
+    # One call with one key, reporting its outcome to the key's circuit breaker.
+    try:
+        data = _call_provider_key(key, path, query)
+    except _CallFailed as failure:
+        if failure.trip:
+            key.breaker.trip()
+        elif failure.key_failure:
+            key.breaker.record_failure()
+        else:
+            key.breaker.record_success() # The key answered; the request was the problem
+        raise
+    except Exception:
+        key.breaker.record_failure()
+        raise
+    key.breaker.record_success()
+    return data
+
+def _backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """
+    How long to wait before retry number `attempt` (1 for the first retry).
+
+    The wait is a random time between 0 and API_RETRY_BASE_DELAY_SECONDS * 2^(attempt - 1),
+    capped at API_RETRY_MAX_DELAY_SECONDS ("full jitter"), so many workers that failed at
+    the same moment do not all retry at the same moment. A Retry-After asked for by the
+    provider is respected (up to the cap).
+
+    Args:
+        attempt (int): The retry number.
+        retry_after (float, optional): The seconds the provider asked us to wait.
+
+    Returns:
+        float: The seconds to wait.
+    """
+    settings = get_settings()
+    delay = random.uniform(0, min(settings.API_RETRY_MAX_DELAY_SECONDS,
+                                  settings.API_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+    if retry_after:
+        delay = max(delay, min(retry_after, settings.API_RETRY_MAX_DELAY_SECONDS))
+    return delay
+
+def _request_with_failover(path: str, query: str = "", keys: list = None) -> dict:
+    """
+    Gets one answer from the provider, moving on to the next access key when one fails
+    and retrying with backoff when every key failed.
+
+    Each round tries the keys in order (primary, backup, secondary), skipping keys whose
+    circuit breaker is open. A key that fails in a way that will not go away (rejected key,
+    quota used up) opens its breaker at once, so later calls skip it without waiting.
+    Up to API_RETRY_ATTEMPTS rounds are made, with a jittered, growing wait between them.
+
+    Args:
+        path (str): The endpoint after the base URL, e.g. 'latest' or '2024-05-01'.
+        query (str, optional): More query parameters, starting with '&'.
+        keys (list, optional): The keys to try, in order. Defaults to every configured key.
+
+    Returns:
+        dict: The provider's JSON answer.
+
+    Raises:
+        ProviderError: If no key got an answer, the request itself is invalid,
+                       or every key's breaker is open.
+    """
+    keys = keys or _get_provider_keys()
+    failures = []
+    for attempt in range(max(1, get_settings().API_RETRY_ATTEMPTS)):
+        if attempt:
+            time.sleep(_backoff_delay(attempt, max((f.retry_after or 0 for f in failures), default=None)))
+        failures = []
+        for key in keys:
+            if not key.breaker.allow_request():
+                continue
+            try:
+                return _call_with_breaker(key, path, query)
+            except _CallFailed as failure:
+                if failure.permanent:
+                    raise ProviderError(f"The provider rejected the request for {path}: {failure.reason}")
+                failures.append(failure)
+                PROVIDER_FAILOVERS.inc(key.name, failure.reason)
+                logger.info("Provider call for %s with the %s key failed (%s).", path, key.name, failure.reason)
+        if not failures:
+            raise ProviderError(f"Every provider key is paused after repeated failures; not requesting {path}.")
+        if not any(failure.retryable for failure in failures):
+            break # Every key failed in a way a retry will not fix
+    reasons = ", ".join(failure.reason for failure in failures)
+    raise ProviderError(f"No provider key could get {path} ({reasons}).")
+
+def _request_hedged(path: str, query: str = "") -> dict:
+    """
+    Like `_request_with_failover`, but if the first call has not answered after
+    API_HEDGE_DELAY_SECONDS, a second call is started with the next key (or the same key,
+    if it is the only one), and whichever answers first is used.
+
+    This cuts the slow tail of latency-sensitive calls (a stuck connection, a slow
+    provider node) at the cost of an extra call in those rare cases. The slower call is
+    not stopped; its answer is dropped.
+
+    Returns:
+        dict: The provider's JSON answer.
+
+    Raises:
+        ProviderError: If both calls failed.
+    """
+    global _hedge_executor
+    hedge_delay = get_settings().API_HEDGE_DELAY_SECONDS
+    keys = [key for key in _get_provider_keys() if key.breaker.state != OPEN]
+    if hedge_delay <= 0 or not keys:
+        return _request_with_failover(path, query)
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="provider-hedge")
+
+    first = _hedge_executor.submit(_request_with_failover, path, query, keys)
+    done, _ = wait([first], timeout=hedge_delay)
+    if done:
+        return first.result()
+    # The hedge starts with the next key, so both calls do not wait on the same slow key.
+    second = _hedge_executor.submit(_request_with_failover, path, query, keys[1:] + keys[:1])
+    pending = {first: "first", second: "hedge"}
+    error = None
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            winner = pending.pop(future)
+            try:
+                data = future.result()
+            except ProviderError as e:
+                error = e
+                continue
+            PROVIDER_HEDGES.inc(winner)
+            return data
+    raise error
 
 # --- Fetch current/latest data ---
 def _get_api_latest_data() -> dict:
     """
     Fetches the most current (latest) currency exchange rates from the API.
 
-    This function constructs a URL to get the very latest exchange rates
-    and handles various network or API-related errors that might occur.
+    The call is hedged (see `_request_hedged`) and fails over to the backup key or the
+    secondary provider, with retries and backoff (see `_request_with_failover`).
 
     Returns:
         dict: A Python dictionary containing the latest currency rate data if successful.
-              Returns None if there's any error during the fetching process.
+              Returns None if no key could get the data.
     """
-    # Constructs the full URL for the 'latest' endpoint, including the API base URL and access key.
-    url = f"{BASE_URL}latest?access_key={ACCESS_KEY}"
-    print(url) # Prints the URL being accessed (useful for debugging).
-
     try:
-        # Sends a GET request to the constructed URL.
-        response = requests.get(url)
-        # Checks if the HTTP request was successful (status code 200).
-        # If not, it raises an HTTPError.
-        response.raise_for_status()
-        # Parses the JSON response body into a Python dictionary.
-        data = response.json()
-        print("data fetched:", data) # Prints the fetched data (for debugging/info).
-        print("Latest Currency API Data Fetched Successfully!")
-        return data # Returns the fetched data.
-
-    except requests.exceptions.HTTPError as e:
-        # Handles errors where the server responded with a 4xx (client error) or 5xx (server error) status code.
-        print(f"HTTP Error fetching currency data: {e} (Status Code: {e.response.status_code})")
-        print("data fetched: None")
-        return None
-    except requests.exceptions.ConnectionError as e:
-        # Handles errors related to network problems (e.g., no internet, DNS issues, server not reachable).
-        print(f"Connection Error fetching currency data: {e} (Network problem like DNS failure, refused connection, etc.)")
-        print("data fetched: None")
-        return None
-    except requests.exceptions.Timeout as e:
-        # Handles errors where the API server did not respond within a specified time limit.
-        print(f"Timeout Error fetching currency data: {e} (The request timed out)")
-        print("data fetched: None")
-        return None
-    except requests.exceptions.RequestException as e:
-        # A general error handler for any other issues that might occur during the request.
-        print(f"General Request Error fetching currency data: {e} (Catch-all for other request issues)")
-        print("data fetched: None")
+        data = _request_hedged("latest")
+    except ProviderError as e:
+        logger.warning("Could not fetch the latest currency data: %s", e)
         return None
-    except ValueError as e: # This specifically catches json.JSONDecodeError if response.json() fails
-        # Handles errors where the API response is not valid JSON and cannot be parsed.
-        print(f"JSON Decoding Error: The API response could not be parsed as JSON: {e}")
-        print("data fetched: None")
-        return None
-    except Exception as e:
-        # A catch-all for any other unexpected errors that were not specifically handled above.
-        print(f"An unexpected error occurred in _get_api_latest_data: {e}")
-        print("data fetched: None")
-        return None
-    finally:
-        # This block always runs, whether an error occurred or not.
-        # It pauses the program for 4 seconds to avoid hitting API rate limits.
-        time.sleep(4)
+    logger.debug("Data fetched: %s", data) # Logs the fetched data (formatted only at DEBUG level).
+    logger.debug("Latest Currency API Data Fetched Successfully!")
+    return data
 
 
 # --- Fetch Historical data from the API for a specific date ---
@@ -75,9 +396,11 @@ def _get_api_data_for_date(year: int, month: int, day: int) -> dict:
     """
     Fetches historical currency exchange rates for a single, specific date.
 
-    This function formats the given year, month, and day into a date string
-    and constructs a URL to request historical data from the API. It includes
-    error handling for various network and API response issues.
+    This function formats the given year, month, and day into a date string and
+    requests historical data from the API, failing over to the backup key or the
+    secondary provider and retrying with backoff (see `_request_with_failover`).
+    Every call waits for a rate-limit token of its key, so many dates can be
+    fetched at the same time from worker threads.
 
     Args:
         year (int): The year of the historical data (e.g., 2015).
@@ -86,60 +409,21 @@ def _get_api_data_for_date(year: int, month: int, day: int) -> dict:
 
     Returns:
         dict: A Python dictionary containing the historical currency rate data for the specified date.
-              Returns None if there's any error during the fetching process.
+              Returns None if no key could get the data.
     """
     # Formats the month and day to ensure they are always two digits (e.g., 5 becomes "05").
     formatted_month = _format_date_component(month)
     formatted_day = _format_date_component(day)
-    # Constructs the full URL for the historical endpoint, including the date, API key,
-    # and specific symbols (currencies) to fetch.
-    url = f"{BASE_URL}{year}-{formatted_month}-{formatted_day}?access_key={ACCESS_KEY}&symbols=EGP,USD,EUR,DZD&format=1"
-    print(url) # Prints the URL being accessed.
-
     try:
-        # Sends a GET request to the historical data URL.
-        response = requests.get(url)
-        # Checks for HTTP errors (4xx or 5xx status codes).
-        response.raise_for_status()
-        # Parses the JSON response into a Python dictionary.
-        data = response.json()
-        print("data fetched:", data) # Prints the fetched data.
-        print("Currency API Data Fetched Successfully!")
-        return data # Returns the fetched data.
-
-    except requests.exceptions.HTTPError as e:
-        # Handles HTTP errors, providing specific context for the date.
-        print(f"HTTP Error fetching currency data for {year}-{formatted_month}-{formatted_day}: {e} (Status Code: {e.response.status_code})")
-        print("data fetched: None")
+        # The date, plus the specific symbols (currencies) to fetch.
+        data = _request_with_failover(f"{year}-{formatted_month}-{formatted_day}", f"&symbols={get_settings().API_SYMBOLS}&format=1")
+    except ProviderError as e:
+        logger.warning("Could not fetch currency data for %s-%s-%s: %s", year, formatted_month, formatted_day, e)
         return None
-    except requests.exceptions.ConnectionError as e:
-        # Handles network connection errors.
-        print(f"Connection Error fetching currency data for {year}-{formatted_month}-{formatted_day}: {e} (Network problem)")
-        print("data fetched: None")
-        return None
-    except requests.exceptions.Timeout as e:
-        # Handles request timeouts.
-        print(f"Timeout Error fetching currency data for {year}-{formatted_month}-{formatted_day}: {e} (The request timed out)")
-        print("data fetched: None")
-        return None
-    except requests.exceptions.RequestException as e:
-        # General error handler for other request issues.
-        print(f"General Request Error fetching currency data for {year}-{formatted_month}-{formatted_day}: {e}")
-        print("data fetched: None")
-        return None
-    except ValueError as e: # This handles json.JSONDecodeError if response.json() fails
-        # Handles errors if the API response is not valid JSON.
-        print(f"JSON Decoding Error for {year}-{formatted_month}-{formatted_day}: The API response could not be parsed as JSON: {e}")
-        print("data fetched: None")
-        return None
-    except Exception as e:
-        # Catch-all for any other unexpected errors.
-        print(f"An unexpected error occurred in _get_api_data_for_date for {year}-{formatted_month}-{formatted_day}: {e}")
-        print("data fetched: None")
-        return None
-    finally:
-        # This block always runs. Pauses for 4 seconds to manage API request frequency.
-        time.sleep(4)
+    # One payload per day, so only a sample of them is logged.
+    _log_sampled(logger, logging.DEBUG, "Data fetched: %s", data)
+    logger.debug("Currency API Data Fetched Successfully!")
+    return data
 
 
 def _fetch_currency_data(year: int, month: int, day: int) -> dict:
@@ -159,14 +443,190 @@ def _fetch_currency_data(year: int, month: int, day: int) -> dict:
     """
     return _get_api_data_for_date(year, month, day)
 
+# --- Fetch Historical data from the API for a range of dates in one call ---
+def _get_api_timeseries_data(start_date: date, end_date: date) -> dict:
+    """
+    Fetches historical currency exchange rates for every day between two dates in one call.
+
+    This uses the provider's timeseries endpoint, which returns all the days of the
+    range in a single response (the provider allows at most API_TIMESERIES_MAX_DAYS
+    days per call). It includes the same error handling as `_get_api_data_for_date`.
+
+    Args:
+        start_date (date): The first day of the range.
+        end_date (date): The last day of the range (inclusive).
+
+    Returns:
+        dict: The provider's timeseries response, whose 'rates' maps each date
+              ('YYYY-MM-DD') to that day's rates. Returns None if there's any error
+              or if the provider reports the request as unsuccessful.
+    """
+    try:
+        data = _request_with_failover(
+            "timeseries", f"&start_date={start_date.isoformat()}&end_date={end_date.isoformat()}&symbols={get_settings().API_SYMBOLS}")
+    except ProviderError as e:
+        logger.warning("Could not fetch timeseries data for %s to %s: %s", start_date, end_date, e)
+        return None
+    # The provider answers with HTTP 200 and success=false for other problems (e.g. an invalid range).
+    if not data.get("success", False) or not isinstance(data.get("rates"), dict):
+        logger.warning("Timeseries request for %s to %s was not successful: %s", start_date, end_date, data.get('error'))
+        return None
+    logger.debug("Currency API Timeseries Data Fetched Successfully for %s to %s!", start_date, end_date)
+    return data
+
+def _to_date(value) -> date:
+    # Accepts date objects, datetime objects or 'YYYY-MM-DD' strings.
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+def _split_into_windows(start_date: date, end_date: date, max_days: int) -> list:
+    """
+    Splits a date range into the fewest consecutive windows of at most `max_days` days.
+
+    Args:
+        start_date (date): The first day of the range.
+        end_date (date): The last day of the range (inclusive).
+        max_days (int): The most days one window may cover.
+
+    Returns:
+        list: A list of (window_start, window_end) date pairs covering the whole range.
+    """
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(end_date, window_start + timedelta(days=max_days - 1))
+        windows.append((window_start, window_end))
+        window_start = window_end + timedelta(days=1)
+    return windows
+
+def _timeseries_day_to_payload(base: str, day: str, rates: dict) -> dict:
+    """
+    Reshapes one day of a timeseries response into the single-date response format.
+
+    Every later step (transform, load, CSV export) expects the shape returned by
+    `_get_api_data_for_date`, so timeseries days are converted into that shape.
+
+    Args:
+        base (str): The base currency of the response (e.g., 'EUR').
+        day (str): The date of the rates ('YYYY-MM-DD').
+        rates (dict): The rates for that day, e.g. {'USD': 1.3, 'EGP': 9.1}.
+
+    Returns:
+        dict: A dictionary with 'success', 'timestamp', 'historical', 'base', 'date' and 'rates'.
+    """
+    day_date = _to_date(day)
+    # The provider stamps historical rates with the last second of the day (UTC).
+    timestamp = calendar.timegm(day_date.timetuple()) + 86399
+    return {"success": True, "timestamp": timestamp, "historical": True, "base": base, "date": day, "rates": rates}
+
+def _fetch_timeseries_days(start_date: date, end_date: date) -> dict:
+    """
+    Fetches a date range with timeseries calls only (no single-day fallback).
+
+    Args:
+        start_date (date): The first day of the range.
+        end_date (date): The last day of the range (inclusive).
+
+    Returns:
+        dict: date -> single-date style payload for every day the provider returned.
+              Empty if API_TIMESERIES_ENABLED is off or every call failed.
+    """
+    results = {}
+    settings = get_settings()
+    if not settings.API_TIMESERIES_ENABLED:
+        return results
+    for window_start, window_end in _split_into_windows(start_date, end_date, settings.API_TIMESERIES_MAX_DAYS):
+        data = _get_api_timeseries_data(window_start, window_end)
+        if data is None:
+            continue
+        base = data.get("base", "EUR")
+        for day, rates in data["rates"].items():
+            day_date = _to_date(day)
+            if start_date <= day_date <= end_date and rates:
+                results[day_date] = _timeseries_day_to_payload(base, day_date.isoformat(), rates)
+    return results
+
+def _fetch_currency_data_for_range(start_date, end_date) -> dict:
+    """
+    Fetches currency data for every day between two dates using as few API calls as possible.
+
+    The range is split into windows of at most API_TIMESERIES_MAX_DAYS days and each
+    window is fetched with one timeseries call. Only days that the timeseries calls
+    did not return (or every day, if API_TIMESERIES_ENABLED is off) are fetched one
+    by one with the single-date endpoint. Days after today are never requested.
+
+    Args:
+        start_date (date | str): The first day of the range (a date or 'YYYY-MM-DD').
+        end_date (date | str): The last day of the range (inclusive).
+
+    Returns:
+        dict: A dictionary where keys are dates and values are currency data dictionaries
+              in the same format `_get_api_data_for_date` returns. Days for which data
+              could not be fetched will be absent.
+    """
+    start_date, end_date = _to_date(start_date), _to_date(end_date)
+    end_date = min(end_date, date.today())
+    if start_date > end_date:
+        return {}
+
+    results = _fetch_timeseries_days(start_date, end_date)
+
+    # Fall back to single-date calls only for the gaps the timeseries calls left.
+    missing = []
+    current = start_date
+    while current <= end_date:
+        if current not in results:
+            missing.append((current.year, current.month, current.day))
+        current += timedelta(days=1)
+    if missing:
+        if get_settings().API_TIMESERIES_ENABLED:
+            logger.info("Fetching %s missing days one by one.", len(missing))
+        for (y, m, d), data in _fetch_currency_data_for_dates(missing).items():
+            results[date(y, m, d)] = data
+    return dict(sorted(results.items()))
+
+def _fetch_currency_data_for_dates(dates: list) -> dict:
+    """
+    Fetches currency data for many dates at the same time.
+
+    The dates are spread over a pool of up to API_MAX_CONCURRENCY worker threads
+    that share one HTTP session. The shared token bucket keeps the total request
+    rate within the provider's quota, and every request has its own timeout.
+
+    Args:
+        dates (list): A list of (year, month, day) tuples.
+
+    Returns:
+        dict: A dictionary where keys are the (year, month, day) tuples and values
+              are the currency data dictionaries. Dates for which data could not be
+              fetched will be absent from this dictionary.
+    """
+    if not dates:
+        return {}
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(get_settings().API_MAX_CONCURRENCY, len(dates))) as executor:
+        fetched = executor.map(lambda ymd: _fetch_currency_data(*ymd), dates)
+        # executor.map gives results back in the same order as the dates.
+        for ymd, data in zip(dates, fetched):
+            if data is not None:
+                results[ymd] = data
+            else:
+                # Only after every retry and every key failed; the incremental ETL fetches the day again next run.
+                PROVIDER_MISSING_DAYS.inc()
+                logger.warning("Could not fetch data for %s-%s-%s. Skipping this day.", ymd[0], ymd[1], ymd[2])
+    return results
+
 # --- Fetch currency data for a month ---
 def _fetch_currency_data_for_month(year: int, month: int) -> dict:
     """
     Fetches currency data for each day of a given month.
 
-    This function iterates through all possible days in a month (1 to 31,
-    actual day count handled by the API itself or external validation)
-    and attempts to fetch data for each day. It gracefully handles cases
+    All days of the month (using the real number of days from the 'calendar' module)
+    are fetched by `_fetch_currency_data_for_range`, which uses one timeseries call
+    and only falls back to single-day calls for gaps. It gracefully handles cases
     where data for a specific day cannot be fetched.
 
     Args:
@@ -178,18 +638,11 @@ def _fetch_currency_data_for_month(year: int, month: int) -> dict:
               are the currency data dictionaries for that day. Days for which
               data could not be fetched will be absent from this dictionary.
     """
-    month_data = {} # Initialize an empty dictionary to store data for the month
-    # Loop from day 1 to day 31. The API will naturally return no data for invalid days (e.g., Feb 30).
-    # A more robust solution might use the 'calendar' module to get exact days in a month.
-    for day in range(1, 32):
-        data_for_day = _fetch_currency_data(year, month, day)
-        if data_for_day is not None:
-            # If data was successfully fetched, add it to the month_data dictionary using the day as key.
-            month_data[day] = data_for_day
-        else:
-            # If fetching failed for a day, print a warning and skip that day.
-            print(f"Warning: Could not fetch data for {year}-{month}-{day}. Skipping this day.")
-    return month_data
+    year, month = int(year), int(month)
+    days_in_month = calendar.monthrange(year, month)[1]
+    fetched = _fetch_currency_data_for_range(date(year, month, 1), date(year, month, days_in_month))
+    # Keep the original shape: day number -> data, in day order.
+    return {day_date.day: data for day_date, data in fetched.items()}
 
 # --- Fetch currency data for a year (first day of each month) ---
 def _fetch_currency_data_for_year(year: int) -> dict:
@@ -197,8 +650,9 @@ def _fetch_currency_data_for_year(year: int) -> dict:
     Fetches currency data for the first day of each month in a given year.
 
     This function is useful for getting a yearly overview by sampling the
-    exchange rate on the first day of every month. It handles cases where
-    data for a specific month's first day cannot be fetched.
+    exchange rate on the first day of every month. When the timeseries endpoint is
+    available the whole year comes back in one call; otherwise the twelve dates are
+    fetched concurrently. Months whose first day cannot be fetched are skipped.
 
     Args:
         year (int): The year for which to fetch data.
@@ -208,24 +662,27 @@ def _fetch_currency_data_for_year(year: int) -> dict:
               are the currency data dictionaries for the first day of that month.
               Months for which data could not be fetched will be absent.
     """
-    year_data = {} # Initialize an empty dictionary to store data for the year
-    for month in range(1, 13): # Loop through all 12 months (1 to 12)
-        # Fetch data specifically for the 1st day of the current month.
-        data_for_month = _fetch_currency_data(year, month, 1)
-        if data_for_month is not None:
-            # If data was successfully fetched, add it to the year_data dictionary using the month as key.
-            year_data[month] = data_for_month
-        else:
-            # If fetching failed for the 1st of a month, print a warning and skip that month.
-            print(f"Warning: Could not fetch data for {year}-{month}-01. Skipping this month.")
-    return year_data
+    year = int(year)
+    first_days = [date(year, month, 1) for month in range(1, 13) if date(year, month, 1) <= date.today()]
+    if not first_days:
+        return {}
+    # One timeseries call from January 1st to the last sampled month covers every sample day.
+    fetched = _fetch_timeseries_days(first_days[0], first_days[-1])
+    year_data = {day_date.month: fetched[day_date] for day_date in first_days if day_date in fetched}
+    # Only the first-of-month days the timeseries call did not return are fetched one by one.
+    missing = [(d.year, d.month, d.day) for d in first_days if d.month not in year_data]
+    for (y, month, d), data in _fetch_currency_data_for_dates(missing).items():
+        year_data[month] = data
+    return dict(sorted(year_data.items()))
 
 # --- Fetch currency data for a time series (range of days) ---
 def _fetch_currency_data_for_time_series(year: int, month: int, start_day: int, end_day: int) -> dict:
     """
     Fetches currency data for a specified range of days within a month.
     The API might have limitations (e.g., max 30 consecutive days).
-    This function includes basic validation for the day range.
+    This function includes basic validation for the day range, and the range is
+    fetched with `_fetch_currency_data_for_range` (one timeseries call plus
+    single-day calls only for gaps).
 
     Args:
         year (int): The year for the time series.
@@ -238,20 +695,13 @@ def _fetch_currency_data_for_time_series(year: int, month: int, start_day: int,
               and values are the currency data dictionaries for that day.
               Days for which data could not be fetched will be absent.
     """
-    time_series_data = {} # Initialize an empty dictionary for the time series data
-
     # Basic validation for the day range inputs.
     if not (1 <= start_day <= 31 and 1 <= end_day <= 31 and start_day <= end_day):
-        print(f"Error: Invalid start_day ({start_day}) or end_day ({end_day}) provided for time series.")
+        logger.error("Invalid start_day (%s) or end_day (%s) provided for time series.", start_day, end_day)
         return {} # Return an empty dictionary if the range is invalid.
 
-    # Loop through each day from the start_day to the end_day (inclusive).
-    for day in range(start_day, end_day + 1):
-        data_for_day = _fetch_currency_data(year, month, day)
-        if data_for_day is not None:
-            # If data was successfully fetched, add it to the time_series_data dictionary.
-            time_series_data[day] = data_for_day
-        else:
-            # If fetching failed for a day, print a warning and skip it.
-            print(f"Warning: Could not fetch data for {year}-{month}-{day} in time series. Skipping this day.")
-    return time_series_data
+    year, month = int(year), int(month)
+    # Days past the end of the month (e.g., Feb 30) do not exist, so they are not requested.
+    last_day = min(end_day, calendar.monthrange(year, month)[1])
+    fetched = _fetch_currency_data_for_range(date(year, month, start_day), date(year, month, last_day))
+    return {day_date.day: data for day_date, data in fetched.items()}
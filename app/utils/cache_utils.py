@@ -0,0 +1,327 @@
+import threading # Used to make the cache safe when many requests use it at the same time
+import time      # Used to measure how long a cached rate has been stored
+from array import array # A compact list of numbers, much smaller than a normal Python list of floats
+from bisect import bisect_right # Binary search in a sorted list
+from collections import OrderedDict # A dictionary that remembers the order items were used in
+from datetime import date, timedelta
+
+from .metrics_utils import registry
+from .rate_store_utils import rate_store
+from ..core.config import get_settings
+
+
+class RateCache:
+    """
+    A small in-memory cache for exchange rates, keyed by (rate_date, currency).
+
+    Historical rates never change once they are published, so rates for past dates
+    are kept until they are pushed out by newer entries (LRU eviction). Today's rate
+    can still be updated by the provider, so it expires after `today_ttl_seconds`.
+
+    `max_size` and `today_ttl_seconds` can also be functions that return the value, e.g.
+    one that reads the settings. They are called the first time the cache is used, so
+    creating a cache when a module is imported does not read the settings.
+
+    Attributes:
+        max_size (int): The maximum number of rates kept in memory.
+        today_ttl_seconds (float): How long (in seconds) a rate for today's date stays valid.
+        hits (int): How many lookups were answered from the cache.
+        misses (int): How many lookups had to go to the database.
+        evictions (int): How many rates were removed to make room for new ones.
+    """
+
+    def __init__(self, max_size: int = 4096, today_ttl_seconds: float = 300.0):
+        if not callable(max_size) and max_size < 1:
+            raise ValueError("max_size must be 1 or greater.")
+        self._max_size = max_size
+        self._today_ttl_seconds = today_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Each value is a (rate, expires_at) pair. expires_at is None for rates that never expire.
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self) -> int:
+        if callable(self._max_size):
+            max_size = self._max_size()
+            if max_size < 1:
+                raise ValueError("max_size must be 1 or greater.")
+            self._max_size = max_size
+        return self._max_size
+
+    @property
+    def today_ttl_seconds(self) -> float:
+        if callable(self._today_ttl_seconds):
+            self._today_ttl_seconds = self._today_ttl_seconds()
+        return self._today_ttl_seconds
+
+    @staticmethod
+    def _make_key(rate_date, currency_code: str) -> tuple:
+        # Dates can arrive as strings ('2018-02-01') or date objects, so both are stored as text.
+        return (str(rate_date), currency_code.upper())
+
+    def _expiry_for(self, rate_date) -> float:
+        # Only today's (or a future) rate can still change, so only that one gets a TTL.
+        if str(rate_date) >= date.today().isoformat():
+            return time.monotonic() + self.today_ttl_seconds
+        return None
+
+    def get(self, rate_date, currency_code: str):
+        """
+        Looks up a cached rate.
+
+        Args:
+            rate_date (str | date): The date of the rate (YYYY-MM-DD).
+            currency_code (str): The target currency code (e.g., 'USD').
+
+        Returns:
+            float: The cached rate, or None if it is not cached or has expired.
+        """
+        key = self._make_key(rate_date, currency_code)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            rate, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                # The rate for today is too old, so drop it and treat this as a miss.
+                del self._entries[key]
+                self.misses += 1
+                return None
+            # Mark this rate as the most recently used one.
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rate
+
+    def put(self, rate_date, currency_code: str, rate: float):
+        """
+        Stores a rate in the cache, evicting the least recently used rate if the cache is full.
+
+        Args:
+            rate_date (str | date): The date of the rate (YYYY-MM-DD).
+            currency_code (str): The target currency code (e.g., 'USD').
+            rate (float): The EUR to currency_code exchange rate.
+        """
+        key = self._make_key(rate_date, currency_code)
+        expires_at = self._expiry_for(rate_date)
+        with self._lock:
+            self._entries[key] = (rate, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, rate_date=None, currency_code: str = None):
+        """
+        Removes rates from the cache.
+
+        Called by the ETL load step after new rows are inserted, so the next lookup
+        reads the fresh value from the database.
+
+        Args:
+            rate_date (str | date, optional): Only remove rates for this date.
+            currency_code (str, optional): Only remove rates for this currency.
+                                           If both are None, the whole cache is cleared.
+        """
+        with self._lock:
+            if rate_date is None and currency_code is None:
+                self._entries.clear()
+                return
+            if rate_date is not None and currency_code is not None:
+                self._entries.pop(self._make_key(rate_date, currency_code), None)
+                return
+            wanted_date = str(rate_date) if rate_date is not None else None
+            wanted_currency = currency_code.upper() if currency_code is not None else None
+            for key in list(self._entries):
+                if wanted_date is not None and key[0] != wanted_date:
+                    continue
+                if wanted_currency is not None and key[1] != wanted_currency:
+                    continue
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The current size, max size, hits, misses, evictions and hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class RateDateIndex:
+    """
+    Every loaded date and rate of each currency, sorted by date, for as-of lookups.
+
+    An as-of lookup asks for "the latest rate on or before this date". With the dates of a
+    currency kept in a sorted list, that is one binary search (bisect) in memory, so a
+    weekend or a gap in the data costs no extra database queries.
+
+    A currency's series is loaded on first use (see `put_series`) and trusted for
+    `ttl_seconds`, after which it is loaded again to pick up rates loaded by other processes.
+    Like RateCache's limits, `ttl_seconds` can be a function that is called on first use.
+
+    Attributes:
+        ttl_seconds (float): How long a loaded series stays valid.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self._ttl_seconds = ttl_seconds
+        # {currency code: (sorted 'YYYY-MM-DD' dates, array of rates in the same order, expires_at)}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl_seconds(self) -> float:
+        if callable(self._ttl_seconds):
+            self._ttl_seconds = self._ttl_seconds()
+        return self._ttl_seconds
+
+    def has_series(self, currency_code: str) -> bool:
+        """
+        Returns True if the currency's series is loaded and has not expired.
+        """
+        with self._lock:
+            series = self._series.get(currency_code.upper())
+            return series is not None and time.monotonic() < series[2]
+
+    def put_series(self, currency_code: str, rows):
+        """
+        Stores the full series of one currency.
+
+        Args:
+            currency_code (str): The target currency code (e.g., 'USD').
+            rows (iterable): (rate_date, rate) pairs. They are sorted here, so any order works.
+        """
+        pairs = sorted((str(rate_date), float(rate)) for rate_date, rate in rows)
+        dates = [rate_date for rate_date, _ in pairs]
+        rates = array('d', (rate for _, rate in pairs))
+        with self._lock:
+            self._series[currency_code.upper()] = (dates, rates, time.monotonic() + self.ttl_seconds)
+
+    def lookup(self, currency_code: str, rate_date, max_staleness_days: int = None) -> tuple:
+        """
+        Finds the latest rate on or before a date.
+
+        Args:
+            currency_code (str): The target currency code (e.g., 'USD').
+            rate_date (str | date): The requested date (YYYY-MM-DD).
+            max_staleness_days (int, optional): The most days the rate may be older than the
+                                                requested date. None means any age.
+
+        Returns:
+            tuple: (rate, 'YYYY-MM-DD' date the rate belongs to), or None if there is no rate
+                   on or before the date (or the closest one is too old).
+        """
+        rate_date = str(rate_date)
+        with self._lock:
+            series = self._series.get(currency_code.upper())
+        if series is None:
+            return None
+        dates, rates, _ = series
+        position = bisect_right(dates, rate_date) - 1
+        if position < 0:
+            return None
+        used_date = dates[position]
+        if max_staleness_days is not None:
+            oldest_allowed = (date.fromisoformat(rate_date) - timedelta(days=max_staleness_days)).isoformat()
+            if used_date < oldest_allowed:
+                return None
+        return rates[position], used_date
+
+    def invalidate(self, currency_code: str = None):
+        """
+        Drops the series of one currency, or of every currency if currency_code is None.
+        """
+        with self._lock:
+            if currency_code is None:
+                self._series.clear()
+            else:
+                self._series.pop(currency_code.upper(), None)
+
+
+# The caches below read their sizes from the settings the first time they are used.
+def _today_ttl_seconds() -> float:
+    return get_settings().RATE_CACHE_TODAY_TTL_SECONDS
+
+# The single shared cache used by currency_service and invalidated by the ETL load step.
+rate_cache = RateCache(max_size=lambda: get_settings().RATE_CACHE_MAX_SIZE, today_ttl_seconds=_today_ttl_seconds)
+
+# Cross-rate matrices built by rates_service, one per date, stored under the key (rate_date, CROSS_RATE_KEY).
+CROSS_RATE_KEY = "ALL"
+cross_rate_cache = RateCache(max_size=lambda: get_settings().CROSS_RATE_CACHE_MAX_DATES,
+                             today_ttl_seconds=_today_ttl_seconds)
+
+# Sorted per-currency dates used by currency_service's as-of lookups.
+rate_date_index = RateDateIndex(ttl_seconds=lambda: get_settings().RATE_DATE_INDEX_TTL_SECONDS)
+
+# Final /history responses (closed periods with every day loaded), stored under the first day of the period
+# (YYYY-MM-01 for a month, YYYY-01-01 for a year) and a "<period>:<base>" key such as "M:EUR".
+history_cache = RateCache(max_size=lambda: get_settings().HISTORY_CACHE_MAX_PERIODS,
+                          today_ttl_seconds=_today_ttl_seconds)
+
+_CACHES = {"rate": rate_cache, "cross_rate": cross_rate_cache, "history": history_cache}
+
+def _cache_lookup_gauges() -> dict:
+    # Read by /metrics from the caches' own counters, so lookups pay nothing extra.
+    values = {}
+    for name, cache in _CACHES.items():
+        stats = cache.stats()
+        values[(name, "hit")] = stats["hits"]
+        values[(name, "miss")] = stats["misses"]
+    return values
+
+registry.gauge_function("egp_cache_lookups", "Lookups in the in-memory caches by cache and result.",
+                        _cache_lookup_gauges, ("cache", "result"))
+registry.gauge_function("egp_cache_entries", "Entries held by each in-memory cache.",
+                        lambda: {(name,): cache.stats()["size"] for name, cache in _CACHES.items()}, ("cache",))
+
+
+def _invalidate_rates(rate_dates=None, currency_codes=None):
+    """
+    Removes the given (date, currency) rates from the shared caches.
+
+    Args:
+        rate_dates (list, optional): The dates whose rates changed. None means every date.
+        currency_codes (list, optional): The currencies whose rates changed. None means every currency.
+    """
+    # A date's cross-rate matrix depends on all its rates, so it is dropped whenever any of them changes.
+    if rate_dates is None:
+        cross_rate_cache.invalidate()
+        history_cache.invalidate()
+    else:
+        for rate_date in rate_dates:
+            cross_rate_cache.invalidate(rate_date, CROSS_RATE_KEY)
+            # The month and the year containing the date are now different responses too.
+            day = date.fromisoformat(str(rate_date))
+            history_cache.invalidate(day.replace(day=1))
+            history_cache.invalidate(day.replace(month=1, day=1))
+
+    # The in-memory rate store picks up the new rows in the background.
+    rate_store.request_refresh()
+
+    # New dates change what an as-of lookup finds, so the series are reloaded on next use.
+    if currency_codes is None:
+        rate_date_index.invalidate()
+    else:
+        for currency_code in currency_codes:
+            rate_date_index.invalidate(currency_code)
+
+    if rate_dates is None and currency_codes is None:
+        rate_cache.invalidate()
+        return
+    for rate_date in (rate_dates if rate_dates is not None else [None]):
+        for currency_code in (currency_codes if currency_codes is not None else [None]):
+            rate_cache.invalidate(rate_date, currency_code)
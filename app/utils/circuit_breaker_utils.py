@@ -0,0 +1,93 @@
+import threading # Used so many worker threads can share one breaker safely
+import time      # Used to know when an open breaker may be tried again
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker for one provider access key.
+
+    While the breaker is closed, calls go through. After `failure_threshold` failures in
+    a row it opens, and for `reset_seconds` every call is refused right away instead of
+    waiting for another timeout (callers move on to the next key). After that one trial
+    call is let through (half-open): if it works the breaker closes again, if it fails the
+    breaker stays open for another `reset_seconds`.
+
+    Attributes:
+        failure_threshold (int): Failures in a row that open the breaker.
+        reset_seconds (float): How long the breaker stays open before a trial call.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 60.0):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be 1 or greater.")
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = float(reset_seconds)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        The breaker's state: 'closed', 'open' or 'half_open'.
+        """
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Tells whether a call may be made now. In the half-open state only one trial
+        call is allowed at a time.
+
+        Returns:
+            bool: True if the caller may make the call (and must then report its outcome).
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = HALF_OPEN
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        """
+        Reports a call that worked; the breaker closes.
+        """
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        """
+        Reports a call that failed; the breaker opens after `failure_threshold` in a row,
+        or at once if it was half-open.
+        """
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def trip(self):
+        """
+        Opens the breaker at once, e.g. when the key's quota is used up and every
+        further call would fail the same way.
+        """
+        with self._lock:
+            self._failures = max(self._failures, self.failure_threshold)
+            self._trial_running = False
+            self._state = OPEN
+            self._opened_at = time.monotonic()
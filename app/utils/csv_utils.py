@@ -1,3 +1,10 @@
+import ast # Used to safely read Python-style text (like "{'a': 1}") back into Python objects
+import json # A tool for working with JSON data (a way to store information)
+import logging
+from array import array # A compact list of numbers, much smaller than a normal Python list of floats
+
+logger = logging.getLogger(__name__)
+
 def _read_from_csv(csv_file_name):
     """
     Reads all the text from a CSV file.
@@ -174,3 +181,161 @@ def _load_dataframe_to_csv(csv_file_name, dataframe):
     except Exception as e:
         # Any other unexpected problem.
         raise RuntimeError(f"An unexpected error occurred")
+
+
+# The legacy historical.csv format wraps each API response in a DAY_RATE string, e.g.
+# {'DAY_RATE': "{'success': True, 'date': '2013-05-01', 'base': 'EUR', 'rates': {...}}"}
+_DAY_RATE_PREFIX = "{'DAY_RATE': \""
+_DAY_RATE_SUFFIX = "\"}"
+
+def _parse_python_repr(text: str):
+    """
+    Reads a Python-style text value (what str() wrote) back into a Python object.
+
+    The fast path turns the text into JSON (single quotes to double quotes, True/False/None
+    to true/false/null) and uses the C JSON parser. If that fails (e.g., a value contains a
+    quote), it falls back to `ast.literal_eval`, which is slower but always correct.
+
+    Args:
+        text (str): The text to read, e.g. "['EUR', '2015-01-01', {'USD': 1.2}]".
+
+    Returns:
+        The Python object (dict, list, ...).
+
+    Raises:
+        ValueError: If the text is not a valid Python literal.
+    """
+    try:
+        return json.loads(text.replace("'", '"').replace("True", "true")
+                          .replace("False", "false").replace("None", "null"))
+    except ValueError:
+        try:
+            return ast.literal_eval(text)
+        except (ValueError, SyntaxError) as e:
+            raise ValueError(f"Could not parse line: {e}") from e
+
+def _records_from_legacy_line(line: str):
+    """
+    Turns one line of a legacy rates file into (date, base, target, rate) records.
+
+    Supported line formats:
+        - historical.csv: {'DAY_RATE': "{... 'base': 'EUR', 'date': '2013-05-01', 'rates': {...}}"}
+        - rates.csv:      ['EUR', '2015-01-01', {'EGP': 8.62, 'USD': 1.2}]
+        - a plain API response dictionary with 'date', 'base' and 'rates'.
+    Placeholder lines for days that were never fetched ({'DAY_RATE': 'None'}, []) give no records.
+
+    Args:
+        line (str): One line of the file, without the line break.
+
+    Returns:
+        list: (date 'YYYY-MM-DD', base, target, rate) tuples. Empty if the line has no rates.
+
+    Raises:
+        ValueError: If the line cannot be parsed or has an unknown format.
+    """
+    if line.startswith(_DAY_RATE_PREFIX) and line.endswith(_DAY_RATE_SUFFIX):
+        # Read the inner response directly instead of parsing the wrapper and then the string.
+        value = _parse_python_repr(line[len(_DAY_RATE_PREFIX):-len(_DAY_RATE_SUFFIX)])
+    else:
+        value = _parse_python_repr(line)
+        if isinstance(value, dict) and isinstance(value.get("DAY_RATE"), str):
+            value = _parse_python_repr(value["DAY_RATE"])
+
+    if value is None or value == [] or value == {}:
+        # Days the old export could not fetch were written as 'None' or an empty list.
+        return []
+    if isinstance(value, dict):
+        if value.get("success") is False:
+            return []
+        rate_date, base, rates = value.get("date"), value.get("base"), value.get("rates")
+    elif isinstance(value, (list, tuple)) and len(value) == 3:
+        base, rate_date, rates = value
+    else:
+        raise ValueError(f"Unknown legacy rates line format: {line[:80]}")
+
+    if not rate_date or not base or not isinstance(rates, dict):
+        return []
+    return [(str(rate_date), str(base), str(target), float(rate))
+            for target, rate in rates.items() if rate is not None]
+
+def _iter_legacy_rate_records(csv_file_name):
+    """
+    Reads a legacy rates file line by line and yields one record per rate.
+
+    Only one line is held in memory at a time, so files of any size can be read with
+    constant memory. Lines that cannot be parsed are reported and skipped.
+
+    Args:
+        csv_file_name (str): The path of a legacy historical.csv or rates.csv file.
+
+    Yields:
+        tuple: (date 'YYYY-MM-DD', base, target, rate) records in file order.
+
+    Raises:
+        RuntimeError: If the file is not found or cannot be read.
+    """
+    try:
+        with open(csv_file_name, 'r') as csv_file:
+            for line_number, line in enumerate(csv_file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records = _records_from_legacy_line(line)
+                except (ValueError, TypeError) as e:
+                    logger.warning("Skipping line %s of %s: %s", line_number, csv_file_name, e)
+                    continue
+                yield from records
+    except FileNotFoundError:
+        raise RuntimeError(f"CSV file not found: {csv_file_name}")
+    except IOError as e:
+        raise RuntimeError(f"Error reading CSV file {csv_file_name}: {e}")
+
+def _new_rate_columns() -> dict:
+    # Text columns are plain lists; the rate column is a compact array of doubles.
+    return {"date": [], "base": [], "target": [], "rate": array('d')}
+
+def _iter_legacy_rate_column_chunks(csv_file_name, chunk_size: int = 50000):
+    """
+    Reads a legacy rates file in column chunks, ready for bulk loading.
+
+    Each chunk holds at most `chunk_size` records, so memory stays bounded by the
+    chunk size no matter how large the file is.
+
+    Args:
+        csv_file_name (str): The path of a legacy historical.csv or rates.csv file.
+        chunk_size (int, optional): The most records per chunk. Defaults to 50000.
+
+    Yields:
+        dict: {'date': [...], 'base': [...], 'target': [...], 'rate': array('d')}.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be 1 or greater.")
+    columns = _new_rate_columns()
+    for rate_date, base, target, rate in _iter_legacy_rate_records(csv_file_name):
+        columns["date"].append(rate_date)
+        columns["base"].append(base)
+        columns["target"].append(target)
+        columns["rate"].append(rate)
+        if len(columns["rate"]) >= chunk_size:
+            yield columns
+            columns = _new_rate_columns()
+    if columns["rate"]:
+        yield columns
+
+def _read_legacy_rate_columns(csv_file_name) -> dict:
+    """
+    Reads a whole legacy rates file into columns.
+
+    Args:
+        csv_file_name (str): The path of a legacy historical.csv or rates.csv file.
+
+    Returns:
+        dict: {'date': [...], 'base': [...], 'target': [...], 'rate': array('d')}
+              with one entry per rate in the file.
+    """
+    columns = _new_rate_columns()
+    for chunk in _iter_legacy_rate_column_chunks(csv_file_name):
+        for name, values in chunk.items():
+            columns[name].extend(values)
+    return columns
@@ -1,8 +1,20 @@
-import ibm_db # This is a special tool to talk to IBM Db2 databases
-from ..core.config import (DB2_NAME, DB2_HOSTNAME, DB2_PORT, PATH_TO_SSL, DB2_UID, DB2_PWD, CURRENCY_RATES)
+from .import_utils import _lazy_import
+from ..core.config import get_settings
 import csv # A tool for working with CSV files (like simple spreadsheets)
 import json # A tool for working with JSON data (a way to store information)
-print(DB2_NAME)
+import logging # Used to report what happens (never the password) without slowing requests down
+import threading # Used so many requests can share the connection pool safely
+import time # Used to measure how long connections wait or sit unused
+from collections import deque, namedtuple, OrderedDict # deque: a list that is fast to add to and take from at both ends
+from contextlib import contextmanager
+
+from .log_utils import _log_sampled
+from .metrics_utils import registry, DB2_QUERY_SECONDS, DB2_QUERY_ROWS, DB2_CONNECT_SECONDS, DB2_CONNECT_ERRORS
+
+ibm_db = _lazy_import("ibm_db") # This is a special tool to talk to IBM Db2 databases (imported on first use)
+
+logger = logging.getLogger(__name__)
+
 def _connect_to_database():
     """
     Connects to the Db2 database.
@@ -17,23 +29,520 @@ def _connect_to_database():
     """
     # This part builds a "secret message" (connection string) with all the details
     # needed to connect to the database. These details come from the 'config' file.
+    settings = get_settings()
     conn_str = (
-        f"DATABASE={DB2_NAME};"
-        f"HOSTNAME={DB2_HOSTNAME};"
-        f"PORT={DB2_PORT};"
+        f"DATABASE={settings.DB2_NAME};"
+        f"HOSTNAME={settings.DB2_HOSTNAME};"
+        f"PORT={settings.DB2_PORT};"
         "SECURITY=SSL;" # This means the connection is secure (like using HTTPS for websites)
-        f"SSLServerCertificate={PATH_TO_SSL};" # This is a special file to prove the database is real
-        f"UID={DB2_UID};" # Your username for the database
-        f"PWD={DB2_PWD}" # Your password for the database
+        f"SSLServerCertificate={settings.PATH_TO_SSL};" # This is a special file to prove the database is real
+        f"UID={settings.DB2_UID};" # Your username for the database
+        f"PWD={settings.DB2_PWD}" # Your password for the database
     )
-    # This line is for checking during development, it prints the connection string.
-    print("connection string",conn_str)
     # This line actually tries to connect to the Db2 database using the connection string.
-    conn = ibm_db.connect(conn_str, '', '')
-    # This line is also for checking, it prints the connection object to confirm it worked.
-    print(conn)
+    started = time.perf_counter()
+    try:
+        conn = ibm_db.connect(conn_str, '', '')
+    except Exception:
+        DB2_CONNECT_ERRORS.inc()
+        raise
+    DB2_CONNECT_SECONDS.observe(time.perf_counter() - started)
+    # Only the database and host are logged: the connection string holds the password.
+    logger.debug("Connected to Db2 database %s on %s:%s", settings.DB2_NAME, settings.DB2_HOSTNAME, settings.DB2_PORT)
     return conn # Gives back the connection so other parts of the code can use it
 
+class Db2PoolExhaustedError(Exception):
+    pass # raised when no connection becomes free before the checkout timeout
+
+
+class Db2ConnectionPool:
+    """
+    A thread-safe pool of open Db2 connections.
+
+    Opening a Db2 connection means a TLS handshake plus authentication, so instead of
+    connecting on every query we keep connections open and hand them out again.
+    The pool keeps at least `min_size` connections, never opens more than `max_size`,
+    checks that a connection still works before handing it out, and closes
+    connections that have not been used for `idle_timeout` seconds.
+
+    Attributes:
+        min_size (int): Connections kept open even when idle.
+        max_size (int): The most connections the pool will open at once.
+        checkout_timeout (float): Seconds to wait for a free connection before giving up.
+        idle_timeout (float): Seconds an idle connection is kept before it is closed.
+        ping_after (float): Idle seconds after which a connection is pinged before reuse.
+    """
+
+    def __init__(self, connect_fn, min_size: int = 1, max_size: int = 10, checkout_timeout: float = 30.0,
+                 idle_timeout: float = 300.0, ping_after: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect_fn = connect_fn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        # Idle connections as (conn, last_used) pairs. The newest ones are at the right end.
+        self._idle = deque()
+        self._open_count = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._metrics = {
+            "checkouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "failed_health_checks": 0,
+            "exhausted_waits": 0,
+            "checkout_timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def warm_up(self):
+        """
+        Opens connections until the pool holds `min_size` of them.
+        """
+        while True:
+            with self._condition:
+                if self._open_count >= self.min_size:
+                    return
+                self._open_count += 1
+            try:
+                conn = self._connect_fn()
+            except Exception:
+                with self._condition:
+                    self._open_count -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._metrics["connections_created"] += 1
+                self._idle.append((conn, time.monotonic()))
+                self._condition.notify()
+
+    def _is_healthy(self, conn, idle_seconds: float) -> bool:
+        # A cheap local check first; only connections idle for a while get a real round-trip.
+        try:
+            if not ibm_db.active(conn):
+                return False
+            if idle_seconds >= self.ping_after:
+                stmt = ibm_db.exec_immediate(conn, "SELECT 1 FROM SYSIBM.SYSDUMMY1")
+                ibm_db.free_stmt(stmt)
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        # Its cached prepared statements die with the connection.
+        _forget_statements(conn)
+        try:
+            ibm_db.close(conn)
+        except Exception:
+            pass
+
+    def _reap_idle_locked(self) -> list:
+        # Takes connections that sat unused too long out of the pool (oldest first),
+        # but never goes below min_size. The caller closes them outside the lock.
+        now = time.monotonic()
+        reaped = []
+        while self._idle and self._open_count > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._open_count -= 1
+            reaped.append(conn)
+        return reaped
+
+    def reap_idle(self) -> int:
+        """
+        Closes connections that have been idle longer than `idle_timeout`.
+
+        Returns:
+            int: How many connections were closed.
+        """
+        with self._condition:
+            reaped = self._reap_idle_locked()
+            self._metrics["connections_closed"] += len(reaped)
+        for conn in reaped:
+            self._close_quietly(conn)
+        return len(reaped)
+
+    def acquire(self, timeout: float = None):
+        """
+        Takes a working connection out of the pool, opening a new one if needed.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a free connection.
+                                       Defaults to the pool's `checkout_timeout`.
+
+        Returns:
+            ibm_db.Connection: A healthy connection. Give it back with `release`.
+
+        Raises:
+            Db2PoolExhaustedError: If all `max_size` connections stay busy for the whole timeout.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        while True:
+            conn = None
+            last_used = None
+            must_connect = False
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("The Db2 connection pool has been closed.")
+                while not self._idle and self._open_count >= self.max_size:
+                    if not waited:
+                        waited = True
+                        self._metrics["exhausted_waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["checkout_timeouts"] += 1
+                        raise Db2PoolExhaustedError(
+                            f"No Db2 connection became free within {timeout} seconds (max_size={self.max_size})."
+                        )
+                    self._condition.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    # Reserve a slot now so other threads do not open too many connections.
+                    self._open_count += 1
+                    must_connect = True
+
+            if must_connect:
+                try:
+                    conn = self._connect_fn()
+                except Exception:
+                    with self._condition:
+                        self._open_count -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._metrics["connections_created"] += 1
+            elif not self._is_healthy(conn, time.monotonic() - last_used):
+                # The connection went stale (e.g., the server dropped it), so replace it.
+                self._close_quietly(conn)
+                with self._condition:
+                    self._open_count -= 1
+                    self._metrics["failed_health_checks"] += 1
+                    self._metrics["connections_closed"] += 1
+                    self._condition.notify()
+                continue
+
+            wait_seconds = time.monotonic() - started
+            with self._condition:
+                self._metrics["checkouts"] += 1
+                self._metrics["total_wait_seconds"] += wait_seconds
+                self._metrics["max_wait_seconds"] = max(self._metrics["max_wait_seconds"], wait_seconds)
+            return conn
+
+    def release(self, conn, discard: bool = False):
+        """
+        Gives a connection back to the pool.
+
+        Args:
+            conn (ibm_db.Connection): The connection taken with `acquire`.
+            discard (bool, optional): Close the connection instead of reusing it
+                                      (e.g., after a connection-level error).
+        """
+        with self._condition:
+            if discard or self._closed:
+                self._open_count -= 1
+                self._metrics["connections_closed"] += 1
+                reaped = [conn]
+            else:
+                self._idle.append((conn, time.monotonic()))
+                reaped = self._reap_idle_locked()
+                self._metrics["connections_closed"] += len(reaped)
+            self._condition.notify()
+        for stale_conn in reaped:
+            self._close_quietly(stale_conn)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        Borrows a connection for the length of a `with` block.
+
+        Example:
+            with pool.connection() as conn:
+                rows = _run_sql_query(conn, "SELECT ...")
+        """
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            # Undo any half-finished work; if even that fails, the connection is broken.
+            try:
+                ibm_db.rollback(conn)
+                discard = not ibm_db.active(conn)
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def close_all(self):
+        """
+        Closes every idle connection and stops handing out new ones.
+        Connections that are checked out are closed when they are released.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._open_count -= len(idle)
+            self._metrics["connections_closed"] += len(idle)
+            self._condition.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> dict:
+        """
+        Returns the pool's size and wait-time metrics.
+
+        Returns:
+            dict: Open/idle/in-use counts plus checkout, wait-time and exhaustion counters.
+        """
+        with self._condition:
+            stats = dict(self._metrics)
+            stats["open"] = self._open_count
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._open_count - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        stats["avg_wait_seconds"] = (stats["total_wait_seconds"] / stats["checkouts"]) if stats["checkouts"] else 0.0
+        return stats
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+def _get_connection_pool() -> Db2ConnectionPool:
+    """
+    Returns the shared Db2 connection pool, creating it the first time it is needed.
+
+    Returns:
+        Db2ConnectionPool: The pool every module in the app borrows connections from.
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                settings = get_settings()
+                pool = Db2ConnectionPool(
+                    _connect_to_database,
+                    min_size=settings.DB2_POOL_MIN_SIZE,
+                    max_size=settings.DB2_POOL_MAX_SIZE,
+                    checkout_timeout=settings.DB2_POOL_CHECKOUT_TIMEOUT_SECONDS,
+                    idle_timeout=settings.DB2_POOL_IDLE_TIMEOUT_SECONDS,
+                    ping_after=settings.DB2_POOL_PING_AFTER_SECONDS,
+                )
+                pool.warm_up()
+                _connection_pool = pool
+    return _connection_pool
+
+def _pooled_connection(timeout: float = None):
+    """
+    Borrows a connection from the shared pool for the length of a `with` block.
+
+    Example:
+        with db2_utils._pooled_connection() as conn:
+            rows = db2_utils._run_sql_query(conn, query)
+
+    Args:
+        timeout (float, optional): Seconds to wait for a free connection.
+
+    Returns:
+        A context manager that yields an ibm_db.Connection and gives it back afterwards.
+    """
+    return _get_connection_pool().connection(timeout)
+
+def _pool_gauges() -> dict:
+    # Read by /metrics; before the first database call there is no pool to report on.
+    if _connection_pool is None:
+        raise LookupError("The Db2 connection pool has not been created yet.")
+    stats = _connection_pool.stats()
+    return {(state,): stats[state] for state in ("open", "idle", "in_use", "max_size")}
+
+registry.gauge_function("egp_db2_pool_connections", "Db2 pool connections by state.", _pool_gauges, ("state",))
+
+# Prepared statements, one cache per connection: {id(conn): OrderedDict(sql text -> statement)}.
+# A pooled connection is used by one thread at a time, so only this map itself needs the lock.
+_statement_caches = {}
+_statement_caches_lock = threading.Lock()
+# Record classes made by `_run_query_records`, one per list of column names.
+_record_types = {}
+
+def _forget_statements(conn):
+    """
+    Frees and forgets every cached prepared statement of a connection.
+
+    The pool calls this before it closes a connection.
+
+    Args:
+        conn (ibm_db.Connection): The connection being closed.
+    """
+    with _statement_caches_lock:
+        statements = _statement_caches.pop(id(conn), None)
+    for stmt in (statements or {}).values():
+        try:
+            ibm_db.free_stmt(stmt)
+        except Exception:
+            pass
+
+def _prepare_cached(conn, sql: str):
+    """
+    Returns a prepared statement for the SQL text, preparing it only the first time.
+
+    Db2 compiles an access plan for every new statement text. By always sending the same
+    text with '?' parameter markers and keeping the prepared statement, repeated queries
+    skip that compilation and do not fill Db2's package cache with one-off literals.
+    The least recently used statement is freed once a connection holds DB2_STATEMENT_CACHE_SIZE.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        sql (str): The SQL text, with '?' for every value.
+
+    Returns:
+        ibm_db.IBM_DBStatement: The prepared statement.
+    """
+    with _statement_caches_lock:
+        statements = _statement_caches.setdefault(id(conn), OrderedDict())
+    stmt = statements.get(sql)
+    if stmt is not None:
+        statements.move_to_end(sql)
+        return stmt
+    stmt = ibm_db.prepare(conn, sql)
+    statements[sql] = stmt
+    while len(statements) > get_settings().DB2_STATEMENT_CACHE_SIZE:
+        _, old_stmt = statements.popitem(last=False)
+        ibm_db.free_stmt(old_stmt)
+    return stmt
+
+def _execute_cached(conn, sql: str, params=None):
+    # Runs a cached statement with bound parameters. A statement that fails is dropped
+    # from the cache, so a broken one is never reused.
+    stmt = _prepare_cached(conn, sql)
+    try:
+        if params:
+            ibm_db.execute(stmt, tuple(params))
+        else:
+            ibm_db.execute(stmt)
+    except Exception:
+        with _statement_caches_lock:
+            statements = _statement_caches.get(id(conn), {})
+        if statements.pop(sql, None) is not None:
+            try:
+                ibm_db.free_stmt(stmt)
+            except Exception:
+                pass
+        raise
+    return stmt
+
+def _run_query(conn, sql: str, params=None, query_name: str = "other") -> list:
+    """
+    Runs a parameterized query and returns its rows as plain tuples.
+
+    Example:
+        rows = _run_query(conn, "SELECT EXCHANGE_RATE FROM CURRENCY_RATES WHERE RATE_DATE = ? "
+                                "AND TARGET_CURRENCY_CODE = ?", ('2024-01-02', 'USD'))
+        # [(1.0956,)]
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        sql (str): The SQL text, with '?' for every value. Never put values into the text itself.
+        params (tuple | list, optional): The values for the '?' markers, in order.
+        query_name (str, optional): A short name for the query in the /metrics timings
+                                    (e.g. 'exchange_rate'). Never the SQL text itself.
+
+    Returns:
+        list: One tuple per row, with the columns in the order of the SELECT.
+    """
+    started = time.perf_counter()
+    stmt = _execute_cached(conn, sql, params)
+    rows = []
+    row = ibm_db.fetch_tuple(stmt)
+    while row:
+        rows.append(row)
+        row = ibm_db.fetch_tuple(stmt)
+    # Close the result set but keep the statement prepared for next time.
+    ibm_db.free_result(stmt)
+    DB2_QUERY_SECONDS.observe(time.perf_counter() - started, query_name)
+    DB2_QUERY_ROWS.observe(len(rows), query_name)
+    return rows
+
+def _run_query_records(conn, sql: str, params=None) -> list:
+    """
+    Runs a parameterized query and returns its rows as named records.
+
+    Like `_run_query`, but each row is a namedtuple, so columns can be read by name
+    (row.EXCHANGE_RATE) without building a dictionary for every row.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        sql (str): The SQL text, with '?' for every value.
+        params (tuple | list, optional): The values for the '?' markers, in order.
+
+    Returns:
+        list: One namedtuple per row, with fields named after the (upper-case) columns.
+    """
+    stmt = _execute_cached(conn, sql, params)
+    column_names = tuple(ibm_db.field_name(stmt, i) for i in range(ibm_db.num_fields(stmt)))
+    record_type = _record_types.get(column_names)
+    if record_type is None:
+        record_type = _record_types.setdefault(column_names, namedtuple("Row", column_names, rename=True))
+    rows = []
+    row = ibm_db.fetch_tuple(stmt)
+    while row:
+        rows.append(record_type._make(row))
+        row = ibm_db.fetch_tuple(stmt)
+    ibm_db.free_result(stmt)
+    return rows
+
+def _execute(conn, sql: str, params=None) -> int:
+    """
+    Runs a parameterized INSERT, UPDATE or DELETE with a cached prepared statement.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        sql (str): The SQL text, with '?' for every value.
+        params (tuple | list, optional): The values for the '?' markers, in order.
+
+    Returns:
+        int: How many rows the statement changed.
+    """
+    stmt = _execute_cached(conn, sql, params)
+    return ibm_db.num_rows(stmt)
+
+def _in_list(values) -> tuple:
+    """
+    Builds the '?' markers and parameters for an IN (...) list.
+
+    The list is padded (by repeating its last value) to the next power of two, so the
+    statement text only comes in a few lengths and stays in the statement cache.
+
+    Example:
+        markers, params = _in_list(['USD', 'EGP', 'DZD'])
+        # markers == "?, ?, ?, ?", params == ['USD', 'EGP', 'DZD', 'DZD']
+
+    Args:
+        values (list): The values to match (at least one).
+
+    Returns:
+        tuple: (markers str, params list).
+    """
+    values = list(values)
+    if not values:
+        raise ValueError("An IN list needs at least one value.")
+    size = 1
+    while size < len(values):
+        size *= 2
+    params = values + [values[-1]] * (size - len(values))
+    return ", ".join(["?"] * size), params
+
 def _insert_to_db(conn, table_name, column_names, data):
     """
     Adds new information (a row) into a specific table in the database.
@@ -61,8 +570,8 @@ def _insert_to_db(conn, table_name, column_names, data):
     # Prepares the SQL command to be sent to the database.
     stmt = ibm_db.prepare(conn, sql_insert)
 
-    # This line is for checking during development, it prints the data before inserting.
-    print("Data before inserting: ", data)
+    # Called once per row, so only a sample of the rows is logged (and only at DEBUG level).
+    _log_sampled(logger, logging.DEBUG, "Inserting row into %s: %s", table_name, data)
 
     # This part connects each piece of your 'data' to a question mark in the SQL command.
     for i, value in enumerate(data):
@@ -75,6 +584,120 @@ def _insert_to_db(conn, table_name, column_names, data):
     # Cleans up the statement after use.
     ibm_db.free_stmt(stmt)
 
+def _build_merge_sql(table_name, column_names, key_columns, column_types):
+    """
+    Builds a MERGE statement that inserts a row only if no row with the same key exists.
+
+    Args:
+        table_name (str): The table to load into.
+        column_names (list): All the columns being loaded.
+        key_columns (list): The columns that identify a row (e.g., date, base and target currency).
+        column_types (list): The Db2 type of each column, used to type the parameter markers.
+
+    Returns:
+        str: The MERGE statement with one '?' per column.
+    """
+    source_columns = ", ".join(column_names)
+    typed_markers = ", ".join(f"CAST(? AS {column_type})" for column_type in column_types)
+    match_condition = " AND ".join(f"tgt.{column} = src.{column}" for column in key_columns)
+    insert_values = ", ".join(f"src.{column}" for column in column_names)
+    return (
+        f"MERGE INTO {table_name} AS tgt "
+        f"USING (VALUES ({typed_markers})) AS src ({source_columns}) "
+        f"ON {match_condition} "
+        f"WHEN NOT MATCHED THEN INSERT ({source_columns}) VALUES ({insert_values})"
+    )
+
+def _bulk_insert_to_db(conn, table_name, column_names, rows, chunk_size=None, mode="insert",
+                       key_columns=None, column_types=None) -> dict:
+    """
+    Adds many rows to a table at once.
+
+    Unlike `_insert_to_db`, which prepares, runs and commits one statement per row,
+    this prepares the statement once, sends each chunk of rows in a single
+    `ibm_db.execute_many` call, and commits once per chunk.
+
+    There are two modes:
+        - "insert": a plain INSERT. If a chunk hits duplicate rows (SQL0803N), that chunk
+          is rolled back and retried row by row so the new rows still get in and the
+          duplicates are counted.
+        - "merge": a MERGE that only inserts rows whose key is not in the table yet,
+          so duplicates are skipped by Db2 itself and never raise an error.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        table_name (str): The name of the table to load into (e.g., "CURRENCY_RATES").
+        column_names (list): The columns to fill (e.g., ['rate_date', 'exchange_rate']).
+        rows (list): The rows to add. Each row is a tuple with one value per column.
+        chunk_size (int, optional): How many rows to send and commit at a time.
+                                    Defaults to DB2_BULK_CHUNK_SIZE from the config.
+        mode (str, optional): "insert" or "merge". Defaults to "insert".
+        key_columns (list, optional): The columns that identify a row. Required for "merge".
+        column_types (list, optional): The Db2 type of each column (e.g., 'DATE'). Required for "merge".
+
+    Returns:
+        dict: Counts of rows "inserted", "duplicates" skipped and "failed", plus the number of "chunks".
+
+    Raises:
+        ValueError: If the mode is unknown or "merge" is missing key_columns/column_types.
+    """
+    if mode not in ("insert", "merge"):
+        raise ValueError(f"Unknown bulk load mode '{mode}'. Use 'insert' or 'merge'.")
+    chunk_size = chunk_size or get_settings().DB2_BULK_CHUNK_SIZE
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be 1 or greater.")
+
+    if mode == "merge":
+        if not key_columns or not column_types or len(column_types) != len(column_names):
+            raise ValueError("'merge' mode needs key_columns and one column type per column.")
+        sql = _build_merge_sql(table_name, column_names, key_columns, column_types)
+    else:
+        placeholders = ", ".join(["?"] * len(column_names))
+        sql = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({placeholders})"
+
+    report = {"inserted": 0, "duplicates": 0, "failed": 0, "chunks": 0}
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        return report
+
+    # Turn off autocommit so each chunk is committed once instead of once per row.
+    previous_autocommit = ibm_db.autocommit(conn)
+    ibm_db.autocommit(conn, ibm_db.SQL_AUTOCOMMIT_OFF)
+    stmt = ibm_db.prepare(conn, sql)
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            report["chunks"] += 1
+            try:
+                affected = ibm_db.execute_many(stmt, tuple(chunk))
+                ibm_db.commit(conn)
+                affected = len(chunk) if affected is None else affected
+                report["inserted"] += affected
+                # In merge mode, rows that matched an existing key were not inserted.
+                report["duplicates"] += len(chunk) - affected
+            except Exception as e:
+                ibm_db.rollback(conn)
+                if mode == "merge" or "SQL0803N" not in str(e):
+                    logger.error("Failed to load chunk of %d rows into %s: %s", len(chunk), table_name, e)
+                    report["failed"] += len(chunk)
+                    continue
+                # The chunk had duplicates: retry it row by row with the same prepared statement.
+                for row in chunk:
+                    try:
+                        ibm_db.execute(stmt, row)
+                        report["inserted"] += 1
+                    except Exception as row_error:
+                        if "SQL0803N" in str(row_error):
+                            report["duplicates"] += 1
+                        else:
+                            logger.error("Failed to insert %s into %s: %s", row, table_name, row_error)
+                            report["failed"] += 1
+                ibm_db.commit(conn)
+    finally:
+        ibm_db.free_stmt(stmt)
+        ibm_db.autocommit(conn, previous_autocommit)
+    return report
+
 def _get_all_from_db(conn, table_name):
     """
     Gets all the information (all rows and columns) from a specific table in the database.
@@ -138,8 +761,9 @@ def _run_sql_query(conn, sql_stmt):
 
 
 if __name__ == "__main__":
-    conn = _connect_to_database()
-    query = f"select exchange_rate from {CURRENCY_RATES} where rate_date = '2000-02-01' and TARGET_CURRENCY_CODE = 'USD'"
-    exchange_rate = _run_sql_query(conn, query)
+    query = f"select exchange_rate from {get_settings().CURRENCY_RATES} where rate_date = ? and TARGET_CURRENCY_CODE = ?"
+    with _pooled_connection() as conn:
+        exchange_rate = _run_query(conn, query, ('2000-02-01', 'USD'))
     print(f"exchange rate {exchange_rate}")
-    print(float(exchange_rate[0]["EXCHANGE_RATE"]))
+    print(float(exchange_rate[0][0]))
+    print(_get_connection_pool().stats())
@@ -0,0 +1,48 @@
+import importlib # Used to import a module by its name when it is first needed
+import threading
+
+
+class _LazyModule:
+    # Stands in for a module until one of its attributes is used, then imports it.
+    def __init__(self, name: str, package: str = None):
+        self._name = name
+        self._package = package
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name, self._package)
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded yet"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def _lazy_import(name: str, package: str = None):
+    """
+    Returns a module that is only imported the first time one of its attributes is used.
+
+    Heavy libraries (pandas, ibm_db, requests) take a noticeable time to import. Loading
+    them this way means an API worker, an Airflow DAG parse or a CLI command only pays for
+    the libraries its code path really uses.
+
+    Example:
+        pd = _lazy_import("pandas")
+        # pandas is not imported yet
+        frame = pd.DataFrame(...)   # imported here, on first use
+
+    Args:
+        name (str): The module name, e.g. "pandas" or "..utils.snapshot_utils".
+        package (str, optional): The package a relative name is resolved against (pass __package__).
+
+    Returns:
+        An object that behaves like the module.
+    """
+    return _LazyModule(name, package)
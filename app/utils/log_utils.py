@@ -0,0 +1,175 @@
+import atexit    # Used to flush the log queue when the program exits
+import itertools # Used for lock-free counters in the sampling helper
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+
+from ..core.config import get_settings
+
+# Every module logs with `logging.getLogger(__name__)`, so all of the app's loggers sit under
+# one package logger ('app', or 'EGP_Converter' when the Airflow DAG imports the package).
+_PACKAGE_LOGGER_NAME = __name__.split(".")[0]
+
+# Secrets that can end up in a message: the provider key in a URL and the Db2 password in a
+# connection string. Each pattern keeps its first group (the name) and hides the value.
+_SECRET_PATTERNS = [
+    re.compile(r"(access_key=)[^&\s'\"]+", re.IGNORECASE),
+    re.compile(r"(PWD=)[^;\s'\"]*", re.IGNORECASE),
+    re.compile(r"((?:password|passwd|secret|token)['\"]?\s*[:=]\s*['\"]?)[^'\",;&\s]+", re.IGNORECASE),
+]
+_REDACTED = "***"
+
+# The attributes every LogRecord has; anything else was passed with `extra=` and is
+# written as its own field by the JSON formatter.
+_STANDARD_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_sample_counters = {}
+_configure_lock = threading.Lock()
+_listener = None
+
+
+def _redact(text: str) -> str:
+    """
+    Hides secrets (access keys, passwords) in a piece of text.
+
+    Besides the `name=value` patterns above, the actual values of ACCESS_KEY,
+    BACKUP_ACCESS_KEY, SECONDARY_ACCESS_KEY and DB2_PWD are hidden wherever they appear.
+
+    Args:
+        text (str): The text to clean, e.g. a formatted log message.
+
+    Returns:
+        str: The text with every secret replaced by '***'.
+    """
+    for pattern in _SECRET_PATTERNS:
+        text = pattern.sub(lambda match: match.group(1) + _REDACTED, text)
+    settings = get_settings()
+    for secret in (settings.ACCESS_KEY, settings.BACKUP_ACCESS_KEY, settings.SECONDARY_ACCESS_KEY, settings.DB2_PWD):
+        # Very short values would match ordinary words, so only real-looking secrets are replaced.
+        if secret and len(secret) >= 6 and secret in text:
+            text = text.replace(secret, _REDACTED)
+    return text
+
+
+class RedactingFilter(logging.Filter):
+    """
+    A logging filter that removes secrets from every message before it is written.
+
+    It is attached to the output handler, so with the queue handler it runs in the
+    background listener thread, not in the request that logged the message.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = _redact(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = _redact(record.exc_text)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Writes every record as one JSON object per line, for log collectors.
+
+    The object has 'time', 'level', 'logger' and 'message', plus every field passed with
+    `extra=`, e.g. `logger.info("Loaded rates", extra={"rows": 120})` adds "rows": 120.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _configure_logging(level: str = None, log_format: str = None, use_queue: bool = True):
+    """
+    Sets up the app's logging. Entry points (the API startup, the ETL and migration
+    command lines) call this once; calling it again does nothing.
+
+    Messages go to stderr through a queue: the code that logs only puts the record on an
+    in-memory queue, and a background thread (a QueueListener) formats it, redacts secrets
+    and writes it. A slow terminal or log pipe then never slows down a request.
+
+    Without this call (e.g. inside an Airflow task) nothing is changed and the app's
+    messages go to whatever handlers the host program set up on the root logger.
+
+    Args:
+        level (str, optional): The lowest level written, e.g. 'DEBUG'. Defaults to LOG_LEVEL.
+        log_format (str, optional): 'text' or 'json'. Defaults to LOG_FORMAT.
+        use_queue (bool, optional): Write from a background thread. Defaults to True.
+    """
+    global _listener
+    with _configure_lock:
+        package_logger = logging.getLogger(_PACKAGE_LOGGER_NAME)
+        if getattr(package_logger, "_egp_configured", False):
+            return
+
+        output = logging.StreamHandler(sys.stderr)
+        if (log_format or get_settings().LOG_FORMAT) == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+        output.addFilter(RedactingFilter())
+
+        if use_queue:
+            log_queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+            _listener.start()
+            # Write out whatever is still queued when the program exits.
+            atexit.register(_listener.stop)
+            package_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        else:
+            package_logger.addHandler(output)
+
+        package_logger.setLevel(level or get_settings().LOG_LEVEL)
+        package_logger.propagate = False
+        package_logger._egp_configured = True
+
+
+def _log_sampled(logger: logging.Logger, level: int, msg: str, *args, key: str = None, every: int = None):
+    """
+    Logs only one in every `every` calls for the same key, for events that happen once per
+    row or per rate and would otherwise flood the log.
+
+    Nothing is counted or formatted when the level is disabled, so a sampled DEBUG
+    message costs one `isEnabledFor` check in production.
+
+    Example:
+        _log_sampled(logger, logging.DEBUG, "Inserting row %s", row)
+
+    Args:
+        logger (logging.Logger): The logger to write to.
+        level (int): The level, e.g. logging.DEBUG.
+        msg (str): The message, with %s markers for args (formatted only if it is written).
+        *args: The values for the markers.
+        key (str, optional): What is counted. Defaults to the message itself.
+        every (int, optional): Log 1 in this many calls. Defaults to LOG_SAMPLE_EVERY.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    every = every or get_settings().LOG_SAMPLE_EVERY
+    counter = _sample_counters.get(key or msg)
+    if counter is None:
+        counter = _sample_counters.setdefault(key or msg, itertools.count())
+    # next() on itertools.count is atomic under the GIL, so no lock is needed.
+    seen = next(counter)
+    if seen % every == 0:
+        logger.log(level, msg + " (logged 1 of every %d)", *args, every, stacklevel=2)
@@ -0,0 +1,294 @@
+import threading # Used to give every thread its own counters, so recording needs no lock
+import time      # Used to time the work being measured
+from bisect import bisect_left # Finds the histogram bucket of a value with a binary search
+from contextlib import contextmanager
+
+# Histogram buckets (upper bounds). Latencies are in seconds, from half a millisecond
+# (a cached conversion) to 10 seconds (a slow provider call).
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class _Metric:
+    """
+    The part shared by counters and histograms: named labels and per-thread values.
+
+    Every thread records into its own dictionary (a "shard"), so two requests updating
+    the same metric never wait for each other or for a lock. Only `collect` (reading the
+    metric for /metrics) looks at all the shards, and it only copies them.
+    When a thread has finished, its shard is folded into one "retired" shard, so its
+    counts are kept but short-lived threads (e.g. a fetch pool's workers) do not pile up.
+    """
+
+    kind = None
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._local = threading.local()
+        self._shards = [] # (thread, shard) pairs of the threads that have recorded
+        self._retired = {} # The summed shards of threads that have finished
+        self._shards_lock = threading.Lock() # Only taken the first time a thread records
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._shards_lock:
+                self._retire_finished_locked()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _merge(self, totals: dict, shard: dict):
+        """
+        Adds the values of one shard into `totals`. Each metric type knows how to add its values.
+        """
+        raise NotImplementedError
+
+    def _retire_finished_locked(self):
+        # A finished thread never records again, so its shard can be added to the retired
+        # one and forgotten. The caller holds _shards_lock.
+        live_shards = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live_shards.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live_shards
+
+    def _check_labels(self, label_values: tuple):
+        if len(label_values) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {label_values}")
+
+    def _copied_shards(self) -> list:
+        with self._shards_lock:
+            self._retire_finished_locked()
+            # _merge replaces the retired values instead of changing them, so a copy is enough.
+            shards = [self._retired.copy()]
+            live_shards = [shard for _, shard in self._shards]
+        # dict.copy() runs without releasing the GIL, so it never sees a half-made change.
+        return shards + [shard.copy() for shard in live_shards]
+
+
+class Counter(_Metric):
+    """
+    A number that only goes up, e.g. how many provider calls returned HTTP 429.
+
+    Example:
+        PROVIDER_RESPONSES.inc("latest", "200")
+    """
+
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1):
+        """
+        Adds `amount` (1 by default) to the counter of the given label values.
+        """
+        self._check_labels(label_values)
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def _merge(self, totals: dict, shard: dict):
+        for label_values, value in shard.items():
+            totals[label_values] = totals.get(label_values, 0) + value
+
+    def collect(self) -> dict:
+        """
+        Returns {label values: total} summed over all threads.
+        """
+        totals = {}
+        for shard in self._copied_shards():
+            self._merge(totals, shard)
+        return totals
+
+
+class Histogram(_Metric):
+    """
+    Counts values (e.g. latencies) into buckets, plus their sum and count, so
+    percentiles and averages can be worked out from the /metrics output.
+
+    Example:
+        with CONVERSION_SECONDS.time("cross", "exact"):
+            ...
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values):
+        """
+        Records one value for the given label values.
+        """
+        self._check_labels(label_values)
+        shard = self._shard()
+        entry = shard.get(label_values)
+        if entry is None:
+            # One slot per bucket, one for values above the last bucket, then the sum.
+            entry = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def _merge(self, totals: dict, shard: dict):
+        for label_values, entry in shard.items():
+            total = totals.get(label_values)
+            # A new list every time, so a shard that was already copied never changes.
+            totals[label_values] = list(entry) if total is None else [a + b for a, b in zip(total, entry)]
+
+    @contextmanager
+    def time(self, *label_values):
+        """
+        Times the code in a `with` block (in seconds), also when it raises.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def collect(self) -> dict:
+        """
+        Returns {label values: (bucket counts, sum)} summed over all threads.
+        The bucket counts are per bucket (not cumulative); the last one is above every bucket.
+        """
+        totals = {}
+        for shard in self._copied_shards():
+            self._merge(totals, shard)
+        return {label_values: (entry[:-1], entry[-1]) for label_values, entry in totals.items()}
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    # ('path',), ('cross',) -> {path="cross"}
+    pairs = [f'{name}="{str(value)}"'.replace("\n", " ") for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    All the app's metrics, rendered in the Prometheus text format by `render`.
+
+    Besides counters and histograms, gauges can be registered as functions that are only
+    called when /metrics is read (e.g. the Db2 pool's open connections), so they cost
+    nothing in between.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, label_names: tuple = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def gauge_function(self, name: str, help_text: str, read_fn, label_names: tuple = ()):
+        """
+        Registers a gauge read by calling `read_fn()` at render time.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): What the gauge shows.
+            read_fn (callable): Returns a number, or {label values tuple: number}.
+            label_names (tuple, optional): The label names when read_fn returns a dict.
+        """
+        with self._lock:
+            self._gauges.append((name, help_text, read_fn, tuple(label_names)))
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            metrics, gauges = list(self._metrics), list(self._gauges)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Counter):
+                for label_values, value in sorted(metric.collect().items()):
+                    lines.append(f"{metric.name}{_format_labels(metric.label_names, label_values)} {_format_value(value)}")
+                continue
+            for label_values, (counts, total) in sorted(metric.collect().items()):
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    labels = _format_labels(metric.label_names, label_values, f'le="{le}"')
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(metric.label_names, label_values)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {cumulative}")
+        for name, help_text, read_fn, label_names in gauges:
+            try:
+                value = read_fn()
+            except Exception:
+                continue # A gauge that cannot be read right now is left out
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            values = value if isinstance(value, dict) else {(): value}
+            for label_values, number in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(label_names, label_values)} {_format_value(number)}")
+        return "\n".join(lines) + "\n"
+
+
+# The single registry served by /metrics, and the metrics the app records into it.
+registry = MetricsRegistry()
+
+CONVERSION_SECONDS = registry.histogram(
+    "egp_conversion_duration_seconds", "Time to convert an amount, by conversion path and lookup mode.",
+    ("path", "lookup"))
+DB2_QUERY_SECONDS = registry.histogram(
+    "egp_db2_query_duration_seconds", "Time to run a Db2 query and fetch its rows.", ("query",))
+DB2_QUERY_ROWS = registry.histogram(
+    "egp_db2_query_rows", "Rows returned by a Db2 query.", ("query",), buckets=ROW_COUNT_BUCKETS)
+DB2_CONNECT_SECONDS = registry.histogram(
+    "egp_db2_connect_duration_seconds", "Time to open a new Db2 connection.")
+DB2_CONNECT_ERRORS = registry.counter(
+    "egp_db2_connect_errors_total", "Db2 connections that could not be opened.")
+PROVIDER_REQUEST_SECONDS = registry.histogram(
+    "egp_provider_request_duration_seconds", "Time of one rates provider call, by endpoint.", ("endpoint",))
+PROVIDER_RESPONSES = registry.counter(
+    "egp_provider_responses_total", "Rates provider calls by endpoint and HTTP status (or error type).",
+    ("endpoint", "status"))
+PROVIDER_FAILOVERS = registry.counter(
+    "egp_provider_failovers_total", "Provider calls that failed on one key and moved on, by key and reason.",
+    ("key", "reason"))
+PROVIDER_HEDGES = registry.counter(
+    "egp_provider_hedged_requests_total", "Hedged latest-rates calls, by which call answered first.", ("winner",))
+PROVIDER_MISSING_DAYS = registry.counter(
+    "egp_provider_missing_days_total", "Days the provider could not return after every retry and key.")
+ETL_ROWS = registry.counter(
+    "egp_etl_rows_total", "Rows handled by ETL loads, by pipeline and result.", ("pipeline", "result"))
+ETL_RUN_ROWS_LOADED = registry.histogram(
+    "egp_etl_run_rows_loaded", "Rows inserted by one ETL run.", ("pipeline",), buckets=ROW_COUNT_BUCKETS)
+
+
+def _record_etl_load(pipeline: str, report: dict):
+    """
+    Records the outcome of one ETL load (a `_bulk_insert_to_db` report or totals).
+
+    Args:
+        pipeline (str): Which pipeline loaded the rows, e.g. 'historical' or 'on_demand'.
+        report (dict): The "inserted", "duplicates" and "failed" counts.
+    """
+    for result in ("inserted", "duplicates", "failed"):
+        if report.get(result):
+            ETL_ROWS.inc(pipeline, result, amount=report[result])
+    ETL_RUN_ROWS_LOADED.observe(report.get("inserted", 0), pipeline)
@@ -0,0 +1,289 @@
+import hashlib # Used to fingerprint each migration file so edits to applied migrations are noticed
+import logging
+import os
+import re # Used to read the version number out of each migration file name
+import sys
+from . import db2_utils
+from . import log_utils
+from .db2_utils import ibm_db # The same lazily imported Db2 driver db2_utils uses
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Migrations live in app/db/migrations and are named V<version>__<description>.sql,
+# e.g. V002__unique_rate_key_index.sql. They run once each, in version order, and every
+# applied version is recorded in the SCHEMA_MIGRATIONS table.
+#
+# Run them with:
+#   python -m app.utils.migration_utils migrate
+# and check that the hot queries only read the index with:
+#   python -m app.utils.migration_utils explain
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "migrations")
+MIGRATIONS_TABLE = "SCHEMA_MIGRATIONS"
+_MIGRATION_FILE_PATTERN = re.compile(r"^V(\d+)__(\w+)\.sql$")
+
+# Errors that mean a statement's object is already there (e.g. a table created by hand
+# before migrations existed). The statement is skipped and the migration continues.
+_ALREADY_EXISTS_CODES = ("SQL0601N", "SQL0605W")
+
+# The queries the API and the ETL run most, with the parameter markers they really use.
+# `_check_index_only_access` explains each one and reports whether Db2 answers it from
+# an index alone (IXSCAN without FETCH or a table scan).
+HOT_QUERIES = {
+    "rate_lookup": "SELECT EXCHANGE_RATE FROM {table} WHERE RATE_DATE = ? AND TARGET_CURRENCY_CODE = ?",
+    "range_scan": "SELECT RATE_DATE, TARGET_CURRENCY_CODE, EXCHANGE_RATE FROM {table} WHERE RATE_DATE BETWEEN ? AND ?",
+    "batch_lookup": ("SELECT RATE_DATE, TARGET_CURRENCY_CODE, EXCHANGE_RATE FROM {table} "
+                     "WHERE RATE_DATE IN (?, ?, ?, ?) AND TARGET_CURRENCY_CODE IN (?, ?)"),
+    "watermarks": "SELECT TARGET_CURRENCY_CODE, MAX(RATE_DATE) FROM {table} GROUP BY TARGET_CURRENCY_CODE",
+}
+
+def _list_migrations(migrations_dir: str = MIGRATIONS_DIR) -> list:
+    """
+    Finds the migration files, sorted by version.
+
+    Args:
+        migrations_dir (str, optional): The folder holding the V<version>__<name>.sql files.
+
+    Returns:
+        list: (version int, name str, path str) for every migration file.
+
+    Raises:
+        RuntimeError: If two files share a version number.
+    """
+    migrations = {}
+    for file_name in sorted(os.listdir(migrations_dir)):
+        match = _MIGRATION_FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise RuntimeError(f"Two migrations have version {version}: {migrations[version][1]} and {file_name}")
+        migrations[version] = (version, match.group(2), os.path.join(migrations_dir, file_name))
+    return [migrations[version] for version in sorted(migrations)]
+
+def _split_sql_statements(sql_text: str) -> list:
+    """
+    Splits a migration file into single statements.
+
+    Statements end with ';'. Semicolons inside quoted strings and '--' comments are ignored.
+
+    Args:
+        sql_text (str): The whole migration file.
+
+    Returns:
+        list: The statements, without the trailing ';' and without comments.
+    """
+    statements = []
+    current = []
+    in_quotes = False
+    i = 0
+    while i < len(sql_text):
+        char = sql_text[i]
+        if not in_quotes and sql_text.startswith("--", i):
+            # Skip the comment up to the end of the line.
+            end_of_line = sql_text.find("\n", i)
+            i = len(sql_text) if end_of_line == -1 else end_of_line
+            continue
+        if char == "'":
+            in_quotes = not in_quotes # '' inside a string flips twice, so it stays quoted
+        if char == ";" and not in_quotes:
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def _render_migration(sql_text: str) -> str:
+    # Migrations write ${CURRENCY_RATES} so they follow the table name set in the config.
+    return sql_text.replace("${CURRENCY_RATES}", get_settings().CURRENCY_RATES or "CURRENCY_RATES")
+
+def _ensure_migrations_table(conn):
+    """
+    Creates the SCHEMA_MIGRATIONS table if it does not exist yet.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+    """
+    try:
+        ibm_db.exec_immediate(conn, (
+            f"CREATE TABLE {MIGRATIONS_TABLE} ("
+            "VERSION INTEGER NOT NULL PRIMARY KEY, "
+            "NAME VARCHAR(200) NOT NULL, "
+            "CHECKSUM CHAR(64) NOT NULL, "
+            "APPLIED_AT TIMESTAMP NOT NULL DEFAULT CURRENT TIMESTAMP)"
+        ))
+        ibm_db.commit(conn)
+    except Exception as e:
+        if "SQL0601N" not in str(e):
+            raise RuntimeError(f"Could not create {MIGRATIONS_TABLE}: {e}")
+        ibm_db.rollback(conn)
+
+def _get_applied_migrations(conn) -> dict:
+    """
+    Reads which migrations have already been applied.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+
+    Returns:
+        dict: Maps each applied version to the checksum of the file that was applied.
+    """
+    rows = db2_utils._run_query(conn, f"SELECT VERSION, CHECKSUM FROM {MIGRATIONS_TABLE}")
+    return {int(version): checksum.strip() for version, checksum in rows}
+
+def _apply_migration(conn, version: int, name: str, sql_text: str, checksum: str):
+    """
+    Runs every statement of one migration and records it, then commits once.
+
+    Db2 DDL is transactional, so a migration that fails part-way is rolled back as a whole
+    (procedures such as ADMIN_MOVE_TABLE commit their own work and are the exception).
+
+    Raises:
+        RuntimeError: If a statement fails for any reason other than its object already existing.
+    """
+    for statement in _split_sql_statements(_render_migration(sql_text)):
+        try:
+            stmt = ibm_db.exec_immediate(conn, statement)
+            if stmt:
+                ibm_db.free_stmt(stmt)
+        except Exception as e:
+            if any(code in str(e) for code in _ALREADY_EXISTS_CODES):
+                logger.info("Migration V%03d: skipping, object already exists: %s", version, statement.splitlines()[0])
+                continue
+            ibm_db.rollback(conn)
+            raise RuntimeError(f"Migration V{version:03d}__{name} failed on statement:\n{statement}\n{e}")
+    db2_utils._execute(conn, f"INSERT INTO {MIGRATIONS_TABLE} (VERSION, NAME, CHECKSUM) VALUES (?, ?, ?)",
+                       (version, name, checksum))
+    ibm_db.commit(conn)
+
+def run_migrations(conn, target_version: int = None, migrations_dir: str = MIGRATIONS_DIR) -> list:
+    """
+    Applies every migration that has not been applied yet, in version order.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        target_version (int, optional): Stop after this version. Defaults to the newest one.
+        migrations_dir (str, optional): The folder holding the migration files.
+
+    Returns:
+        list: The versions that were applied by this call (empty if the schema was up to date).
+
+    Raises:
+        RuntimeError: If an applied migration file was changed afterwards, or a migration fails.
+    """
+    _ensure_migrations_table(conn)
+    applied = _get_applied_migrations(conn)
+    previous_autocommit = ibm_db.autocommit(conn)
+    ibm_db.autocommit(conn, ibm_db.SQL_AUTOCOMMIT_OFF)
+    newly_applied = []
+    try:
+        for version, name, path in _list_migrations(migrations_dir):
+            if target_version is not None and version > target_version:
+                break
+            with open(path, "r") as migration_file:
+                sql_text = migration_file.read()
+            checksum = hashlib.sha256(sql_text.encode()).hexdigest()
+            if version in applied:
+                if applied[version] != checksum:
+                    raise RuntimeError(
+                        f"Migration V{version:03d}__{name} was changed after it was applied. "
+                        "Add a new migration instead of editing an applied one."
+                    )
+                continue
+            logger.info("Applying migration V%03d__%s", version, name)
+            _apply_migration(conn, version, name, sql_text, checksum)
+            newly_applied.append(version)
+    finally:
+        ibm_db.autocommit(conn, previous_autocommit)
+    return newly_applied
+
+def _explain_operators(conn, query_number: int, sql: str) -> list:
+    """
+    Explains one statement and returns the operators of its access plan.
+
+    Needs the Db2 explain tables; they are created in the current schema the first time
+    (SYSPROC.SYSINSTALLOBJECTS).
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        query_number (int): A number that identifies this statement in the explain tables.
+        sql (str): The statement, with its '?' parameter markers.
+
+    Returns:
+        list: (operator type, object name or None) pairs, e.g. [('RETURN', None), ('IXSCAN', 'CURRENCY_RATES_KEY_UX')].
+    """
+    ibm_db.free_stmt(ibm_db.exec_immediate(conn, f"EXPLAIN PLAN SET QUERYNO = {int(query_number)} FOR {sql}"))
+    rows = db2_utils._run_query(conn, (
+        "SELECT O.OPERATOR_TYPE, S.OBJECT_NAME "
+        "FROM EXPLAIN_OPERATOR O "
+        "JOIN EXPLAIN_STATEMENT E ON O.EXPLAIN_TIME = E.EXPLAIN_TIME AND O.SOURCE_NAME = E.SOURCE_NAME "
+        "AND O.STMTNO = E.STMTNO AND O.SECTNO = E.SECTNO AND E.EXPLAIN_LEVEL = 'P' "
+        "LEFT JOIN EXPLAIN_STREAM S ON S.EXPLAIN_TIME = O.EXPLAIN_TIME AND S.SOURCE_NAME = O.SOURCE_NAME "
+        "AND S.STMTNO = O.STMTNO AND S.SECTNO = O.SECTNO AND S.TARGET_ID = O.OPERATOR_ID AND S.SOURCE_TYPE = 'D' "
+        "WHERE E.QUERYNO = ? AND E.EXPLAIN_TIME = (SELECT MAX(EXPLAIN_TIME) FROM EXPLAIN_STATEMENT WHERE QUERYNO = ?) "
+        "ORDER BY O.OPERATOR_ID"
+    ), (query_number, query_number))
+    ibm_db.commit(conn)
+    return [(operator.strip(), object_name.strip() if object_name else None) for operator, object_name in rows]
+
+def _check_index_only_access(conn, queries: dict = None) -> dict:
+    """
+    Checks that the hot queries are answered from an index alone.
+
+    Each query is explained; it passes when its plan has an IXSCAN and has neither a FETCH
+    (reading table rows after the index) nor a TBSCAN of the rates table itself. Run this
+    after RUNSTATS on a realistically sized table: on a tiny table Db2 may rightly pick a
+    table scan.
+
+    Args:
+        conn (ibm_db.Connection): The active connection to the database.
+        queries (dict, optional): {name: SQL with {table}}. Defaults to HOT_QUERIES.
+
+    Returns:
+        dict: {name: {"index_only": bool, "operators": [...]}} for every query.
+    """
+    queries = queries or HOT_QUERIES
+    table = (get_settings().CURRENCY_RATES or "CURRENCY_RATES").upper()
+    try:
+        ibm_db.exec_immediate(conn, "CALL SYSPROC.SYSINSTALLOBJECTS('EXPLAIN', 'C', CAST(NULL AS VARCHAR(128)), CURRENT SCHEMA)")
+        ibm_db.commit(conn)
+    except Exception as e:
+        # SQL0601N: the explain tables are already there.
+        if "SQL0601N" not in str(e):
+            raise RuntimeError(f"Could not create the explain tables: {e}")
+
+    report = {}
+    for query_number, (name, sql) in enumerate(queries.items(), start=9001):
+        operators = _explain_operators(conn, query_number, sql.format(table=table))
+        operator_types = [operator for operator, _ in operators]
+        scans_table = any(operator == "TBSCAN" and object_name == table for operator, object_name in operators)
+        report[name] = {
+            "index_only": "IXSCAN" in operator_types and "FETCH" not in operator_types and not scans_table,
+            "operators": operators,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    log_utils._configure_logging()
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    with db2_utils._pooled_connection() as conn:
+        if command == "migrate":
+            versions = run_migrations(conn)
+            print(f"Applied migrations: {versions}" if versions else "The schema is up to date.")
+        elif command == "explain":
+            failed = False
+            for name, result in _check_index_only_access(conn).items():
+                status = "index-only" if result["index_only"] else "NOT index-only"
+                failed = failed or not result["index_only"]
+                print(f"{name}: {status} {[operator for operator, _ in result['operators']]}")
+            sys.exit(1 if failed else 0)
+        else:
+            print("Usage: python -m app.utils.migration_utils [migrate|explain]")
+            sys.exit(2)
@@ -0,0 +1,78 @@
+import threading # Used so many worker threads can share one rate limiter safely
+import time      # Used to measure elapsed time and to wait for new tokens
+
+
+class TokenBucket:
+    """
+    A thread-safe token-bucket rate limiter.
+
+    The bucket holds up to `capacity` tokens and refills at `rate` tokens per second.
+    Every API call takes one token; when the bucket is empty the caller waits only
+    as long as it takes for the next token to arrive, instead of sleeping a fixed
+    amount of time after every call.
+
+    Attributes:
+        rate (float): How many tokens are added per second (the provider's request quota).
+        capacity (float): The most tokens the bucket can hold (the allowed burst size).
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be greater than zero.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        if self.capacity < 1:
+            raise ValueError("capacity must be 1 or greater.")
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        Takes tokens only if they are available right now.
+
+        Args:
+            tokens (float, optional): How many tokens to take. Defaults to 1.
+
+        Returns:
+            bool: True if the tokens were taken, False if the caller would have to wait.
+        """
+        with self._lock:
+            self._refill_locked()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1, timeout: float = None) -> bool:
+        """
+        Takes tokens, waiting until they are available.
+
+        Args:
+            tokens (float, optional): How many tokens to take. Defaults to 1.
+            timeout (float, optional): The most seconds to wait. None means wait as long as needed.
+
+        Returns:
+            bool: True if the tokens were taken, False if the timeout ran out first.
+        """
+        if tokens > self.capacity:
+            raise ValueError("Cannot take more tokens than the bucket can hold.")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill_locked()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_seconds = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_seconds = min(wait_seconds, remaining)
+            time.sleep(wait_seconds)
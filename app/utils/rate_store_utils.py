@@ -0,0 +1,303 @@
+from __future__ import annotations
+import logging
+import threading # Used to refresh the store in the background and to swap in new data safely
+import time      # Used to measure how long a load takes
+from datetime import date, timedelta
+from . import db2_utils
+from .import_utils import _lazy_import
+from ..core.config import get_settings
+
+# A refresh re-reads this many RATE_IDs below the highest one it has seen. Two loads
+# committing at the same time can make a lower RATE_ID visible after a higher one;
+# re-applying a rate that is already loaded changes nothing.
+_REFRESH_ID_OVERLAP = 1000
+
+np = _lazy_import("numpy") # Imported when the store is first loaded
+
+logger = logging.getLogger(__name__)
+
+class _RateSnapshot:
+    """
+    One immutable copy of every loaded rate, as a dense date x currency matrix.
+
+    Row i is the date `origin + i days` (every calendar day, loaded or not), column j is
+    `currencies[j]`, and `matrix[i, j]` is the EUR to currency rate or NaN if that day has
+    none. `last_valid[i, j]` is the row of the latest rate of currency j on or before row i
+    (-1 if there is none), so an as-of lookup is two array reads, not a search.
+
+    A refresh builds a new snapshot and swaps it in, so readers never need a lock.
+    """
+
+    def __init__(self, origin: date, currencies: list, matrix: np.ndarray, max_rate_id: int):
+        self.origin = origin
+        self.currencies = currencies
+        self.column_of = {code: j for j, code in enumerate(currencies)}
+        self.matrix = matrix
+        self.max_rate_id = max_rate_id
+        valid = ~np.isnan(matrix)
+        rows = np.arange(matrix.shape[0], dtype=np.int32)[:, np.newaxis]
+        self.last_valid = np.maximum.accumulate(np.where(valid, rows, np.int32(-1)), axis=0).astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + self.last_valid.nbytes
+
+    def row_of(self, rate_date) -> int:
+        return (date.fromisoformat(str(rate_date)) - self.origin).days
+
+    def date_of(self, row: int) -> str:
+        return (self.origin + timedelta(days=int(row))).isoformat()
+
+    def has_rate(self, rate_date, currency_code: str) -> bool:
+        column = self.column_of.get(currency_code)
+        row = self.row_of(rate_date)
+        return column is not None and 0 <= row < self.matrix.shape[0] and not np.isnan(self.matrix[row, column])
+
+
+def _build_snapshot(rows, previous: _RateSnapshot = None) -> _RateSnapshot:
+    """
+    Builds a snapshot from (RATE_ID, RATE_DATE, TARGET_CURRENCY_CODE, EXCHANGE_RATE) rows,
+    on top of the previous snapshot's rates if there is one.
+    """
+    new_dates = [date.fromisoformat(str(rate_date)) for _, rate_date, _, _ in rows]
+    new_codes = {code.strip() for _, _, code, _ in rows}
+    if previous is not None:
+        first_day = min([previous.origin] + new_dates)
+        last_day = max([previous.origin + timedelta(days=previous.matrix.shape[0] - 1)] + new_dates)
+        currencies = sorted(set(previous.currencies) | new_codes)
+    else:
+        first_day, last_day = min(new_dates), max(new_dates)
+        currencies = sorted(new_codes | {'EUR'})
+
+    matrix = np.full(((last_day - first_day).days + 1, len(currencies)), np.nan)
+    column_of = {code: j for j, code in enumerate(currencies)}
+    if previous is not None:
+        # Copy the old block into its place in the (possibly larger) new matrix.
+        offset = (previous.origin - first_day).days
+        old_columns = [column_of[code] for code in previous.currencies]
+        matrix[offset:offset + previous.matrix.shape[0], old_columns] = previous.matrix
+
+    row_index = np.fromiter(((d - first_day).days for d in new_dates), dtype=np.int64, count=len(new_dates))
+    column_index = np.fromiter((column_of[code.strip()] for _, _, code, _ in rows), dtype=np.int64, count=len(rows))
+    matrix[row_index, column_index] = np.fromiter((float(rate) for _, _, _, rate in rows), dtype=np.float64, count=len(rows))
+    matrix[:, column_of['EUR']] = 1.0
+
+    max_rate_id = max([previous.max_rate_id if previous is not None else 0] + [int(rate_id) for rate_id, _, _, _ in rows])
+    return _RateSnapshot(first_day, currencies, matrix, max_rate_id)
+
+
+class DenseRateStore:
+    """
+    The whole CURRENCY_RATES table held in memory for conversions with no database query.
+
+    The table is small (a few thousand dates times a handful of currencies), so it fits in a
+    dense float64 matrix of well under a megabyte. `load` reads it once at startup and
+    `refresh` then only reads rows with a RATE_ID above the highest one already loaded.
+    A background thread (`start_auto_refresh`) refreshes it every RATE_STORE_REFRESH_SECONDS,
+    and right away when the ETL in this process loads new rows (`request_refresh`).
+    Other caches built from the rates register with `add_refresh_listener` to learn which
+    dates changed, whichever process loaded them.
+
+    Attributes:
+        load_seconds (float): How long the last load or refresh took.
+        refreshes (int): How many refreshes found new rows.
+    """
+
+    def __init__(self, table_name: str = None):
+        # None means the CURRENCY_RATES setting, read the first time the table is queried.
+        self._table_name = table_name
+        self.load_seconds = 0.0
+        self.refreshes = 0
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._refresher = None
+        self._listeners = []
+
+    @property
+    def table_name(self) -> str:
+        return self._table_name or get_settings().CURRENCY_RATES or "CURRENCY_RATES"
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def add_refresh_listener(self, callback):
+        """
+        Registers a function called after every load or refresh that adds rates.
+
+        Args:
+            callback (callable): Called with the sorted 'YYYY-MM-DD' dates that got new rates,
+                                 or with None after a full load (every date may have changed).
+        """
+        self._listeners.append(callback)
+
+    def _notify_listeners(self, rate_dates):
+        for callback in self._listeners:
+            try:
+                callback(rate_dates)
+            except Exception as e:
+                logger.warning("A rate store refresh listener failed: %s", e)
+
+    def _read_rows(self, after_rate_id: int) -> list:
+        query = (f"SELECT RATE_ID, RATE_DATE, TARGET_CURRENCY_CODE, EXCHANGE_RATE FROM {self.table_name} "
+                 "WHERE RATE_ID > ? ORDER BY RATE_ID")
+        with db2_utils._pooled_connection() as conn:
+            return db2_utils._run_query(conn, query, (after_rate_id,), query_name="rate_store")
+
+    def load(self) -> int:
+        """
+        Reads the whole table into memory, replacing anything loaded before.
+
+        Returns:
+            int: How many rates were loaded.
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            rows = self._read_rows(0)
+            self._snapshot = _build_snapshot(rows) if rows else None
+            self.load_seconds = time.perf_counter() - started
+        self._notify_listeners(None)
+        return len(rows)
+
+    def refresh(self) -> int:
+        """
+        Adds the rows inserted since the last load or refresh.
+
+        Returns:
+            int: How many new rates were added.
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            previous = self._snapshot
+            if previous is None:
+                rows = self._read_rows(0)
+                new_rows = len(rows)
+            else:
+                rows = self._read_rows(max(previous.max_rate_id - _REFRESH_ID_OVERLAP, 0))
+                rows = [row for row in rows
+                        if int(row[0]) > previous.max_rate_id or not previous.has_rate(row[1], row[2].strip())]
+                new_rows = len(rows)
+            if new_rows:
+                self._snapshot = _build_snapshot(rows, previous)
+                self.refreshes += 1
+                self.load_seconds = time.perf_counter() - started
+        if new_rows:
+            # Called outside the lock, so a listener may read the new snapshot.
+            self._notify_listeners(None if previous is None else sorted({str(row[1]) for row in rows}))
+        return new_rows
+
+    def request_refresh(self):
+        """
+        Asks the background refresher to refresh now instead of at its next interval.
+        """
+        self._refresh_requested.set()
+
+    def start_auto_refresh(self, interval_seconds: float):
+        """
+        Starts a background thread that refreshes the store every interval_seconds.
+        """
+        if self._refresher is not None:
+            return
+
+        def _refresh_forever():
+            while True:
+                self._refresh_requested.wait(interval_seconds)
+                self._refresh_requested.clear()
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning("Could not refresh the in-memory rate store: %s", e)
+
+        self._refresher = threading.Thread(target=_refresh_forever, name="rate-store-refresh", daemon=True)
+        self._refresher.start()
+
+    def rate(self, currency_code: str, rate_date):
+        """
+        Returns the EUR to currency rate of an exact date.
+
+        Args:
+            currency_code (str): The target currency code (e.g., 'USD').
+            rate_date (str | date): The date of the rate (YYYY-MM-DD).
+
+        Returns:
+            float: The rate, or None if the store has no rate for that date and currency.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        column = snapshot.column_of.get(currency_code)
+        row = snapshot.row_of(rate_date)
+        if column is None or row < 0 or row >= snapshot.matrix.shape[0]:
+            return None
+        value = snapshot.matrix[row, column]
+        return None if value != value else float(value) # NaN is the only value not equal to itself
+
+    def rates_on(self, rate_date) -> dict:
+        """
+        Returns every EUR to X rate of an exact date.
+
+        Args:
+            rate_date (str | date): The date of the rates (YYYY-MM-DD).
+
+        Returns:
+            dict: {currency code: rate} (with 'EUR': 1.0), or None if the store has no rate for that date.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        row = snapshot.row_of(rate_date)
+        if row < 0 or row >= snapshot.matrix.shape[0]:
+            return None
+        rates = {code: float(value) for code, value in zip(snapshot.currencies, snapshot.matrix[row].tolist())
+                 if value == value} # Skips NaN, the only value not equal to itself
+        return rates if len(rates) > 1 else None # EUR alone (always 1.0) means the date has no rates
+
+    def rate_as_of(self, currency_code: str, rate_date, max_staleness_days: int = None) -> tuple:
+        """
+        Returns the latest EUR to currency rate on or before a date.
+
+        Args:
+            currency_code (str): The target currency code (e.g., 'USD').
+            rate_date (str | date): The requested date (YYYY-MM-DD).
+            max_staleness_days (int, optional): The most days the rate may be older than rate_date.
+
+        Returns:
+            tuple: (rate, 'YYYY-MM-DD' date used), or None if there is no recent enough rate.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        column = snapshot.column_of.get(currency_code)
+        row = snapshot.row_of(rate_date)
+        if column is None or row < 0:
+            return None
+        # Dates after the last loaded day resolve against the last loaded day.
+        used_row = int(snapshot.last_valid[min(row, snapshot.matrix.shape[0] - 1), column])
+        if used_row < 0 or (max_staleness_days is not None and row - used_row > max_staleness_days):
+            return None
+        return float(snapshot.matrix[used_row, column]), snapshot.date_of(used_row)
+
+    def stats(self) -> dict:
+        """
+        Returns the store's size, memory use and load time.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False, "load_seconds": self.load_seconds}
+        return {
+            "loaded": True,
+            "first_date": snapshot.origin.isoformat(),
+            "last_date": snapshot.date_of(snapshot.matrix.shape[0] - 1),
+            "days": snapshot.matrix.shape[0],
+            "currencies": len(snapshot.currencies),
+            "rates": int((~np.isnan(snapshot.matrix)).sum()),
+            "bytes": snapshot.nbytes,
+            "max_rate_id": snapshot.max_rate_id,
+            "load_seconds": self.load_seconds,
+            "refreshes": self.refreshes,
+        }
+
+
+# The single store shared by currency_service; loaded by the API at startup.
+rate_store = DenseRateStore()
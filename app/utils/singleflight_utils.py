@@ -0,0 +1,83 @@
+import threading # Used so callers in different threads can wait for the same piece of work
+
+
+class _Call:
+    # One piece of work in progress: the callers that arrive while it runs wait on `done`.
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Makes concurrent calls with the same key share one execution.
+
+    The first caller for a key runs the function. Every caller that asks for the same key
+    while it is still running waits for that run and gets the same result (or the same
+    exception) instead of running the function again. Once the run finishes the key is
+    forgotten, so a later call runs the function afresh.
+
+    Example:
+        flight = SingleFlight()
+        data = flight.do('2024-01-02', lambda: fetch_rates('2024-01-02'))
+
+    Attributes:
+        calls (int): How many times a function was actually run.
+        shared (int): How many callers got a result from another caller's run.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Runs `fn()` for the key, or waits for the run already in progress.
+
+        Args:
+            key: Anything hashable that identifies the work (e.g., a date).
+            fn (callable): The work to do. It takes no arguments.
+
+        Returns:
+            The value returned by `fn`.
+
+        Raises:
+            Exception: Whatever `fn` raised, re-raised in every caller that waited for it.
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._in_flight[key] = call
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """
+        Returns how many runs happened, how many callers shared one, and how many are running now.
+        """
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight)}
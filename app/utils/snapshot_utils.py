@@ -0,0 +1,167 @@
+from __future__ import annotations
+import calendar
+import os
+from datetime import date
+
+from .import_utils import _lazy_import
+
+# Imported the first time a snapshot is read or written.
+pd = _lazy_import("pandas")
+pa = _lazy_import("pyarrow") # Columnar in-memory tables
+ds = _lazy_import("pyarrow.dataset") # Reads and writes folders of Parquet files with filters
+
+# Snapshots are folders of Parquet files split by year and month, e.g.
+#   <root>/year=2013/month=5/part-0.parquet
+# Each file holds typed columns (date, base, target, rate) sorted by date and target.
+SNAPSHOT_KEY_COLUMNS = ["date", "base", "target"]
+
+def _snapshot_schema() -> pa.Schema:
+    # The columns of every snapshot file, plus the year/month partition columns.
+    return pa.schema([
+        ("date", pa.date32()),
+        ("base", pa.dictionary(pa.int32(), pa.string())),
+        ("target", pa.dictionary(pa.int32(), pa.string())),
+        ("rate", pa.float64()),
+        ("year", pa.int16()),
+        ("month", pa.int8()),
+    ])
+
+def _snapshot_partitioning() -> ds.Partitioning:
+    # year=YYYY/month=M folders.
+    return ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+
+def _long_df_to_snapshot_table(long_df: pd.DataFrame) -> pa.Table:
+    """
+    Converts a long-format rates table into an Arrow table with the snapshot schema.
+
+    Args:
+        long_df (pd.DataFrame): A table with 'date', 'base', 'target' and 'rate' columns
+                                (see transform._explode_rates_to_long_df).
+
+    Returns:
+        pa.Table: The same rates with typed columns plus the 'year' and 'month' partition columns.
+    """
+    dates = pd.to_datetime(long_df["date"])
+    frame = pd.DataFrame({
+        "date": dates.dt.date,
+        "base": long_df["base"].astype(str).astype("category"),
+        "target": long_df["target"].astype(str).astype("category"),
+        "rate": long_df["rate"].astype("float64"),
+        "year": dates.dt.year.astype("int16"),
+        "month": dates.dt.month.astype("int8"),
+    })
+    return pa.Table.from_pandas(frame, schema=_snapshot_schema(), preserve_index=False)
+
+def _partition_filter(start_date: date = None, end_date: date = None):
+    # Builds a filter on the year/month partition columns so whole folders outside
+    # the date range are skipped without opening their files.
+    expression = None
+    if start_date is not None:
+        after_start = (ds.field("year") > start_date.year) | (
+            (ds.field("year") == start_date.year) & (ds.field("month") >= start_date.month))
+        expression = after_start
+    if end_date is not None:
+        before_end = (ds.field("year") < end_date.year) | (
+            (ds.field("year") == end_date.year) & (ds.field("month") <= end_date.month))
+        expression = before_end if expression is None else expression & before_end
+    return expression
+
+def _read_rates_snapshot(root_path, start_date=None, end_date=None, currencies=None, columns=None) -> pd.DataFrame:
+    """
+    Reads rates from a snapshot folder, only touching the data that matches the filters.
+
+    The date range first selects which year/month folders are opened at all; the date
+    and currency filters are then pushed down to the Parquet row groups, so reading one
+    month of one currency does not scan the rest of the archive.
+
+    Args:
+        root_path (str): The snapshot folder.
+        start_date (date | str, optional): The first date to read ('YYYY-MM-DD').
+        end_date (date | str, optional): The last date to read (inclusive).
+        currencies (list, optional): Only read these target currencies (e.g., ['USD', 'EGP']).
+        columns (list, optional): Only read these columns. Defaults to date, base, target and rate.
+
+    Returns:
+        pd.DataFrame: The matching rates with 'date' (datetime64), 'base'/'target' (category)
+                      and 'rate' (float64) columns, sorted by date and target.
+                      Empty if the folder does not exist or nothing matches.
+    """
+    columns = columns or ["date", "base", "target", "rate"]
+    if not os.path.isdir(root_path):
+        return pd.DataFrame({name: pd.Series(dtype="object") for name in columns})
+
+    start_date = date.fromisoformat(str(start_date)) if start_date is not None else None
+    end_date = date.fromisoformat(str(end_date)) if end_date is not None else None
+
+    # The schema is given, not inferred, so a folder without any files yet reads as empty.
+    dataset = ds.dataset(root_path, format="parquet", schema=_snapshot_schema(), partitioning=_snapshot_partitioning())
+    expression = _partition_filter(start_date, end_date)
+    row_filters = []
+    if start_date is not None:
+        row_filters.append(ds.field("date") >= pa.scalar(start_date, pa.date32()))
+    if end_date is not None:
+        row_filters.append(ds.field("date") <= pa.scalar(end_date, pa.date32()))
+    if currencies:
+        row_filters.append(ds.field("target").isin([code.upper() for code in currencies]))
+    for row_filter in row_filters:
+        expression = row_filter if expression is None else expression & row_filter
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    frame = table.to_pandas()
+    if "date" in frame.columns:
+        frame["date"] = pd.to_datetime(frame["date"])
+    for name in ("base", "target"):
+        if name in frame.columns:
+            frame[name] = frame[name].astype(str).astype("category")
+    sort_columns = [name for name in ("date", "target") if name in frame.columns]
+    return frame.sort_values(sort_columns, ignore_index=True) if sort_columns else frame
+
+def _write_rates_snapshot(root_path, long_df: pd.DataFrame, compression: str = "zstd") -> int:
+    """
+    Writes rates into a snapshot folder, partitioned by year and month.
+
+    Only the year/month partitions that appear in `long_df` are rewritten. The rates
+    already stored in those partitions are merged with the new ones (a new rate for the
+    same date, base and target replaces the old one), so writing the same month twice
+    never creates duplicates.
+
+    Args:
+        root_path (str): The snapshot folder (created if it does not exist).
+        long_df (pd.DataFrame): A table with 'date', 'base', 'target' and 'rate' columns.
+        compression (str, optional): The Parquet compression codec. Defaults to "zstd".
+
+    Returns:
+        int: How many rates the rewritten partitions hold.
+    """
+    if long_df is None or long_df.empty:
+        return 0
+    os.makedirs(root_path, exist_ok=True)
+
+    new_rates = long_df[["date", "base", "target", "rate"]].copy()
+    new_rates["date"] = pd.to_datetime(new_rates["date"])
+    first_day = new_rates["date"].min().date().replace(day=1)
+    last_date = new_rates["date"].max().date()
+    last_day = last_date.replace(day=calendar.monthrange(last_date.year, last_date.month)[1])
+    existing = _read_rates_snapshot(root_path, first_day, last_day)
+    if not existing.empty:
+        # Keep only the existing rates that live in the partitions being rewritten.
+        touched = set(zip(new_rates["date"].dt.year, new_rates["date"].dt.month))
+        in_touched = [(y, m) in touched for y, m in zip(existing["date"].dt.year, existing["date"].dt.month)]
+        existing = existing[in_touched]
+        merged = pd.concat([existing.astype({"base": str, "target": str}),
+                            new_rates.astype({"base": str, "target": str})], ignore_index=True)
+        new_rates = merged.drop_duplicates(subset=SNAPSHOT_KEY_COLUMNS, keep="last")
+
+    new_rates = new_rates.sort_values(["date", "target"], ignore_index=True)
+    table = _long_df_to_snapshot_table(new_rates)
+    ds.write_dataset(
+        table,
+        root_path,
+        format="parquet",
+        partitioning=_snapshot_partitioning(),
+        basename_template="part-{i}.parquet",
+        # Replace the files of each partition we write; leave every other partition alone.
+        existing_data_behavior="delete_matching",
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+    )
+    return table.num_rows
@@ -0,0 +1,106 @@
+"""
+Measures how long it takes to import the main modules of the app.
+
+Every module is imported in a fresh Python process started with `-X importtime`, which
+prints how long each module took to import. The script reports the total time of the
+module, which heavy libraries (pandas, numpy, ibm_db, requests, pyarrow) the import
+pulled in, and whether it read the settings (.env and environment). Both should only
+happen on the code paths that use them.
+
+Run it from the project root:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 5 --output import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess # Used to import each module in a fresh Python process
+import sys
+
+# The modules a gunicorn worker, an Airflow task or a CLI command starts from.
+MODULES = [
+    "app.core.config",
+    "app.utils.db2_utils",
+    "app.utils.api_data_utils",
+    "app.etl.transform",
+    "app.etl.load",
+    "app.etl.main_etl",
+    "app.services.currency_service",
+    "app.main",
+]
+
+HEAVY_MODULES = ["pandas", "numpy", "ibm_db", "requests", "pyarrow", "dotenv"]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _measure_import(module_name: str) -> dict:
+    """
+    Imports one module in a new process and reads the `-X importtime` report.
+
+    Args:
+        module_name (str): The module to import (e.g., 'app.etl.main_etl').
+
+    Returns:
+        dict: The total import time in milliseconds, the heavy modules that were loaded and
+              whether the settings were read, or an "error" entry if the import failed.
+    """
+    # The child prints which heavy modules ended up in sys.modules and whether the settings
+    # were built, on stdout, as JSON.
+    code = (f"import sys, json; import {module_name}; "
+            f"config = sys.modules.get('app.core.config'); "
+            f"print(json.dumps([[m for m in {HEAVY_MODULES!r} if m in sys.modules], "
+            f"config is not None and config._settings is not None]))")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                               cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        last_line = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else ""
+        return {"error": last_line}
+
+    # Each report line looks like: "import time:       123 |       4567 | app.etl.main_etl"
+    # (self time and cumulative time in microseconds). Top-level imports are not indented.
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        if not parts[2].startswith("  "):   # A top-level import, not one nested inside another
+            total_us += int(parts[1].strip())
+    heavy_modules, settings_loaded = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {"total_ms": total_us / 1000, "heavy_modules": heavy_modules, "settings_loaded": settings_loaded}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the app modules.")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to import each module.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of printing them.")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="The modules to measure.")
+    args = parser.parse_args()
+
+    results = {}
+    for module_name in args.modules:
+        runs = [_measure_import(module_name) for _ in range(args.repeat)]
+        failed = [run for run in runs if "error" in run]
+        if failed:
+            results[module_name] = {"error": failed[0]["error"]}
+            continue
+        results[module_name] = {
+            "median_ms": round(statistics.median(run["total_ms"] for run in runs), 2),
+            "min_ms": round(min(run["total_ms"] for run in runs), 2),
+            "heavy_modules": runs[-1]["heavy_modules"],
+            "settings_loaded": runs[-1]["settings_loaded"],
+        }
+
+    report = json.dumps({"python": sys.version.split()[0], "repeat": args.repeat, "modules": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Offline benchmarks for conversions, the ETL transform and the Db2 load.
+
+Db2 is replaced by a local SQLite file behind the db2_utils interface and the rates
+provider by a local fixture server (see benchmarks/stand_ins.py), so the numbers only
+depend on this code and this machine. Results are written as JSON together with the git
+commit they were measured on, and `--compare` shows the change against an earlier run.
+
+Run it from the project root:
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --compare results.json
+
+Measured:
+    - conversion_single: latency percentiles of `convert_currency`, reading from the
+      database, from the rate cache and from the in-memory rate store.
+    - conversion_batch: latency percentiles of `convert_batch`.
+    - transform: `_process_historical_data` throughput on a synthetic multi-year payload.
+    - load: `_bulk_insert_to_db` rows per second in "insert" and "merge" mode.
+    - pipeline: `run_historical_pipeline` for whole months, fetched from the fixture server.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+from .stand_ins import FixtureRatesServer, install_sqlite_db2, synthetic_history
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git_commit() -> dict:
+    # The commit the results belong to, and whether the tree had uncommitted changes.
+    def _git(*args):
+        completed = subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True)
+        return completed.stdout.strip() if completed.returncode == 0 else None
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": _git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+def _percentiles(samples: list) -> dict:
+    """
+    Summarizes latencies (in seconds) as milliseconds.
+
+    Returns:
+        dict: count, mean, p50, p90, p99 and max, in milliseconds.
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def _nearest_rank(percent):
+        return ordered[min(count - 1, max(0, int(round(percent / 100 * count)) - 1))] * 1000
+
+    return {
+        "count": count,
+        "mean_ms": round(sum(ordered) / count * 1000, 4),
+        "p50_ms": round(_nearest_rank(50), 4),
+        "p90_ms": round(_nearest_rank(90), 4),
+        "p99_ms": round(_nearest_rank(99), 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+
+@contextlib.contextmanager
+def _quiet():
+    # The app prints progress messages; keep them out of the benchmark output.
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _time_calls(fn, arguments: list, before_each=None) -> list:
+    # Calls fn(*args) for every entry and returns the time each call took.
+    samples = []
+    with _quiet():
+        for args in arguments:
+            if before_each is not None:
+                before_each()
+            started = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _configure_environment(args, database_path: str, base_url: str):
+    # Settings are read from the environment on first use, so this must run before any app import.
+    os.environ.update({
+        "EGP_CONVERTER_ENV_FILE": os.devnull, # Never pick up a real .env with real credentials
+        "CURRENCY_RATES": "CURRENCY_RATES",
+        "BASE_URL": base_url,
+        "ACCESS_KEY": "benchmark",
+        "API_SYMBOLS": ",".join(args.currencies),
+        "API_RATE_LIMIT_PER_SECOND": "100000",
+        "API_RATE_LIMIT_BURST": "100000",
+        "ON_DEMAND_ETL_ENABLED": "false",
+        "DB2_NAME": database_path,
+    })
+
+
+def bench_transform(args) -> tuple:
+    """
+    Measures `_process_historical_data` on `args.years` years of daily payloads.
+
+    Returns:
+        tuple: (results dict, the load rows made from the transformed table).
+    """
+    from app.etl import main_etl
+    from app.etl.transform import _long_df_to_load_rows
+
+    payloads = synthetic_history(date(args.end_year - args.years + 1, 1, 1), date(args.end_year, 12, 31),
+                                 args.currencies)
+    samples = []
+    rates_df = None
+    with _quiet():
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            rates_df = main_etl._process_historical_data(payloads)
+            samples.append(time.perf_counter() - started)
+    best = min(samples)
+    return {
+        "payloads": len(payloads),
+        "rows": len(rates_df),
+        "best_seconds": round(best, 6),
+        "payloads_per_second": round(len(payloads) / best, 1),
+        "rows_per_second": round(len(rates_df) / best, 1),
+    }, _long_df_to_load_rows(rates_df)
+
+
+def bench_load(args, rows: list) -> dict:
+    """
+    Measures `_bulk_insert_to_db` into an empty table, then a merge of the same rows
+    again (every row a duplicate, as in a re-run of the ETL).
+    """
+    from app.etl import main_etl
+    from app.utils import db2_utils
+
+    results = {}
+    for label, mode in (("insert", "insert"), ("merge_new", "merge"), ("merge_duplicates", "merge")):
+        with db2_utils._pooled_connection() as conn:
+            if label != "merge_duplicates":
+                db2_utils._execute(conn, "DELETE FROM CURRENCY_RATES")
+            with _quiet():
+                started = time.perf_counter()
+                report = db2_utils._bulk_insert_to_db(
+                    conn, "CURRENCY_RATES", main_etl.RATE_COLUMN_NAMES, rows, chunk_size=args.chunk_size,
+                    mode=mode, key_columns=main_etl.RATE_KEY_COLUMNS, column_types=main_etl.RATE_COLUMN_TYPES)
+                seconds = time.perf_counter() - started
+        results[label] = {"rows": len(rows), "seconds": round(seconds, 6),
+                          "rows_per_second": round(len(rows) / seconds, 1),
+                          "inserted": report["inserted"], "duplicates": report["duplicates"]}
+    return results
+
+
+def _random_conversions(args, rng: random.Random, count: int) -> list:
+    # (amount, from, to, date) picks inside the loaded years, the same for every run with the same seed.
+    first_day = date(args.end_year - args.years + 1, 1, 1).toordinal()
+    last_day = date(args.end_year, 12, 31).toordinal()
+    picks = []
+    for _ in range(count):
+        from_code, to_code = rng.sample(args.currencies, 2)
+        picks.append((round(rng.uniform(1, 1000), 2), from_code, to_code,
+                      date.fromordinal(rng.randint(first_day, last_day)).isoformat()))
+    return picks
+
+
+def bench_conversions(args) -> tuple:
+    """
+    Measures single and batch conversions against the loaded table.
+
+    Returns:
+        tuple: (conversion_single results, conversion_batch results).
+    """
+    from app.services import currency_service
+    from app.utils.cache_utils import rate_cache
+    from app.utils.rate_store_utils import rate_store
+
+    rng = random.Random(args.seed)
+    single_calls = _random_conversions(args, rng, args.iterations)
+
+    single = {
+        # Every call misses the cache and reads its rates with prepared Db2 queries.
+        "database": _percentiles(_time_calls(currency_service.convert_currency, single_calls,
+                                             before_each=rate_cache.invalidate)),
+    }
+    # The same calls again, now answered from the (warm) rate cache.
+    _time_calls(currency_service.convert_currency, single_calls)
+    single["rate_cache"] = _percentiles(_time_calls(currency_service.convert_currency, single_calls))
+
+    rate_store.load()
+    single["rate_store"] = _percentiles(_time_calls(currency_service.convert_currency, single_calls))
+
+    batches = [[_random_conversions(args, rng, args.batch_size)] for _ in range(args.batch_iterations)]
+    batch = {"batch_size": args.batch_size,
+             "rate_store": _percentiles(_time_calls(currency_service.convert_batch, batches))}
+    rate_store._snapshot = None # Back to database reads for the next measurement
+    batch["database"] = _percentiles(_time_calls(currency_service.convert_batch, batches,
+                                                 before_each=rate_cache.invalidate))
+    return single, batch
+
+
+def bench_pipeline(args, server: FixtureRatesServer) -> dict:
+    """
+    Measures `run_historical_pipeline` for the months of the last loaded year, fetched from
+    the fixture server into an empty table, then an incremental re-run with nothing to do.
+    """
+    from app.etl import main_etl
+    from app.utils import db2_utils
+
+    with db2_utils._pooled_connection() as conn:
+        db2_utils._execute(conn, "DELETE FROM CURRENCY_RATES")
+    months = list(range(1, args.pipeline_months + 1))
+    requests_before = server.requests_served
+    full = _time_calls(lambda month: main_etl.run_historical_pipeline(args.end_year, month, incremental=False),
+                       [(month,) for month in months])
+    requests_made = server.requests_served - requests_before
+    rerun = _time_calls(lambda month: main_etl.run_historical_pipeline(args.end_year, month),
+                        [(month,) for month in months])
+    with db2_utils._pooled_connection() as conn:
+        loaded_rows = db2_utils._run_query(conn, "SELECT COUNT(*) FROM CURRENCY_RATES")[0][0]
+    return {
+        "months": len(months),
+        "provider_requests": requests_made,
+        "provider_latency_ms": args.provider_latency_ms,
+        "rows_loaded": loaded_rows,
+        "per_month": _percentiles(full),
+        "incremental_rerun_per_month": _percentiles(rerun),
+    }
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    # {"load": {"insert": {"rows_per_second": 1}}} -> {"load.insert.rows_per_second": 1}
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(previous: dict, current: dict) -> list:
+    """
+    Lists every metric of two runs with its relative change.
+
+    Returns:
+        list: (metric, previous value, current value, change in percent) tuples.
+    """
+    before, after = _flatten(previous["results"]), _flatten(current["results"])
+    rows = []
+    for metric in sorted(before.keys() & after.keys()):
+        change = ((after[metric] - before[metric]) / before[metric] * 100) if before[metric] else None
+        rows.append((metric, before[metric], after[metric], change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+    parser.add_argument("--years", type=int, default=3, help="Years of daily rates to generate and load.")
+    parser.add_argument("--end-year", type=int, default=2023, help="The last generated year.")
+    parser.add_argument("--currencies", type=lambda text: text.split(","), default=["EGP", "USD", "EUR", "DZD"],
+                        help="Comma-separated currency codes to generate.")
+    parser.add_argument("--iterations", type=int, default=2000, help="Single conversions per measurement.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Items per batch conversion.")
+    parser.add_argument("--batch-iterations", type=int, default=100, help="Batch conversions per measurement.")
+    parser.add_argument("--repeat", type=int, default=5, help="Transform runs (the best one is reported).")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per commit in the load benchmark.")
+    parser.add_argument("--pipeline-months", type=int, default=3, help="Months fetched by the pipeline benchmark.")
+    parser.add_argument("--provider-latency-ms", type=float, default=0.0, help="Delay of every fixture response.")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the random conversions.")
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    parser.add_argument("--compare", help="A results file from an earlier run to compare against.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            FixtureRatesServer(latency_ms=args.provider_latency_ms) as server:
+        database_path = os.path.join(work_dir, "benchmark.sqlite")
+        _configure_environment(args, database_path, server.base_url)
+        install_sqlite_db2(database_path)
+
+        results = {}
+        with _quiet():
+            results["transform"], rows = bench_transform(args)
+            results["load"] = bench_load(args, rows)
+            results["conversion_single"], results["conversion_batch"] = bench_conversions(args)
+            if args.pipeline_months:
+                results["pipeline"] = bench_pipeline(args, server)
+
+    report = {
+        "git": _git_commit(),
+        "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"\nCompared with {previous['git']['commit']} ({previous['measured_at']}):", file=sys.stderr)
+        for metric, before, after, change in compare(previous, report):
+            change_text = f"{change:+.1f}%" if change is not None else "n/a"
+            print(f"  {metric:<60} {before:>14} -> {after:<14} {change_text}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Local stand-ins for the two outside services the app talks to, so benchmarks run offline.
+
+- `SqliteDb2`: an SQLite database behind the small part of the `ibm_db` API that
+  `app.utils.db2_utils` uses (connect, prepare, execute, execute_many, fetch_tuple, ...).
+  `install_sqlite_db2` swaps it in, so every db2_utils function (the pool, the cached
+  statements, `_run_query`, `_bulk_insert_to_db`) runs unchanged against a local file.
+- `FixtureRatesServer`: a local HTTP server that answers like the rates provider
+  (/latest, /YYYY-MM-DD and /timeseries) with made-up but repeatable rates.
+
+Nothing here is used by the app itself.
+"""
+import json
+import math
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# The same tables as app/db/migrations, in SQLite types.
+_CURRENCY_RATES_DDL = [
+    "CREATE TABLE IF NOT EXISTS CURRENCY_RATES ("
+    " RATE_ID INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " RATE_DATE TEXT NOT NULL,"
+    " BASE_CURRENCY_CODE TEXT NOT NULL,"
+    " TARGET_CURRENCY_CODE TEXT NOT NULL,"
+    " EXCHANGE_RATE REAL NOT NULL)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS CURRENCY_RATES_KEY_UX"
+    " ON CURRENCY_RATES (RATE_DATE, BASE_CURRENCY_CODE, TARGET_CURRENCY_CODE)",
+    "CREATE INDEX IF NOT EXISTS CURRENCY_RATES_TARGET_DATE_IX"
+    " ON CURRENCY_RATES (TARGET_CURRENCY_CODE, RATE_DATE)",
+    "CREATE TABLE IF NOT EXISTS RATE_GAPS ("
+    " RATE_DATE TEXT NOT NULL,"
+    " TARGET_CURRENCY_CODE TEXT NOT NULL,"
+    " RECORDED_AT TEXT NOT NULL,"
+    " PRIMARY KEY (RATE_DATE, TARGET_CURRENCY_CODE))",
+]
+
+# The MERGE built by db2_utils._build_merge_sql. SQLite has no MERGE, but with the unique
+# key index an INSERT OR IGNORE does the same thing: insert the row unless its key exists.
+_MERGE_PATTERN = re.compile(
+    r"MERGE INTO (?P<table>\S+) AS tgt USING \(VALUES \((?P<markers>.*)\)\) AS src \((?P<columns>[^)]*)\) ON .*"
+    r"WHEN NOT MATCHED THEN INSERT", re.IGNORECASE | re.DOTALL)
+_FETCH_FIRST_PATTERN = re.compile(r"FETCH FIRST (\d+) ROWS? ONLY", re.IGNORECASE)
+
+
+def _translate_sql(sql: str) -> str:
+    # Rewrites the few Db2-only statements the app sends into SQLite.
+    merge = _MERGE_PATTERN.match(sql.strip())
+    if merge:
+        columns = merge.group("columns")
+        markers = ", ".join("?" for _ in columns.split(","))
+        return f"INSERT OR IGNORE INTO {merge.group('table')} ({columns}) VALUES ({markers})"
+    sql = sql.replace("FROM SYSIBM.SYSDUMMY1", "")
+    return _FETCH_FIRST_PATTERN.sub(r"LIMIT \1", sql)
+
+
+def _to_db2_error(error: Exception) -> Exception:
+    # db2_utils recognises a duplicate key by the SQL0803N code in the message.
+    if isinstance(error, sqlite3.IntegrityError) and "UNIQUE" in str(error):
+        return Exception(f"[IBM][CLI Driver][DB2/SQLITE] SQL0803N  Duplicate key. {error}")
+    return Exception(f"[IBM][CLI Driver][DB2/SQLITE] {error}")
+
+
+class _Connection:
+    def __init__(self, path: str):
+        self.sqlite = sqlite3.connect(path, check_same_thread=False, isolation_level="DEFERRED", timeout=30)
+        self.autocommit = True
+        self.open = True
+
+
+class _Statement:
+    def __init__(self, conn: _Connection, sql: str):
+        self.conn = conn
+        self.sql = _translate_sql(sql)
+        self.cursor = None
+        self.bound = {}
+        self.row_count = 0
+
+
+class SqliteDb2:
+    """
+    The part of the `ibm_db` module used by `app.utils.db2_utils`, backed by one SQLite file.
+
+    Every `connect` opens a new SQLite connection to the same file, so the connection pool
+    behaves as it does with Db2. Only the SQL the app really sends is supported.
+
+    Args:
+        path (str): The SQLite database file. It is created with the CURRENCY_RATES table.
+    """
+
+    SQL_AUTOCOMMIT_OFF = 0
+    SQL_AUTOCOMMIT_ON = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        with sqlite3.connect(path) as setup:
+            for statement in _CURRENCY_RATES_DDL:
+                setup.execute(statement)
+
+    # Connections
+    def connect(self, conn_str, user, password):
+        return _Connection(self.path)
+
+    def active(self, conn) -> bool:
+        return conn.open
+
+    def close(self, conn) -> bool:
+        conn.sqlite.close()
+        conn.open = False
+        return True
+
+    def autocommit(self, conn, value=None):
+        if value is None:
+            return self.SQL_AUTOCOMMIT_ON if conn.autocommit else self.SQL_AUTOCOMMIT_OFF
+        conn.autocommit = value == self.SQL_AUTOCOMMIT_ON
+        return True
+
+    def commit(self, conn) -> bool:
+        conn.sqlite.commit()
+        return True
+
+    def rollback(self, conn) -> bool:
+        conn.sqlite.rollback()
+        return True
+
+    # Statements
+    def prepare(self, conn, sql):
+        return _Statement(conn, sql)
+
+    def exec_immediate(self, conn, sql):
+        stmt = self.prepare(conn, sql)
+        self.execute(stmt)
+        return stmt
+
+    def bind_param(self, stmt, position, value, *args):
+        stmt.bound[position] = value
+        return True
+
+    def execute(self, stmt, params=None) -> bool:
+        if params is None and stmt.bound:
+            params = tuple(stmt.bound[position] for position in sorted(stmt.bound))
+        try:
+            stmt.cursor = stmt.conn.sqlite.execute(stmt.sql, tuple(params or ()))
+        except sqlite3.Error as e:
+            raise _to_db2_error(e) from e
+        stmt.row_count = stmt.cursor.rowcount
+        if stmt.conn.autocommit:
+            stmt.conn.sqlite.commit()
+        return True
+
+    def execute_many(self, stmt, rows) -> int:
+        try:
+            stmt.cursor = stmt.conn.sqlite.executemany(stmt.sql, rows)
+        except sqlite3.Error as e:
+            raise _to_db2_error(e) from e
+        stmt.row_count = stmt.cursor.rowcount
+        if stmt.conn.autocommit:
+            stmt.conn.sqlite.commit()
+        return stmt.row_count
+
+    def num_rows(self, stmt) -> int:
+        return stmt.row_count
+
+    def num_fields(self, stmt) -> int:
+        return len(stmt.cursor.description or ())
+
+    def field_name(self, stmt, index):
+        return stmt.cursor.description[index][0].upper()
+
+    def fetch_tuple(self, stmt):
+        row = stmt.cursor.fetchone() if stmt.cursor is not None else None
+        return row if row is not None else False
+
+    def fetch_assoc(self, stmt):
+        row = self.fetch_tuple(stmt)
+        if row is False:
+            return False
+        return {description[0].upper(): value for description, value in zip(stmt.cursor.description, row)}
+
+    def free_result(self, stmt) -> bool:
+        if stmt.cursor is not None:
+            stmt.cursor.close()
+            stmt.cursor = None
+        return True
+
+    def free_stmt(self, stmt) -> bool:
+        stmt.bound.clear()
+        return self.free_result(stmt)
+
+
+def install_sqlite_db2(path: str) -> SqliteDb2:
+    """
+    Makes `app.utils.db2_utils` use an SQLite file instead of Db2.
+
+    Must be called before the first database call. Any open connection pool is dropped,
+    so the next `_pooled_connection` opens SQLite connections.
+
+    Args:
+        path (str): The SQLite database file.
+
+    Returns:
+        SqliteDb2: The stand-in module.
+    """
+    from app.utils import db2_utils
+
+    stand_in = SqliteDb2(path)
+    sys.modules["ibm_db"] = stand_in
+    db2_utils.ibm_db = stand_in
+    with db2_utils._connection_pool_lock:
+        db2_utils._connection_pool = None
+    with db2_utils._statement_caches_lock:
+        db2_utils._statement_caches.clear()
+    return stand_in
+
+
+def synthetic_rate(day: date, currency_code: str) -> float:
+    """
+    A made-up but repeatable EUR to currency rate for a day.
+
+    Every currency gets its own level and a slow yearly wave, so different days and
+    currencies give different (always positive) numbers.
+    """
+    if currency_code == "EUR":
+        return 1.0
+    level = 1.0 + sum(ord(letter) for letter in currency_code) % 40
+    return round(level * (1.0 + 0.1 * math.sin(day.toordinal() / 58.0)), 6)
+
+
+def synthetic_payload(day: date, currencies: list) -> dict:
+    """
+    One day of rates in the provider's single-date response format.
+    """
+    return {
+        "success": True,
+        "timestamp": int(time.mktime(day.timetuple())) + 86399,
+        "historical": True,
+        "base": "EUR",
+        "date": day.isoformat(),
+        "rates": {code: synthetic_rate(day, code) for code in currencies},
+    }
+
+
+def synthetic_history(start_date: date, end_date: date, currencies: list) -> dict:
+    """
+    Provider payloads for every day from start_date to end_date, keyed by date, as the
+    extract step returns them.
+    """
+    payloads = {}
+    day = start_date
+    while day <= end_date:
+        payloads[day] = synthetic_payload(day, currencies)
+        day += timedelta(days=1)
+    return payloads
+
+
+class FixtureRatesServer:
+    """
+    A local HTTP server that answers like the rates provider.
+
+    It serves /latest, /YYYY-MM-DD and /timeseries?start_date=&end_date= with rates from
+    `synthetic_rate` for the requested `symbols`. Use it as a context manager:
+
+        with FixtureRatesServer(latency_ms=20) as server:
+            os.environ["BASE_URL"] = server.base_url
+
+    Args:
+        latency_ms (float, optional): A delay added to every response, to mimic the network.
+
+    Attributes:
+        requests_served (int): How many requests were answered.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_seconds = latency_ms / 1000
+        self.requests_served = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _respond(self, path: str, query: dict) -> dict:
+        currencies = [code for code in query.get("symbols", ["EGP,USD,EUR,DZD"])[0].split(",") if code]
+        endpoint = path.strip("/")
+        if endpoint == "latest":
+            return synthetic_payload(date.today(), currencies)
+        if endpoint == "timeseries":
+            start_date = date.fromisoformat(query["start_date"][0])
+            end_date = date.fromisoformat(query["end_date"][0])
+            days = synthetic_history(start_date, end_date, currencies)
+            return {"success": True, "timeseries": True, "base": "EUR",
+                    "start_date": start_date.isoformat(), "end_date": end_date.isoformat(),
+                    "rates": {day.isoformat(): payload["rates"] for day, payload in days.items()}}
+        return synthetic_payload(date.fromisoformat(endpoint), currencies)
+
+    def __enter__(self):
+        fixture = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                try:
+                    body = json.dumps(fixture._respond(url.path, parse_qs(url.query))).encode()
+                    status = 200
+                except (KeyError, ValueError) as e:
+                    body = json.dumps({"success": False, "error": {"info": str(e)}}).encode()
+                    status = 400
+                if fixture.latency_seconds:
+                    time.sleep(fixture.latency_seconds)
+                fixture.requests_served += 1
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # Keep the benchmark output clean
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-rates-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -38,6 +38,25 @@ apiInstance.interceptors.response.use(
   }
 );
 
+/**
+ * Turn the compact history arrays from the API into the { date: { currency: rate } } map
+ * the charts use. The API sends one list of dates and, per currency, a list of rates in
+ * the same order (null where a day has no rate), which is much smaller on the wire.
+ * @param {Object} data - { base, start_date, end_date, timestamp, dates, rates: { code: [...] } }
+ * @returns {Object} The same object with `rates` keyed by date
+ */
+const expandHistory = (data) => {
+  const rates = {};
+  data.dates.forEach((date, i) => {
+    const day = {};
+    Object.entries(data.rates).forEach(([currency, values]) => {
+      if (values[i] !== null) day[currency] = values[i];
+    });
+    rates[date] = day;
+  });
+  return { ...data, rates };
+};
+
 const api = {
   /**
    * Convert an amount from one currency to another
@@ -89,7 +108,7 @@ const api = {
     const response = await apiInstance.get('/history/monthly', {
       params: { year, month, base }
     });
-    return response.data;
+    return expandHistory(response.data);
   },
 
   /**
@@ -102,7 +121,7 @@ const api = {
     const response = await apiInstance.get('/history/yearly', {
       params: { year, base }
     });
-    return response.data;
+    return expandHistory(response.data);
   },
 
   /**